@@ -0,0 +1,279 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from contextlib import redirect_stdout
+import numpy as np
+from ProcesadorAudio import ProcesadorAudio
+from ProcesadorImagen import ProcesadorImagen
+from ClasificadorImagen import ClasificadorImagen
+from Entrenador import Entrenador
+from Calentamiento import generar_audio_sintetico, generar_imagen_sintetica
+from Rutas import DB_PATHS
+
+ETIQUETAS_SINTETICAS = ["papa", "zanahoria", "camote", "berenjena"]
+
+def medir(funcion, repeticiones=5, calentamiento=1):
+    """
+    Ejecuta la función varias veces (descartando las de calentamiento) y devuelve la mediana y el mínimo del tiempo.
+
+    La salida por consola de la función se descarta para no medir ni mostrar los mensajes de los pipelines.
+    """
+    tiempos = []
+    with redirect_stdout(io.StringIO()):
+        for i in range(calentamiento + repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            if i >= calentamiento:
+                tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos)), float(min(tiempos))
+
+def extraer_audio(datos):
+    procesador_audio = ProcesadorAudio("benchmark.wav", datos=datos)
+    procesador_audio.cargar_audio()
+    procesador_audio.preprocesar_audio()
+    procesador_audio.extraer_caracteristicas()
+    return procesador_audio.caracteristicas
+
+def extraer_imagen(datos):
+    procesador_imagen = ProcesadorImagen("benchmark.jpg", datos=datos)
+    procesador_imagen.cargar_imagen()
+    procesador_imagen.aplicar_retoque_lab()
+    procesador_imagen.eliminar_fondo()
+    procesador_imagen.extraer_caracteristicas()
+    return procesador_imagen.caracteristicas
+
+def caracteristicas_sinteticas(n_muestras, n_caracteristicas=7, semilla=0):
+    """Genera n muestras repartidas en cuatro grupos gaussianos, con una etiqueta por grupo."""
+    generador = np.random.default_rng(semilla)
+    centros = generador.uniform(-1, 1, size=(len(ETIQUETAS_SINTETICAS), n_caracteristicas))
+    grupos = np.arange(n_muestras) % len(ETIQUETAS_SINTETICAS)
+    muestras = centros[grupos] + 0.2 * generador.standard_normal((n_muestras, n_caracteristicas))
+    return muestras, np.array(ETIQUETAS_SINTETICAS)[grupos]
+
+def version_git():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar_resultados(base, actual, umbral=0.1):
+    """
+    Compara dos ejecuciones del benchmark y devuelve las mediciones que empeoraron más que el umbral.
+
+    :param base: Resultados de referencia (diccionario cargado del JSON).
+    :param actual: Resultados a comparar.
+    :param umbral: Empeoramiento relativo tolerado (0.1 = 10 %).
+    :return: Lista de (nombre, valor_base, valor_actual, cambio) de las regresiones.
+    """
+    regresiones = []
+    print(f"{'Medición':<42}{'Base':>12}{'Actual':>12}{'Cambio':>10}  Unidad")
+    for nombre, medicion in actual["resultados"].items():
+        referencia = base["resultados"].get(nombre)
+        if referencia is None or referencia["valor"] == 0:
+            print(f"{nombre:<42}{'-':>12}{medicion['valor']:>12.4g}{'nueva':>10}  {medicion['unidad']}")
+            continue
+        cambio = (medicion["valor"] - referencia["valor"]) / referencia["valor"]
+        # Para tiempos un aumento es peor; para tasas (por segundo), una disminución
+        empeoramiento = -cambio if medicion["mayor_es_mejor"] else cambio
+        marca = "  REGRESIÓN" if empeoramiento > umbral else ""
+        print(f"{nombre:<42}{referencia['valor']:>12.4g}{medicion['valor']:>12.4g}{cambio * 100:>+9.1f}%  {medicion['unidad']}{marca}")
+        if empeoramiento > umbral:
+            regresiones.append((nombre, referencia["valor"], medicion["valor"], cambio))
+    for nombre in sorted(base["resultados"].keys() - actual["resultados"].keys()):
+        print(f"Advertencia: '{nombre}' está en la base pero no en los resultados actuales.")
+    return regresiones
+
+
+class Benchmark:
+    def __init__(self, rutas_db=None, escalas=(100, 1000, 5000), repeticiones=5, max_archivos=8, semilla=0):
+        """
+        Benchmark reproducible de la extracción de características, el entrenamiento y la predicción, sobre las
+        muestras de db/ y sobre datos sintéticos de distintos tamaños.
+
+        :param rutas_db: Carpetas con muestras reales (por defecto, las de db/). Las que no existan se omiten.
+        :param escalas: Cantidades de muestras de entrenamiento sintéticas con que se miden entrenamiento y predicción.
+        :param repeticiones: Mediciones de cada caso; se informa la mediana.
+        :param max_archivos: Máximo de archivos de db/ por tipo usados para medir la extracción.
+        :param semilla: Semilla de los datos sintéticos y del K-means.
+        """
+        self.rutas_db = rutas_db if rutas_db is not None else DB_PATHS
+        self.escalas = list(escalas)
+        self.repeticiones = repeticiones
+        self.max_archivos = max_archivos
+        self.semilla = semilla
+        self.resultados = {}
+
+    def registrar(self, nombre, valor, unidad, mayor_es_mejor, **detalles):
+        self.resultados[nombre] = {"valor": valor, "unidad": unidad, "mayor_es_mejor": mayor_es_mejor, **detalles}
+        print(f"{nombre:<42}{valor:>12.4g} {unidad}")
+
+    def registrar_tasa(self, nombre, funcion, cantidad, unidad):
+        """Mide una función que procesa 'cantidad' elementos y registra cuántos procesa por segundo."""
+        mediana, minimo = medir(funcion, self.repeticiones)
+        self.registrar(nombre, cantidad / mediana, unidad, True, tiempo_mediana=mediana, tiempo_minimo=minimo, cantidad=cantidad)
+
+    def leer_muestras_db(self, extensiones):
+        """Lee a memoria los primeros archivos de db/ con las extensiones dadas, repartidos entre las carpetas."""
+        archivos = []
+        for carpeta in self.rutas_db:
+            if os.path.isdir(carpeta):
+                archivos.append(sorted(os.path.join(carpeta, a) for a in os.listdir(carpeta) if a.lower().endswith(extensiones)))
+        seleccionados = []
+        for i in range(max((len(a) for a in archivos), default=0)):
+            seleccionados.extend(a[i] for a in archivos if i < len(a))
+        contenidos = []
+        for ruta in seleccionados[:self.max_archivos]:
+            with open(ruta, 'rb') as f:
+                contenidos.append(f.read())
+        return contenidos
+
+    def medir_extraccion(self):
+        """Imágenes y clips por segundo, desde los bytes ya leídos (sin contar el acceso a disco)."""
+        imagenes = self.leer_muestras_db(('.jpg', '.jpeg', '.png'))
+        if imagenes:
+            self.registrar_tasa("extraccion_imagen/db", lambda: [extraer_imagen(d) for d in imagenes], len(imagenes), "imágenes/s")
+        for ancho, alto in ((320, 240), (640, 480), (1280, 960)):
+            imagen = generar_imagen_sintetica(ancho, alto)
+            self.registrar_tasa(f"extraccion_imagen/sintetica_{ancho}x{alto}", lambda: extraer_imagen(imagen), 1, "imágenes/s")
+
+        audios = self.leer_muestras_db(('.wav',))
+        if audios:
+            self.registrar_tasa("extraccion_audio/db", lambda: [extraer_audio(d) for d in audios], len(audios), "clips/s")
+        for duracion in (0.5, 1.5, 3.0):
+            audio = generar_audio_sintetico(duracion=duracion)
+            self.registrar_tasa(f"extraccion_audio/sintetico_{duracion:g}s", lambda: extraer_audio(audio), 1, "clips/s")
+
+    def medir_entrenamiento(self):
+        """Tiempo de entrenamiento del K-NN y del K-means según la cantidad de muestras."""
+        for n in self.escalas:
+            caracteristicas, etiquetas = caracteristicas_sinteticas(n, semilla=self.semilla)
+            entrenador = Entrenador()
+            entrenador.audios_entrenamiento = entrenador.imagenes_entrenamiento = caracteristicas
+            entrenador.labels_audio_entrenamiento = entrenador.labels_imagen_entrenamiento = etiquetas
+
+            mediana, minimo = medir(entrenador.entrenar_knn, self.repeticiones)
+            self.registrar(f"entrenamiento_knn/n={n}", mediana, "s", False, tiempo_minimo=minimo)
+
+            # Misma semilla en cada repetición para que el K-means haga siempre las mismas iteraciones
+            def entrenar_kmeans():
+                np.random.seed(self.semilla)
+                entrenador.entrenar_kmeans()
+            mediana, minimo = medir(entrenar_kmeans, self.repeticiones)
+            self.registrar(f"entrenamiento_kmeans/n={n}", mediana, "s", False, tiempo_minimo=minimo)
+
+    def medir_prediccion(self, consultas_individuales=200, consultas_lote=2000):
+        """Predicciones por segundo de a una y en lote; el K-NN se mide con cada tamaño de entrenamiento."""
+        consultas, _ = caracteristicas_sinteticas(consultas_lote, semilla=self.semilla + 1)
+        individuales = consultas[:consultas_individuales]
+
+        entrenador = Entrenador()
+        for n in self.escalas:
+            caracteristicas, etiquetas = caracteristicas_sinteticas(n, semilla=self.semilla)
+            with redirect_stdout(io.StringIO()):
+                entrenador.clasificador_audio.cargar_datos_entrenamiento(caracteristicas, etiquetas)
+            clasificador = entrenador.clasificador_audio
+            self.registrar_tasa(f"prediccion_knn_individual/n={n}", lambda: [clasificador.predecir(c) for c in individuales],
+                                len(individuales), "predicciones/s")
+            self.registrar_tasa(f"prediccion_knn_lote/n={n}", lambda: clasificador.predecir_lote(consultas),
+                                len(consultas), "predicciones/s")
+
+        centroides, _ = caracteristicas_sinteticas(len(ETIQUETAS_SINTETICAS), semilla=self.semilla)
+        clasificador_imagen = ClasificadorImagen()
+        with redirect_stdout(io.StringIO()):
+            clasificador_imagen.cargar_centroides(centroides, list(ETIQUETAS_SINTETICAS))
+        self.registrar_tasa("prediccion_kmeans_individual", lambda: [clasificador_imagen.predecir(c) for c in individuales],
+                            len(individuales), "predicciones/s")
+        self.registrar_tasa("prediccion_kmeans_lote", lambda: clasificador_imagen.predecir_lote(consultas),
+                            len(consultas), "predicciones/s")
+
+    def ejecutar(self, grupos=("extraccion", "entrenamiento", "prediccion")):
+        """
+        Ejecuta los grupos de mediciones indicados.
+
+        :return: Diccionario con los metadatos de la ejecución y los resultados, listo para guardar en JSON.
+        """
+        self.resultados = {}
+        inicio = time.perf_counter()
+        mediciones = {"extraccion": self.medir_extraccion, "entrenamiento": self.medir_entrenamiento,
+                      "prediccion": self.medir_prediccion}
+        for grupo in grupos:
+            print(f"\n== {grupo} ==")
+            mediciones[grupo]()
+        return {
+            "metadatos": {
+                "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "commit": version_git(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "plataforma": platform.platform(),
+                "procesadores": os.cpu_count(),
+                "escalas": self.escalas,
+                "repeticiones": self.repeticiones,
+                "max_archivos": self.max_archivos,
+                "semilla": self.semilla,
+                "duracion_total": time.perf_counter() - inicio,
+            },
+            "resultados": self.resultados,
+        }
+
+
+def cargar_resultados(ruta):
+    with open(ruta, 'r') as f:
+        return json.load(f)
+
+def guardar_resultados(ruta, resultados):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, 'w') as f:
+        json.dump(resultados, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados guardados en: {ruta}")
+
+def informar_regresiones(regresiones, umbral):
+    """Muestra las regresiones y devuelve el código de salida (1 si hubo alguna)."""
+    if regresiones:
+        print(f"\n{len(regresiones)} mediciones empeoraron más de un {umbral * 100:.0f} %:")
+        for nombre, _, _, cambio in regresiones:
+            print(f"- {nombre} ({cambio * 100:+.1f} %)")
+        return 1
+    print(f"\nNinguna medición empeoró más de un {umbral * 100:.0f} %.")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de extracción, entrenamiento y predicción, con comparación contra una base.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    ejecutar = subcomandos.add_parser("ejecutar", help="Ejecuta el benchmark y guarda los resultados en JSON.")
+    ejecutar.add_argument('--salida', default="saves/benchmark.json")
+    ejecutar.add_argument('--grupos', nargs='+', choices=["extraccion", "entrenamiento", "prediccion"],
+                          default=["extraccion", "entrenamiento", "prediccion"])
+    ejecutar.add_argument('--escalas', nargs='+', type=int, default=[100, 1000, 5000], help="Tamaños de entrenamiento sintéticos.")
+    ejecutar.add_argument('--repeticiones', type=int, default=5)
+    ejecutar.add_argument('--max-archivos', type=int, default=8, help="Archivos de db/ por tipo para medir la extracción.")
+    ejecutar.add_argument('--comparar-con', metavar="BASE", help="Compara al terminar con los resultados guardados en BASE.")
+    ejecutar.add_argument('--umbral', type=float, default=0.1, help="Empeoramiento relativo tolerado (0.1 = 10 %%).")
+
+    comparar = subcomandos.add_parser("comparar", help="Compara dos archivos de resultados y marca las regresiones.")
+    comparar.add_argument('base')
+    comparar.add_argument('actual')
+    comparar.add_argument('--umbral', type=float, default=0.1, help="Empeoramiento relativo tolerado (0.1 = 10 %%).")
+
+    argumentos = parser.parse_args()
+    if argumentos.comando == "ejecutar":
+        benchmark = Benchmark(escalas=argumentos.escalas, repeticiones=argumentos.repeticiones, max_archivos=argumentos.max_archivos)
+        resultados = benchmark.ejecutar(argumentos.grupos)
+        guardar_resultados(argumentos.salida, resultados)
+        if argumentos.comparar_con:
+            print()
+            regresiones = comparar_resultados(cargar_resultados(argumentos.comparar_con), resultados, argumentos.umbral)
+            sys.exit(informar_regresiones(regresiones, argumentos.umbral))
+    else:
+        regresiones = comparar_resultados(cargar_resultados(argumentos.base), cargar_resultados(argumentos.actual), argumentos.umbral)
+        sys.exit(informar_regresiones(regresiones, argumentos.umbral))
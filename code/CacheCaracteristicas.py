@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+import threading
+
+class CacheCaracteristicas:
+    def __init__(self, ruta="saves/cache_caracteristicas.json", version=1):
+        """
+        Cache persistente de características extraídas, indexada por el tipo y el hash SHA-256 del archivo.
+
+        Permite volver a procesar una carpeta (por ejemplo db_evaluacion/) sin repetir la extracción de los
+        archivos que no cambiaron.
+
+        :param ruta: Archivo JSON donde se guardan las características.
+        :param version: Versión de la extracción; al cambiar los pipelines se incrementa y las entradas viejas dejan de usarse.
+        """
+        self.ruta = ruta
+        self.version = version
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = {}
+        self._modificada = False
+        self._lock = threading.Lock()
+        self.cargar()
+
+    def cargar(self):
+        if not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, 'r') as f:
+                self._entradas = json.load(f)
+            print(f"Cache de características cargada: {len(self._entradas)} entradas.")
+        except (OSError, ValueError) as e:
+            print(f"Advertencia: No se pudo leer la cache de características {self.ruta}, se empieza vacía: {e}")
+            self._entradas = {}
+
+    def clave(self, tipo, ruta_archivo):
+        hash_contenido = hashlib.sha256()
+        with open(ruta_archivo, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                hash_contenido.update(bloque)
+        return f"{tipo}:v{self.version}:{hash_contenido.hexdigest()}"
+
+    def buscar(self, tipo, ruta_archivo):
+        """Devuelve (clave, caracteristicas) del archivo; caracteristicas es None si no está en la cache."""
+        clave = self.clave(tipo, ruta_archivo)
+        with self._lock:
+            caracteristicas = self._entradas.get(clave)
+            if caracteristicas is not None:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        return clave, caracteristicas
+
+    def agregar(self, clave, caracteristicas):
+        with self._lock:
+            self._entradas[clave] = list(caracteristicas)
+            self._modificada = True
+
+    def obtener_o_extraer(self, tipo, ruta_archivo, extraer):
+        """
+        Devuelve las características del archivo desde la cache o, si no están, las extrae y las guarda.
+
+        :param tipo: 'audio' o 'imagen'.
+        :param ruta_archivo: Ruta del archivo.
+        :param extraer: Función que recibe la ruta y devuelve la lista de características.
+        """
+        clave, caracteristicas = self.buscar(tipo, ruta_archivo)
+        if caracteristicas is None:
+            caracteristicas = list(extraer(ruta_archivo))
+            self.agregar(clave, caracteristicas)
+        return caracteristicas
+
+    def guardar(self):
+        """Escribe la cache en disco (de forma atómica) si cambió."""
+        with self._lock:
+            if not self._modificada:
+                return
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, 'w') as f:
+                json.dump(self._entradas, f)
+            os.replace(temporal, self.ruta)
+            self._modificada = False
+        print(f"Cache de características guardada en: {self.ruta}")
+
+    def estadisticas(self):
+        with self._lock:
+            return {"entradas": len(self._entradas), "aciertos": self.aciertos, "fallos": self.fallos}
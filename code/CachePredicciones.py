@@ -0,0 +1,70 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+class CachePredicciones:
+    def __init__(self, max_entradas=1024, ttl=600):
+        """
+        Cache LRU de predicciones indexada por el contenido del archivo recibido y la versión del modelo.
+
+        :param max_entradas: Cantidad máxima de predicciones guardadas; al superarla se descarta la menos usada.
+        :param ttl: Segundos que una predicción se considera válida.
+        """
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clave(self, tipo, datos, version_modelo):
+        """Clave de cache: tipo de archivo, hash SHA-256 del contenido y versión del modelo."""
+        return (tipo, hashlib.sha256(datos).hexdigest(), version_modelo)
+
+    def obtener(self, clave):
+        """Devuelve (caracteristicas, etiqueta) si la clave está en cache y no expiró, o None."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            caracteristicas, etiqueta, guardado_en = entrada
+            if time.monotonic() - guardado_en > self.ttl:
+                del self._entradas[clave]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return caracteristicas, etiqueta
+
+    def guardar(self, clave, caracteristicas, etiqueta):
+        """Guarda una predicción, descartando la menos usada si se supera el tamaño máximo."""
+        with self._lock:
+            self._entradas[clave] = (caracteristicas, etiqueta, time.monotonic())
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, *args):
+        """Vacía la cache (por ejemplo, cuando el registro publica una nueva versión de los modelos)."""
+        with self._lock:
+            self._entradas.clear()
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones,
+            }
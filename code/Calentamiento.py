@@ -0,0 +1,98 @@
+import io
+import time
+import threading
+import numpy as np
+import cv2
+from scipy.io import wavfile
+from ProcesadorAudio import ProcesadorAudio
+from ProcesadorImagen import ProcesadorImagen
+
+def generar_audio_sintetico(tasa_muestreo=48000, duracion=1.5):
+    """Genera un WAV estéreo de 16 bits (como los de la base de datos) con un tono modulado y algo de ruido."""
+    t = np.arange(int(tasa_muestreo * duracion)) / tasa_muestreo
+    generador = np.random.default_rng(0)
+    senal = 0.5 * np.sin(2 * np.pi * 440 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    senal += 0.05 * generador.standard_normal(len(t))
+    muestras = (np.clip(senal, -1, 1) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    wavfile.write(buffer, tasa_muestreo, np.column_stack((muestras, muestras)))
+    return buffer.getvalue()
+
+def generar_imagen_sintetica(ancho=640, alto=480):
+    """Genera un JPEG con una elipse de color sobre fondo blanco, para que el pipeline encuentre un contorno."""
+    imagen = np.full((alto, ancho, 3), 245, dtype=np.uint8)
+    cv2.ellipse(imagen, (ancho // 2, alto // 2), (ancho // 5, alto // 6), 20, 0, 360, (40, 90, 150), -1)
+    exito, codificada = cv2.imencode('.jpg', imagen)
+    if not exito:
+        raise ValueError("No se pudo codificar la imagen sintética.")
+    return codificada.tobytes()
+
+
+class Calentamiento:
+    def __init__(self, registro_modelos):
+        """
+        Ejecuta un audio y una imagen sintéticos por los pipelines completos antes de atender tráfico, para que
+        la compilación de los kernels de librosa (numba), el diseño de filtros de scipy y la inicialización de
+        OpenCV no ocurran dentro de la primera solicitud.
+
+        :param registro_modelos: Registro del que se obtienen los clasificadores para la predicción de prueba.
+        """
+        self.registro_modelos = registro_modelos
+        self.listo = False
+        self.error = None
+        self.inicio = None
+        self.fin = None
+        self.tiempos = {}
+        self._hilo = None
+
+    def _medir(self, nombre, funcion):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        self.tiempos[nombre] = time.perf_counter() - inicio
+        return resultado
+
+    def ejecutar(self):
+        """Ejecuta el calentamiento completo. Devuelve True si terminó sin errores."""
+        self.inicio = time.time()
+        try:
+            modelos = self._medir('modelos', self.registro_modelos.obtener)
+
+            datos_audio = generar_audio_sintetico()
+            procesador_audio = ProcesadorAudio("calentamiento.wav", datos=datos_audio)
+            self._medir('audio_decodificacion', procesador_audio.cargar_audio)
+            self._medir('audio_preprocesamiento', procesador_audio.preprocesar_audio)
+            self._medir('audio_extraccion', procesador_audio.extraer_caracteristicas)
+            self._medir('audio_prediccion', lambda: modelos.clasificador_audio.predecir(procesador_audio.caracteristicas))
+
+            datos_imagen = generar_imagen_sintetica()
+            procesador_imagen = ProcesadorImagen("calentamiento.jpg", datos=datos_imagen)
+            self._medir('imagen_decodificacion', procesador_imagen.cargar_imagen)
+            self._medir('imagen_preprocesamiento', lambda: (procesador_imagen.aplicar_retoque_lab(), procesador_imagen.eliminar_fondo()))
+            self._medir('imagen_extraccion', procesador_imagen.extraer_caracteristicas)
+            self._medir('imagen_prediccion', lambda: modelos.clasificador_imagen.predecir(procesador_imagen.caracteristicas))
+
+            self.listo = True
+        except Exception as e:
+            print(f"Error durante el calentamiento: {e}")
+            self.error = str(e)
+        finally:
+            self.fin = time.time()
+        print(f"Calentamiento {'completado' if self.listo else 'fallido'} en {self.fin - self.inicio:.2f} s.")
+        return self.listo
+
+    def ejecutar_en_segundo_plano(self):
+        """Ejecuta el calentamiento en un hilo, para que el servidor pueda responder /salud mientras tanto."""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self.ejecutar, name="calentamiento", daemon=True)
+            self._hilo.start()
+        return self._hilo
+
+    def estado(self):
+        """Devuelve si el servidor está listo y los tiempos de cada etapa del calentamiento."""
+        return {
+            "listo": self.listo,
+            "en_curso": self.inicio is not None and self.fin is None,
+            "error": self.error,
+            "duracion_total": (self.fin - self.inicio) if self.fin is not None else None,
+            "tiempos": dict(self.tiempos),
+        }
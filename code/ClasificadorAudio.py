@@ -6,40 +6,105 @@ class ClasificadorAudio:
         self.audios_entrenamiento = None
         self.labels_audio_entrenamiento = None
 
+        # Buffers con capacidad de reserva para agregar muestras sin copiar todo el conjunto
+        self._buffer_audios = None
+        self._buffer_labels = None
+
     def cargar_datos_entrenamiento(self, audios, labels):
         """Carga los datos de entrenamiento para K-NN"""
         self.audios_entrenamiento = np.array([list(audio) for audio in audios])
         self.labels_audio_entrenamiento = np.array(list(labels))
         print("Datos de entrenamiento cargados para el modelo K-NN.")
 
+    def agregar_muestra(self, caracteristicas_audio, etiqueta):
+        """
+        Agrega una muestra etiquetada al conjunto de entrenamiento sin reentrenar.
+
+        Las muestras se escriben en un buffer que duplica su capacidad al llenarse,
+        por lo que el costo amortizado de cada inserción es constante.
+
+        :param caracteristicas_audio: Vector de características del nuevo audio.
+        :param etiqueta: Etiqueta correcta del audio.
+        """
+        muestra = np.asarray(caracteristicas_audio, dtype=float)
+        if self.audios_entrenamiento is None or self.labels_audio_entrenamiento is None:
+            self.cargar_datos_entrenamiento([muestra], [etiqueta])
+            return
+
+        if muestra.shape[0] != self.audios_entrenamiento.shape[1]:
+            raise ValueError(f"La muestra tiene {muestra.shape[0]} características, se esperaban {self.audios_entrenamiento.shape[1]}.")
+
+        n = len(self.audios_entrenamiento)
+        buffer_valido = (
+            self._buffer_audios is not None
+            and self.audios_entrenamiento.base is self._buffer_audios
+            and self.labels_audio_entrenamiento.base is self._buffer_labels
+        )
+        if not buffer_valido or n >= len(self._buffer_audios):
+            capacidad = max(2 * n, 16)
+            self._buffer_audios = np.empty((capacidad, muestra.shape[0]), dtype=float)
+            self._buffer_audios[:n] = self.audios_entrenamiento
+            self._buffer_labels = np.empty(capacidad, dtype=object)
+            self._buffer_labels[:n] = self.labels_audio_entrenamiento
+
+        self._buffer_audios[n] = muestra
+        self._buffer_labels[n] = etiqueta
+        self.audios_entrenamiento = self._buffer_audios[:n + 1]
+        self.labels_audio_entrenamiento = self._buffer_labels[:n + 1]
+        print(f"Muestra de audio agregada con etiqueta '{etiqueta}'. Total de muestras: {n + 1}.")
+
+    def copiar(self):
+        """
+        Devuelve una copia del clasificador que comparte la matriz de entrenamiento (copia superficial).
+
+        La copia puede recibir nuevas muestras con 'agregar_muestra' sin alterar las que ve el original,
+        ya que solo se escriben filas posteriores a las del original. No deben agregarse muestras a ambos.
+        """
+        copia = ClasificadorAudio(k=self.k)
+        copia.audios_entrenamiento = self.audios_entrenamiento
+        copia.labels_audio_entrenamiento = self.labels_audio_entrenamiento
+        copia._buffer_audios = self._buffer_audios
+        copia._buffer_labels = self._buffer_labels
+        return copia
+
     def predecir(self, caracteristicas_audio):
         """Predice la etiqueta de un nuevo audio basado en el modelo K-NN entrenado."""
+        return self.predecir_lote([caracteristicas_audio])[0]
+
+    def predecir_lote(self, lote_caracteristicas, tamano_bloque=256):
+        """
+        Predice las etiquetas de varios audios a la vez.
+
+        Las distancias se calculan con numpy por bloques de consultas para acotar la memoria usada.
+
+        :param lote_caracteristicas: Matriz (n_consultas, n_caracteristicas).
+        :param tamano_bloque: Cantidad de consultas procesadas por bloque.
+        :return: Lista con la etiqueta predicha para cada consulta.
+        """
         if self.audios_entrenamiento is None or self.labels_audio_entrenamiento is None:
             raise ValueError("El modelo K-NN no ha sido entrenado. Usa 'cargar_datos_entrenamiento' primero.")
 
-        # Calcular las distancias euclidianas
-        distancias = [
-            sum((a - b) ** 2 for a, b in zip(audio_entrenamiento, caracteristicas_audio)) ** 0.5
-            for audio_entrenamiento in self.audios_entrenamiento
-        ]
-
-        # Obtener los índices de los k vecinos más cercanos
-        indices_vecinos = sorted(range(len(distancias)), key=lambda i: distancias[i])[:self.k]
-
-        # Obtener las etiquetas de los k vecinos más cercanos
-        etiquetas_vecinos = [self.labels_audio_entrenamiento[i] for i in indices_vecinos]
-
-        # Contar la frecuencia de cada etiqueta
-        conteo_etiquetas = {}
-        for etiqueta in etiquetas_vecinos:
-            if etiqueta in conteo_etiquetas:
-                conteo_etiquetas[etiqueta] += 1
-            else:
-                conteo_etiquetas[etiqueta] = 1
-
-        # Devolver la etiqueta más común
-        etiqueta_predicha = max(conteo_etiquetas, key=conteo_etiquetas.get)
-        return etiqueta_predicha
+        # Se calcula en el tipo de la matriz de entrenamiento (float32 si está mapeada en memoria) para no copiarla
+        entrenamiento = self.audios_entrenamiento
+        consultas = np.atleast_2d(np.asarray(lote_caracteristicas, dtype=entrenamiento.dtype))
+        predicciones = []
+        for inicio in range(0, len(consultas), tamano_bloque):
+            bloque = consultas[inicio:inicio + tamano_bloque]
+
+            # Calcular las distancias euclidianas de cada consulta a todas las muestras
+            distancias = np.sqrt(((bloque[:, None, :] - entrenamiento[None, :, :]) ** 2).sum(axis=2))
+
+            # Obtener los índices de los k vecinos más cercanos (orden estable ante empates)
+            indices_vecinos = np.argsort(distancias, axis=1, kind='stable')[:, :self.k]
+
+            for fila in indices_vecinos:
+                # Contar la frecuencia de cada etiqueta; ante empate gana la del vecino más cercano
+                conteo_etiquetas = {}
+                for i in fila:
+                    etiqueta = self.labels_audio_entrenamiento[i]
+                    conteo_etiquetas[etiqueta] = conteo_etiquetas.get(etiqueta, 0) + 1
+                predicciones.append(max(conteo_etiquetas, key=conteo_etiquetas.get))
+        return predicciones
 
     def to_dict(self):
         """Convierte el clasificador a un diccionario serializable en JSON."""
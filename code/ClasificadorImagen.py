@@ -4,16 +4,26 @@ class ClasificadorImagen:
     def __init__(self):
         self.centroides = None
         self.etiquetas_centroides = None
+        self.conteos_centroides = None
 
-    def cargar_centroides(self, centroides, etiquetas_centroides=None):
-        """Carga los centroides calculados por K-means y sus etiquetas correspondientes."""
+    def cargar_centroides(self, centroides, etiquetas_centroides=None, conteos_centroides=None):
+        """Carga los centroides calculados por K-means, sus etiquetas y la cantidad de muestras de cada cluster."""
         self.centroides = np.array([list(centroide) for centroide in centroides])
         self.etiquetas_centroides = etiquetas_centroides
+        self.conteos_centroides = np.array(conteos_centroides, dtype=int) if conteos_centroides is not None else None
         if etiquetas_centroides is not None:
             print("Centroides y sus etiquetas cargados exitosamente.")
         else:
             print("Centroides cargados sin etiquetas.")
 
+    def copiar(self):
+        """Devuelve una copia independiente del clasificador (los centroides son pocos y se copian)."""
+        copia = ClasificadorImagen()
+        copia.centroides = self.centroides.copy() if self.centroides is not None else None
+        copia.etiquetas_centroides = list(self.etiquetas_centroides) if self.etiquetas_centroides is not None else None
+        copia.conteos_centroides = self.conteos_centroides.copy() if self.conteos_centroides is not None else None
+        return copia
+
     def predecir(self, caracteristicas_imagen):
         """
         Predice la etiqueta de la imagen basándose en el centroide más cercano.
@@ -41,17 +51,74 @@ class ClasificadorImagen:
         else:
             return indice_cercano  # Retorna el índice si no hay etiquetas
 
+    def predecir_lote(self, lote_caracteristicas):
+        """
+        Predice las etiquetas de varias imágenes a la vez.
+
+        :param lote_caracteristicas: Matriz (n_imagenes, n_caracteristicas).
+        :return: Lista con la etiqueta (o el índice, si no hay etiquetas) del centroide más cercano a cada imagen.
+        """
+        if self.centroides is None:
+            raise ValueError("Los centroides no han sido cargados. Usa 'cargar_centroides' primero.")
+
+        consultas = np.atleast_2d(np.asarray(lote_caracteristicas, dtype=float))
+        distancias = np.sqrt(((consultas[:, None, :] - self.centroides[None, :, :]) ** 2).sum(axis=2))
+        indices_cercanos = np.argmin(distancias, axis=1)
+
+        if self.etiquetas_centroides is not None:
+            return [self.etiquetas_centroides[i] for i in indices_cercanos]
+        return [int(i) for i in indices_cercanos]
+
+    def actualizar_centroide(self, caracteristicas_imagen, etiqueta):
+        """
+        Incorpora una muestra etiquetada al centroide más cercano con esa etiqueta usando una media móvil.
+
+        Si ningún centroide tiene la etiqueta indicada se crea un centroide nuevo a partir de la muestra.
+
+        :param caracteristicas_imagen: Array de características de la imagen.
+        :param etiqueta: Etiqueta correcta de la imagen.
+        :return: Índice del centroide actualizado.
+        """
+        if self.centroides is None:
+            raise ValueError("Los centroides no han sido cargados. Usa 'cargar_centroides' primero.")
+
+        muestra = np.asarray(caracteristicas_imagen, dtype=float)
+        if self.etiquetas_centroides is None:
+            self.etiquetas_centroides = list(range(len(self.centroides)))
+        if self.conteos_centroides is None:
+            print("Advertencia: No hay conteos de muestras por centroide, se asume una muestra por centroide.")
+            self.conteos_centroides = np.ones(len(self.centroides), dtype=int)
+
+        indices = [i for i, etiqueta_centroide in enumerate(self.etiquetas_centroides) if etiqueta_centroide == etiqueta]
+        if not indices:
+            self.centroides = np.vstack([self.centroides, muestra])
+            self.etiquetas_centroides = list(self.etiquetas_centroides) + [etiqueta]
+            self.conteos_centroides = np.append(self.conteos_centroides, 1)
+            print(f"Nuevo centroide creado para la etiqueta '{etiqueta}'.")
+            return len(self.centroides) - 1
+
+        distancias = np.linalg.norm(self.centroides[indices] - muestra, axis=1)
+        indice = indices[int(np.argmin(distancias))]
+
+        # Media móvil: c_nuevo = c + (x - c) / (n + 1)
+        self.conteos_centroides[indice] += 1
+        self.centroides[indice] = self.centroides[indice] + (muestra - self.centroides[indice]) / self.conteos_centroides[indice]
+        print(f"Centroide {indice} ('{etiqueta}') actualizado. Muestras acumuladas: {self.conteos_centroides[indice]}.")
+        return indice
+
     def to_dict(self):
         """Convierte el clasificador a un diccionario serializable en JSON."""
         return {
             "centroides": self.centroides.tolist() if self.centroides is not None else None,
-            "etiquetas_centroides": self.etiquetas_centroides if self.etiquetas_centroides is not None else None
+            "etiquetas_centroides": self.etiquetas_centroides if self.etiquetas_centroides is not None else None,
+            "conteos_centroides": self.conteos_centroides.tolist() if self.conteos_centroides is not None else None
         }
 
     def from_dict(self, data):
         """Carga los datos del clasificador desde un diccionario."""
         self.centroides = np.array(data["centroides"]) if data.get("centroides") is not None else None
         self.etiquetas_centroides = data.get("etiquetas_centroides", None)
+        self.conteos_centroides = np.array(data["conteos_centroides"], dtype=int) if data.get("conteos_centroides") is not None else None
         if self.centroides is not None:
             print("Centroides y etiquetas cargados desde el diccionario.")
         else:
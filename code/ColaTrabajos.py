@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+
+class ColaTrabajos:
+    def __init__(self, n_trabajadores=2, capacidad=32, expiracion=300):
+        """
+        Cola acotada de trabajos atendida por un conjunto fijo de hilos trabajadores.
+
+        :param n_trabajadores: Cantidad de trabajos que se ejecutan a la vez.
+        :param capacidad: Cantidad máxima de trabajos esperando en la cola.
+        :param expiracion: Segundos que se conserva el resultado de un trabajo terminado.
+        """
+        self.n_trabajadores = n_trabajadores
+        self.capacidad = capacidad
+        self.expiracion = expiracion
+
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._pid = None
+        # Carpeta compartida entre los procesos del servidor prefork (ver compartir), o None con un solo proceso
+        self.directorio = None
+        self._ultima_limpieza_directorio = 0.0
+
+    def compartir(self, directorio):
+        """
+        Guarda además el estado de cada trabajo en directorio/<id>.json, para que cualquier proceso trabajador del
+        servidor prefork pueda responder la consulta aunque el trabajo lo haya recibido y ejecutado otro.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+
+    def _publicar(self, trabajo):
+        """Escribe el estado del trabajo en la carpeta compartida (de forma atómica), si la hay."""
+        if self.directorio is None:
+            return
+        ruta = os.path.join(self.directorio, f"{trabajo['id']}.json")
+        try:
+            with open(f"{ruta}.tmp", 'w') as f:
+                json.dump(trabajo, f)
+            os.replace(f"{ruta}.tmp", ruta)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error al guardar el estado del trabajo {trabajo['id']}: {e}")
+
+    def _leer_publicado(self, id_trabajo):
+        """Lee el estado de un trabajo de otro proceso desde la carpeta compartida, o None si no está."""
+        if self.directorio is None or len(id_trabajo) != 32 or not all(c in "0123456789abcdef" for c in id_trabajo):
+            return None
+        try:
+            with open(os.path.join(self.directorio, f"{id_trabajo}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _iniciar_trabajadores(self):
+        """
+        Inicia los hilos trabajadores en el proceso actual.
+
+        Se hace al enviar el primer trabajo y no al construir la cola: los hilos no sobreviven a un fork,
+        por lo que cada proceso trabajador del servidor inicia los suyos.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilos = []
+            for i in range(self.n_trabajadores):
+                hilo = threading.Thread(target=self._trabajar, name=f"trabajador-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def enviar(self, funcion, *args, **kwargs):
+        """
+        Encola un trabajo y devuelve su identificador sin esperar a que se ejecute.
+
+        :raises queue.Full: Si la cola está llena.
+        """
+        if self._pid != os.getpid():
+            self._iniciar_trabajadores()
+        self._limpiar_expirados()
+        id_trabajo = uuid.uuid4().hex
+        trabajo = {
+            "id": id_trabajo,
+            "estado": "en_cola",
+            "creado": time.time(),
+            "iniciado": None,
+            "finalizado": None,
+            "resultado": None,
+            "error": None,
+        }
+        with self._lock:
+            self._trabajos[id_trabajo] = trabajo
+            # Se publica antes de encolarlo: un trabajador podría empezarlo (y publicar su nuevo estado) enseguida
+            self._publicar(trabajo)
+        try:
+            self._cola.put_nowait((id_trabajo, funcion, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._trabajos[id_trabajo]
+            if self.directorio is not None:
+                try:
+                    os.remove(os.path.join(self.directorio, f"{id_trabajo}.json"))
+                except OSError:
+                    pass
+            raise
+        return id_trabajo
+
+    def consultar(self, id_trabajo):
+        """Devuelve el estado de un trabajo con sus tiempos, o None si no existe o ya expiró."""
+        self._limpiar_expirados()
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            estado = dict(trabajo) if trabajo is not None else None
+        if estado is None:
+            estado = self._leer_publicado(id_trabajo)
+            if estado is None:
+                return None
+
+        ahora = time.time()
+        inicio = estado["iniciado"] or ahora
+        estado["tiempo_espera"] = inicio - estado["creado"]
+        if estado["iniciado"] is not None:
+            estado["tiempo_proceso"] = (estado["finalizado"] or ahora) - estado["iniciado"]
+        return estado
+
+    def estadisticas(self):
+        """Devuelve la cantidad de trabajos por estado y el largo actual de la cola."""
+        with self._lock:
+            por_estado = {}
+            for trabajo in self._trabajos.values():
+                por_estado[trabajo["estado"]] = por_estado.get(trabajo["estado"], 0) + 1
+        return {"en_cola": self._cola.qsize(), "capacidad": self.capacidad, "trabajadores": self.n_trabajadores, "por_estado": por_estado}
+
+    def _trabajar(self):
+        while True:
+            id_trabajo, funcion, args, kwargs = self._cola.get()
+            with self._lock:
+                trabajo = self._trabajos.get(id_trabajo)
+                if trabajo is not None:
+                    trabajo["estado"] = "en_proceso"
+                    trabajo["iniciado"] = time.time()
+                    self._publicar(trabajo)
+            try:
+                resultado = funcion(*args, **kwargs)
+                cambios = {"estado": "completado", "resultado": resultado}
+            except Exception as e:
+                print(f"Error en el trabajo {id_trabajo}: {e}")
+                cambios = {"estado": "error", "error": str(e)}
+            finally:
+                self._cola.task_done()
+            cambios["finalizado"] = time.time()
+            with self._lock:
+                if id_trabajo in self._trabajos:
+                    self._trabajos[id_trabajo].update(cambios)
+                    self._publicar(self._trabajos[id_trabajo])
+
+    def finalizar(self, tiempo_max=20):
+        """
+        Se llama al terminar un proceso trabajador del servidor prefork: espera hasta tiempo_max segundos a que se
+        ejecuten los trabajos pendientes y marca con error los que queden, para que su estado publicado no siga
+        indicando 'en_cola' o 'en_proceso' cuando ya nadie los va a ejecutar.
+        """
+        if self._pid != os.getpid():
+            return
+        limite = time.monotonic() + tiempo_max
+        with self._cola.all_tasks_done:
+            while self._cola.unfinished_tasks and time.monotonic() < limite:
+                self._cola.all_tasks_done.wait(limite - time.monotonic())
+        with self._lock:
+            for trabajo in self._trabajos.values():
+                if trabajo["finalizado"] is None:
+                    trabajo.update(estado="error", error="El proceso que ejecutaba el trabajo terminó, envíelo de nuevo.",
+                                   finalizado=time.time())
+                    self._publicar(trabajo)
+
+    def _limpiar_expirados(self):
+        """Elimina los trabajos terminados cuyo resultado superó el tiempo de expiración."""
+        limite = time.time() - self.expiracion
+        with self._lock:
+            expirados = [
+                id_trabajo for id_trabajo, trabajo in self._trabajos.items()
+                if trabajo["finalizado"] is not None and trabajo["finalizado"] < limite
+            ]
+            for id_trabajo in expirados:
+                del self._trabajos[id_trabajo]
+
+        # En la carpeta compartida se borran los estados sin cambios durante 'expiracion' segundos, también los que
+        # publicó un proceso que ya terminó; se revisa como mucho una vez cada décimo de la expiración
+        ahora = time.time()
+        if self.directorio is None or ahora - self._ultima_limpieza_directorio < self.expiracion / 10:
+            return
+        self._ultima_limpieza_directorio = ahora
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.name.endswith(".json") and entrada.stat().st_mtime < limite:
+                        os.remove(entrada.path)
+                except OSError:
+                    # Otro proceso pudo borrarlo al mismo tiempo
+                    pass
@@ -0,0 +1,141 @@
+import time
+import argparse
+import threading
+from functools import wraps
+
+def leer_limite(texto):
+    """
+    Convierte 'imagen=4,8,5' en ('imagen', 4, 8, 5.0): solicitudes simultáneas, solicitudes en espera y espera máxima
+    (s). Los valores omitidos ('imagen=8' o 'imagen=,16') quedan en None y conservan los configurados.
+    """
+    nombre, separador, valores = texto.partition('=')
+    partes = valores.split(',') if separador else []
+    error = f"Límite inválido: '{texto}' (formato: TIPO=CONCURRENTES[,EN_ESPERA[,ESPERA_MAXIMA]])."
+    if not nombre.strip() or not 1 <= len(partes) <= 3:
+        raise argparse.ArgumentTypeError(error)
+    partes += [''] * (3 - len(partes))
+    try:
+        max_concurrentes, max_en_espera = (int(parte) if parte.strip() else None for parte in partes[:2])
+        tiempo_max_espera = float(partes[2]) if partes[2].strip() else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(error)
+    if (max_concurrentes is not None and max_concurrentes < 1) or (max_en_espera is not None and max_en_espera < 0) \
+            or (tiempo_max_espera is not None and tiempo_max_espera < 0):
+        raise argparse.ArgumentTypeError(error)
+    return nombre.strip(), max_concurrentes, max_en_espera, tiempo_max_espera
+
+class LimiteConcurrencia:
+    def __init__(self, nombre, max_concurrentes, max_en_espera, tiempo_max_espera):
+        """
+        Limita cuántas solicitudes de un tipo se procesan a la vez, con una cola de espera acotada.
+
+        :param nombre: Nombre del tipo de solicitud (por ejemplo 'imagen' o 'audio').
+        :param max_concurrentes: Solicitudes que pueden procesarse simultáneamente.
+        :param max_en_espera: Solicitudes que pueden esperar un lugar; las demás se rechazan de inmediato.
+        :param tiempo_max_espera: Segundos que una solicitud espera un lugar antes de ser rechazada.
+        """
+        self.nombre = nombre
+        self.max_concurrentes = max_concurrentes
+        self.max_en_espera = max_en_espera
+        self.tiempo_max_espera = tiempo_max_espera
+
+        self.en_curso = 0
+        self.en_espera = 0
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.tiempo_espera_total = 0.0
+        self.tiempo_espera_maximo = 0.0
+        self._condicion = threading.Condition()
+
+    def adquirir(self):
+        """Intenta obtener un lugar. Devuelve True si la solicitud puede procesarse y False si se rechaza."""
+        inicio = time.perf_counter()
+        with self._condicion:
+            if self.en_curso >= self.max_concurrentes:
+                if self.en_espera >= self.max_en_espera:
+                    self.rechazadas += 1
+                    return False
+                self.en_espera += 1
+                try:
+                    admitida = self._condicion.wait_for(lambda: self.en_curso < self.max_concurrentes, timeout=self.tiempo_max_espera)
+                finally:
+                    self.en_espera -= 1
+                if not admitida:
+                    self.rechazadas += 1
+                    return False
+
+            espera = time.perf_counter() - inicio
+            self.en_curso += 1
+            self.aceptadas += 1
+            self.tiempo_espera_total += espera
+            self.tiempo_espera_maximo = max(self.tiempo_espera_maximo, espera)
+            return True
+
+    def liberar(self):
+        """Libera el lugar ocupado por una solicitud y despierta a la siguiente en espera."""
+        with self._condicion:
+            self.en_curso -= 1
+            self._condicion.notify()
+
+    def estadisticas(self):
+        """Devuelve el estado actual del límite y sus contadores."""
+        with self._condicion:
+            return {
+                "max_concurrentes": self.max_concurrentes,
+                "max_en_espera": self.max_en_espera,
+                "en_curso": self.en_curso,
+                "en_espera": self.en_espera,
+                "aceptadas": self.aceptadas,
+                "rechazadas": self.rechazadas,
+                "tiempo_espera_promedio": self.tiempo_espera_total / self.aceptadas if self.aceptadas else 0.0,
+                "tiempo_espera_maximo": self.tiempo_espera_maximo,
+            }
+
+
+class ControlAdmision:
+    def __init__(self, respuesta_rechazo, reintentar_en=1):
+        """
+        Agrupa los límites de concurrencia por tipo de solicitud.
+
+        :param respuesta_rechazo: Función que recibe el nombre del límite y los segundos sugeridos para reintentar,
+                                  y devuelve la respuesta para las solicitudes rechazadas.
+        :param reintentar_en: Segundos sugeridos al cliente en la cabecera Retry-After.
+        """
+        self.respuesta_rechazo = respuesta_rechazo
+        self.reintentar_en = reintentar_en
+        self.limites = {}
+
+    def agregar_limite(self, nombre, max_concurrentes, max_en_espera, tiempo_max_espera):
+        self.limites[nombre] = LimiteConcurrencia(nombre, max_concurrentes, max_en_espera, tiempo_max_espera)
+
+    def modificar_limite(self, nombre, max_concurrentes=None, max_en_espera=None, tiempo_max_espera=None):
+        """
+        Reemplaza un límite existente conservando los valores que no se indican. Se usa al configurar el servidor,
+        antes de atender solicitudes: las que ya ocupan un lugar del límite anterior no pasan al nuevo.
+        """
+        if nombre not in self.limites:
+            print(f"Error: No existe el límite de admisión '{nombre}' (válidos: {', '.join(self.limites)}).")
+            raise ValueError(f"Límite de admisión '{nombre}' desconocido.")
+        actual = self.limites[nombre]
+        self.agregar_limite(nombre,
+                            actual.max_concurrentes if max_concurrentes is None else max_concurrentes,
+                            actual.max_en_espera if max_en_espera is None else max_en_espera,
+                            actual.tiempo_max_espera if tiempo_max_espera is None else tiempo_max_espera)
+
+    def limitar(self, nombre):
+        """Decorador que aplica el límite indicado a un endpoint."""
+        def decorador(funcion):
+            @wraps(funcion)
+            def envoltura(*args, **kwargs):
+                limite = self.limites[nombre]
+                if not limite.adquirir():
+                    return self.respuesta_rechazo(nombre, self.reintentar_en)
+                try:
+                    return funcion(*args, **kwargs)
+                finally:
+                    limite.liberar()
+            return envoltura
+        return decorador
+
+    def estadisticas(self):
+        return {nombre: limite.estadisticas() for nombre, limite in self.limites.items()}
@@ -0,0 +1,146 @@
+import cv2
+import numpy as np
+
+# Descripción de cada motivo de rechazo; las claves se usan también como etiquetas de las métricas
+MOTIVOS = {
+    'fondo_insuficiente': "menos fondo blanco del necesario para separar el objeto",
+    'sin_objeto': "no se distingue ningún objeto sobre el fondo",
+    'desenfocada': "la imagen está desenfocada o movida",
+    'subexpuesta': "la imagen está demasiado oscura",
+    'sobreexpuesta': "la imagen está demasiado clara",
+}
+
+def tamano_jpeg(buffer):
+    """
+    Lee el ancho y el alto de un JPEG de su encabezado (el segmento SOF), sin decodificarlo.
+
+    :return: (ancho, alto), o None si los datos no son un JPEG o no se encontró el encabezado.
+    """
+    datos = memoryview(buffer)
+    if datos[:2] != b'\xff\xd8':
+        return None
+    posicion = 2
+    while posicion + 9 <= len(datos):
+        if datos[posicion] != 0xFF:
+            return None
+        marcador = datos[posicion + 1]
+        if marcador == 0xFF:  # Relleno entre segmentos
+            posicion += 1
+            continue
+        # SOF0 a SOF15, salvo DHT (C4), JPG (C8) y DAC (CC), que comparten el rango
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+            alto = int.from_bytes(datos[posicion + 5:posicion + 7], 'big')
+            ancho = int.from_bytes(datos[posicion + 7:posicion + 9], 'big')
+            return ancho, alto
+        posicion += 2 + int.from_bytes(datos[posicion + 2:posicion + 4], 'big')
+    return None
+
+class ImagenRechazada(ValueError):
+    def __init__(self, motivos):
+        super().__init__(motivos)
+        self.motivos = motivos
+
+    def __str__(self):
+        return "Imagen rechazada por el control de calidad: " + "; ".join(MOTIVOS.get(m, m) for m in self.motivos)
+
+class ControlCalidad:
+    def __init__(self, lado_vista=400, min_fondo=0.5, max_fondo=0.995, min_nitidez=15.0, min_brillo=40, max_brillo=235,
+                 max_saturados=0.25, rechazar=True):
+        """
+        Control de calidad previo a la extracción de características. Decodifica una vista previa reducida (el
+        decodificador JPEG escala en el dominio de la DCT, sin decodificar la imagen completa) y estima con ella la
+        fracción de fondo, la nitidez y la exposición, para descartar las imágenes inservibles antes del pipeline.
+
+        :param lado_vista: Lado mayor de la vista previa; las métricas se calculan siempre a esta escala.
+        :param min_fondo: Fracción mínima de fondo (píxeles poco saturados), el mismo criterio que advierte eliminar_fondo.
+        :param max_fondo: Por encima de esta fracción se considera que no hay objeto.
+        :param min_nitidez: Varianza mínima del laplaciano de la vista previa.
+        :param min_brillo: Brillo medio mínimo (0-255).
+        :param max_brillo: Brillo medio máximo (0-255).
+        :param max_saturados: Fracción máxima de píxeles negros (<= 5) o quemados (>= 250).
+        :param rechazar: Si es False, las imágenes con problemas solo se marcan y se procesan igual.
+        """
+        self.lado_vista = lado_vista
+        self.min_fondo = min_fondo
+        self.max_fondo = max_fondo
+        self.min_nitidez = min_nitidez
+        self.min_brillo = min_brillo
+        self.max_brillo = max_brillo
+        self.max_saturados = max_saturados
+        self.rechazar = rechazar
+
+    def cargar_vista(self, ruta=None, datos=None):
+        """
+        Decodifica la imagen una sola vez, con la mayor reducción que deje al menos lado_vista píxeles, y la lleva a
+        ese tamaño. Solo los JPEG se decodifican reducidos de verdad; los demás formatos se decodifican completos.
+
+        :param ruta: Ruta al archivo, o nombre descriptivo si se indican los datos.
+        :param datos: Contenido codificado de la imagen (bytes).
+        """
+        if datos is not None:
+            buffer = np.frombuffer(datos, dtype=np.uint8)
+            error = f"No se pudo decodificar la imagen recibida: {ruta}"
+        else:
+            buffer = np.fromfile(ruta, dtype=np.uint8)
+            error = f"No se pudo cargar la imagen desde la ruta: {ruta}"
+
+        modo = cv2.IMREAD_COLOR
+        tamano = tamano_jpeg(buffer)
+        if tamano is not None:
+            modo = next((modo for factor, modo in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                                   (2, cv2.IMREAD_REDUCED_COLOR_2))
+                         if max(tamano) // factor >= self.lado_vista), cv2.IMREAD_COLOR)
+        vista = cv2.imdecode(buffer, modo)
+        if vista is None:
+            raise ValueError(error)
+
+        escala = self.lado_vista / max(vista.shape[:2])
+        if escala < 1:
+            vista = cv2.resize(vista, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+        return vista
+
+    def evaluar_vista(self, vista):
+        """
+        :return: Diccionario con las métricas ('fondo', 'nitidez', 'brillo', 'oscuros', 'quemados') y la lista de 'motivos'.
+        """
+        hsv = cv2.cvtColor(vista, cv2.COLOR_BGR2HSV)
+        gris = cv2.cvtColor(vista, cv2.COLOR_BGR2GRAY)
+        total = gris.size
+        metricas = {
+            'fondo': cv2.countNonZero(cv2.inRange(hsv[:, :, 1], 0, 30)) / total,
+            'nitidez': float(cv2.Laplacian(gris, cv2.CV_32F).var()),
+            'brillo': float(cv2.mean(gris)[0]),
+            'oscuros': cv2.countNonZero(cv2.inRange(gris, 0, 5)) / total,
+            'quemados': cv2.countNonZero(cv2.inRange(gris, 250, 255)) / total,
+        }
+
+        motivos = []
+        if metricas['brillo'] < self.min_brillo or metricas['oscuros'] > self.max_saturados:
+            motivos.append('subexpuesta')
+        if metricas['brillo'] > self.max_brillo or metricas['quemados'] > self.max_saturados:
+            motivos.append('sobreexpuesta')
+        # Cada criterio solo tiene sentido si pasaron los anteriores: con mala exposición la saturación no separa el
+        # fondo del objeto, y sin un objeto sobre el fondo no hay bordes con que medir la nitidez
+        if not motivos:
+            if metricas['fondo'] < self.min_fondo:
+                motivos.append('fondo_insuficiente')
+            elif metricas['fondo'] > self.max_fondo:
+                motivos.append('sin_objeto')
+            elif metricas['nitidez'] < self.min_nitidez:
+                motivos.append('desenfocada')
+        metricas['motivos'] = motivos
+        return metricas
+
+    def evaluar(self, ruta=None, datos=None):
+        return self.evaluar_vista(self.cargar_vista(ruta, datos))
+
+    def verificar(self, ruta=None, datos=None):
+        """
+        Evalúa la imagen y, si tiene problemas y el control rechaza, lanza ImagenRechazada.
+
+        :return: El resultado de evaluar (con motivos vacíos si la imagen es válida).
+        """
+        resultado = self.evaluar(ruta, datos)
+        if resultado['motivos'] and self.rechazar:
+            raise ImagenRechazada(resultado['motivos'])
+        return resultado
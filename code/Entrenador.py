@@ -1,9 +1,9 @@
 import os
 import numpy as np
-from sklearn.cluster import KMeans
 import json
 from ClasificadorAudio import ClasificadorAudio
 from ClasificadorImagen import ClasificadorImagen
+import FormatoModelo
 from collections import Counter
 
 class Entrenador:
@@ -109,7 +109,8 @@ class Entrenador:
 
 
         etiquetas_clusters = self.asignar_etiquetas_a_centroides(etiquetas)
-        self.clasificador_imagen.cargar_centroides(centroides, etiquetas_clusters)
+        conteos_clusters = np.bincount(etiquetas, minlength=self.k_centroides)
+        self.clasificador_imagen.cargar_centroides(centroides, etiquetas_clusters, conteos_clusters)
         print("Clasificador K-means para imágenes configurado y entrenado.")
     
     def asignar_etiquetas_a_centroides(self, labels_kmeans):
@@ -138,34 +139,102 @@ class Entrenador:
         print("Clasificadores configurados y entrenados.")
 
     def guardar_modelos(self, ruta_modelo):
-        modelos = {
-            'clasificador_audio': self.clasificador_audio.to_dict(),
-            'clasificador_imagen': self.clasificador_imagen.to_dict()  # Guardar centroides y etiquetas
-        }
+        """Guarda los clasificadores en formato binario, o en JSON si la ruta termina en '.json'."""
         try:
-            with open(ruta_modelo, 'w') as f:
-                json.dump(modelos, f, indent=4)
+            FormatoModelo.guardar_modelos(ruta_modelo, self.clasificador_audio, self.clasificador_imagen)
+            # El modelo completo ya incluye las muestras incrementales, se descartan los deltas
+            ruta_deltas = self.ruta_deltas(ruta_modelo)
+            if os.path.exists(ruta_deltas):
+                os.remove(ruta_deltas)
             print(f"Modelos entrenados guardados exitosamente en {ruta_modelo}.")
         except Exception as e:
             print(f"Error al guardar los modelos en {ruta_modelo}: {e}")
             raise
 
     def cargar_modelos(self, ruta_modelo):
+        """Carga los clasificadores desde un modelo binario (mapeado en memoria) o JSON y aplica sus deltas."""
         if not os.path.exists(ruta_modelo):
             print(f"Error: No se encontró el archivo de modelo en la ruta especificada: {ruta_modelo}")
             raise FileNotFoundError(f"No se encontró el archivo de modelo en la ruta especificada: {ruta_modelo}")
         
         try:
-            with open(ruta_modelo, 'r') as f:
-                modelos = json.load(f)
-                # Cargar clasificador de audio
-                self.clasificador_audio.from_dict(modelos['clasificador_audio'])
-                # Cargar clasificador de imagen
-                self.clasificador_imagen.from_dict(modelos['clasificador_imagen'])
+            FormatoModelo.cargar_modelos(ruta_modelo, self.clasificador_audio, self.clasificador_imagen)
+            self.aplicar_deltas(ruta_modelo)
             print(f"Modelos entrenados cargados exitosamente desde {ruta_modelo}.")
         except json.JSONDecodeError:
             print(f"Error: El archivo de modelo {ruta_modelo} está corrupto o no es válido.")
             raise
         except Exception as e:
             print(f"Se produjo un error inesperado al cargar los modelos: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def ruta_deltas(ruta_modelo):
+        """Devuelve la ruta del archivo de actualizaciones incrementales asociado a un modelo."""
+        return f"{ruta_modelo}.deltas"
+
+    def agregar_muestra_audio(self, caracteristicas, etiqueta, ruta_modelo=None):
+        """
+        Agrega un audio etiquetado al clasificador K-NN sin reentrenar.
+
+        :param caracteristicas: Características extraídas del audio.
+        :param etiqueta: Etiqueta correcta del audio.
+        :param ruta_modelo: Si se indica, la actualización se persiste como delta de ese modelo.
+        """
+        delta = {"tipo": "audio", "caracteristicas": [float(valor) for valor in caracteristicas], "etiqueta": str(etiqueta)}
+        self.aplicar_delta(delta)
+        if ruta_modelo is not None:
+            self.guardar_delta(ruta_modelo, delta)
+
+    def agregar_muestra_imagen(self, caracteristicas, etiqueta, ruta_modelo=None):
+        """
+        Incorpora una imagen etiquetada al centroide correspondiente sin reentrenar K-means.
+
+        :param caracteristicas: Características extraídas de la imagen.
+        :param etiqueta: Etiqueta correcta de la imagen.
+        :param ruta_modelo: Si se indica, la actualización se persiste como delta de ese modelo.
+        """
+        delta = {"tipo": "imagen", "caracteristicas": [float(valor) for valor in caracteristicas], "etiqueta": str(etiqueta)}
+        self.aplicar_delta(delta)
+        if ruta_modelo is not None:
+            self.guardar_delta(ruta_modelo, delta)
+
+    def aplicar_delta(self, delta):
+        """Aplica una actualización incremental a los clasificadores en memoria."""
+        if delta["tipo"] == "audio":
+            self.clasificador_audio.agregar_muestra(delta["caracteristicas"], delta["etiqueta"])
+        elif delta["tipo"] == "imagen":
+            self.clasificador_imagen.actualizar_centroide(delta["caracteristicas"], delta["etiqueta"])
+        else:
+            raise ValueError(f"Tipo de delta desconocido: {delta['tipo']}")
+
+    def guardar_delta(self, ruta_modelo, delta):
+        """Agrega una actualización incremental al final del archivo de deltas del modelo (una línea JSON por delta)."""
+        ruta_deltas = self.ruta_deltas(ruta_modelo)
+        try:
+            with open(ruta_deltas, 'a') as f:
+                f.write(json.dumps(delta) + "\n")
+        except Exception as e:
+            print(f"Error al guardar la actualización incremental en {ruta_deltas}: {e}")
+            raise
+
+    def aplicar_deltas(self, ruta_modelo):
+        """Reaplica, en orden, las actualizaciones incrementales guardadas para un modelo."""
+        ruta_deltas = self.ruta_deltas(ruta_modelo)
+        if not os.path.exists(ruta_deltas):
+            return
+
+        aplicados = 0
+        with open(ruta_deltas, 'r') as f:
+            for numero_linea, linea in enumerate(f, start=1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    delta = json.loads(linea)
+                except json.JSONDecodeError:
+                    print(f"Advertencia: Se ignora la línea {numero_linea} corrupta en {ruta_deltas}.")
+                    continue
+                self.aplicar_delta(delta)
+                aplicados += 1
+        print(f"{aplicados} actualizaciones incrementales aplicadas desde {ruta_deltas}.")
\ No newline at end of file
@@ -1,18 +1,22 @@
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 import json
-from sklearn.decomposition import PCA
+import time
 from ClasificadorAudio import ClasificadorAudio
 from ClasificadorImagen import ClasificadorImagen
+import FormatoModelo
+
+# matplotlib y scikit-learn solo se usan en los gráficos: se importan en los métodos que los necesitan.
 
 class Evaluador:
-    def __init__(self, modelo_path="saves/modelos_entrenados.json", datos_procesados_path="saves/datos_procesados.json"):
+    def __init__(self, modelo_path="saves/modelos_entrenados.bin", datos_procesados_path="saves/datos_procesados.json"):
         print("Inicializando Evaluador...")
         self.caracteristicas_audio = None
         self.caracteristicas_imagen = None
         self.labels_imagen = None
         self.labels_audio = None
+        # Resultado de la última evaluación de cada tipo
+        self.resultados = {}
 
         print("Instanciando ClasificadorAudio y ClasificadorImagen...")
         self.clasificador_audio = ClasificadorAudio()
@@ -33,22 +37,11 @@ class Evaluador:
                 self.labels_imagen = np.array(datos_procesados.get("etiquetas_imagen", []))
             print("Datos procesados cargados correctamente.")
 
-            # Cargar modelo entrenado (clasificadores)
-            with open(modelo_path, "r") as f:
-                modelos = json.load(f)
-                
-                # Cargar clasificador de audio
-                audios_entrenamiento = modelos['clasificador_audio'].get('audios_entrenamiento', None)
-                labels_audio_entrenamiento = modelos['clasificador_audio'].get('labels_audio_entrenamiento', None)
-                if audios_entrenamiento is not None and labels_audio_entrenamiento is not None:
-                    print("Cargando ClasificadorAudio desde saves/modelos_entrenados.json...")
-                    self.clasificador_audio.from_dict(modelos['clasificador_audio'])
-                else:
-                    print("Advertencia: No se encontraron datos de entrenamiento para el clasificador de audio.")
-                
-                # Cargar clasificador de imagen
-                print("Cargando ClasificadorImagen desde saves/modelos_entrenados.json...")
-                self.clasificador_imagen.from_dict(modelos["clasificador_imagen"])
+            # Cargar modelo entrenado (clasificadores), en formato binario o JSON
+            print(f"Cargando ClasificadorAudio y ClasificadorImagen desde {modelo_path}...")
+            FormatoModelo.cargar_modelos(modelo_path, self.clasificador_audio, self.clasificador_imagen)
+            if self.clasificador_audio.audios_entrenamiento is None or self.clasificador_audio.labels_audio_entrenamiento is None:
+                print("Advertencia: No se encontraron datos de entrenamiento para el clasificador de audio.")
             
             print("Datos y modelos cargados exitosamente para evaluación.")
         except Exception as e:
@@ -62,11 +55,31 @@ class Evaluador:
         :param n_componentes: Número de componentes principales para reducir.
         :return: Array transformado con forma (n_samples, n_componentes).
         """
-        pca = PCA(n_components=n_componentes)
-        caracteristicas_reducidas = pca.fit_transform(caracteristicas)
+        caracteristicas_reducidas = self.ajustar_proyeccion(caracteristicas, n_componentes=n_componentes).transform(caracteristicas)
         print(f"Dimensionalidad reducida de {caracteristicas.shape[1]} a {n_componentes} componentes principales.")
         return caracteristicas_reducidas
 
+    def estadisticas_por_etiqueta(self, caracteristicas, etiquetas):
+        """
+        Calcula el promedio y la varianza de cada característica por etiqueta con reducciones agrupadas,
+        sin recorrer la matriz una vez por etiqueta.
+
+        :return: Tupla (etiquetas_unicas, promedios, varianzas, conteos); promedios y varianzas con forma (n_etiquetas, n_features).
+        """
+        caracteristicas = np.asarray(caracteristicas, dtype=float)
+        etiquetas_unicas, indices = np.unique(etiquetas, return_inverse=True)
+        conteos = np.bincount(indices, minlength=len(etiquetas_unicas))
+
+        sumas = np.zeros((len(etiquetas_unicas), caracteristicas.shape[1]))
+        np.add.at(sumas, indices, caracteristicas)
+        promedios = sumas / conteos[:, None]
+
+        desvios = caracteristicas - promedios[indices]
+        varianzas = np.zeros_like(sumas)
+        np.add.at(varianzas, indices, desvios ** 2)
+        varianzas /= conteos[:, None]
+        return etiquetas_unicas, promedios, varianzas, conteos
+
     def calcular_estadisticas_por_etiqueta(self, caracteristicas, etiquetas, tipo):
         """
         Calcula las estadísticas por etiqueta (promedio y varianza) y las muestra en tablas separadas por tipo.
@@ -75,115 +88,117 @@ class Evaluador:
         :param etiquetas: Array de etiquetas correspondientes a cada muestra.
         :param tipo: Tipo de características ('audio' o 'imagen').
         """
-        etiquetas_unicas = np.unique(etiquetas)
-        
-        # Mostrar encabezados separados para cada sección
-        print(f"Estadísticas de {tipo.capitalize()}: Promedio")
-        print(f"{'Etiqueta':<15} {'Promedio':<100}")
-        print("=" * 120)
-        for etiqueta in etiquetas_unicas:
-            indices = np.where(etiquetas == etiqueta)
-            caracteristicas_etiqueta = caracteristicas[indices]
-            promedio = np.mean(caracteristicas_etiqueta, axis=0)
-            promedio_str = np.array2string(promedio, precision=3, separator=', ', suppress_small=True, max_line_width=80)
-            print(f"{etiqueta:<15} {promedio_str:<100}")
-        print("\n" + "=" * 120 + "\n")
-
-        print(f"Estadísticas de {tipo.capitalize()}: Varianza")
-        print(f"{'Etiqueta':<15} {'Varianza':<100}")
-        print("=" * 120)
-        for etiqueta in etiquetas_unicas:
-            indices = np.where(etiquetas == etiqueta)
-            caracteristicas_etiqueta = caracteristicas[indices]
-            varianza = np.var(caracteristicas_etiqueta, axis=0)
-            varianza_str = np.array2string(varianza, precision=3, separator=', ', suppress_small=True, max_line_width=80)
-            print(f"{etiqueta:<15} {varianza_str:<100}")
-        print("\n" + "=" * 120 + "\n")
+        etiquetas_unicas, promedios, varianzas, _ = self.estadisticas_por_etiqueta(caracteristicas, etiquetas)
+
+        for titulo, valores in (("Promedio", promedios), ("Varianza", varianzas)):
+            # Mostrar encabezados separados para cada sección
+            print(f"Estadísticas de {tipo.capitalize()}: {titulo}")
+            print(f"{'Etiqueta':<15} {titulo:<100}")
+            print("=" * 120)
+            for etiqueta, fila in zip(etiquetas_unicas, valores):
+                fila_str = np.array2string(fila, precision=3, separator=', ', suppress_small=True, max_line_width=80)
+                print(f"{etiqueta:<15} {fila_str:<100}")
+            print("\n" + "=" * 120 + "\n")
+
+    def matriz_confusion(self, etiquetas_reales, etiquetas_predichas):
+        """
+        Construye la matriz de confusión con un único bincount sobre los pares (real, predicha).
+
+        :return: Tupla (etiquetas, matriz); la fila es la etiqueta real y la columna la predicha.
+        """
+        etiquetas_reales = np.asarray(etiquetas_reales).astype(str)
+        etiquetas_predichas = np.asarray(etiquetas_predichas).astype(str)
+        etiquetas, indices = np.unique(np.concatenate([etiquetas_reales, etiquetas_predichas]), return_inverse=True)
+        n = len(etiquetas)
+        indices_reales, indices_predichas = indices[:len(etiquetas_reales)], indices[len(etiquetas_reales):]
+        matriz = np.bincount(indices_reales * n + indices_predichas, minlength=n * n).reshape(n, n)
+        return etiquetas, matriz
+
+    def evaluar(self, tipo):
+        """
+        Evalúa un clasificador con una sola predicción por lotes sobre todas las muestras.
+
+        :param tipo: 'audio' o 'imagen'.
+        :return: Diccionario con la exactitud, la matriz de confusión, precisión y recall por etiqueta y los tiempos.
+        """
+        inicio = time.perf_counter()
+        if tipo == 'audio':
+            clasificador, caracteristicas, etiquetas_reales = self.clasificador_audio, self.caracteristicas_audio, self.labels_audio
+        else:
+            clasificador, caracteristicas, etiquetas_reales = self.clasificador_imagen, self.caracteristicas_imagen, self.labels_imagen
+
+        inicio_prediccion = time.perf_counter()
+        etiquetas_predichas = clasificador.predecir_lote(caracteristicas) if len(caracteristicas) else []
+        tiempo_prediccion = time.perf_counter() - inicio_prediccion
+
+        etiquetas, matriz = self.matriz_confusion(etiquetas_reales, etiquetas_predichas)
+        aciertos = np.diag(matriz)
+        reales_por_etiqueta = matriz.sum(axis=1)
+        predichas_por_etiqueta = matriz.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            recall = np.where(reales_por_etiqueta > 0, aciertos / reales_por_etiqueta, 0.0)
+            precision = np.where(predichas_por_etiqueta > 0, aciertos / predichas_por_etiqueta, 0.0)
+        total = int(matriz.sum())
+
+        resultado = {
+            "etiquetas": [str(etiqueta) for etiqueta in etiquetas],
+            "matriz_confusion": matriz.tolist(),
+            "exactitud": float(aciertos.sum() / total) if total else 0.0,
+            "precision": dict(zip(map(str, etiquetas), precision.tolist())),
+            "recall": dict(zip(map(str, etiquetas), recall.tolist())),
+            "muestras": total,
+            "tiempo_prediccion": tiempo_prediccion,
+            "tiempo_total": time.perf_counter() - inicio,
+        }
+        self.resultados[tipo] = resultado
+        return resultado
+
+    def mostrar_resultados(self, resultado, tipo):
+        """Muestra la matriz de confusión, la precisión y el recall por etiqueta y los tiempos de una evaluación."""
+        etiquetas = resultado["etiquetas"]
+        ancho = max([len(etiqueta) for etiqueta in etiquetas] + [8]) + 2
+        print(f"Matriz de confusión de {tipo} (filas: etiqueta real, columnas: predicha):")
+        print(" " * ancho + "".join(f"{etiqueta:>{ancho}}" for etiqueta in etiquetas))
+        for etiqueta, fila in zip(etiquetas, resultado["matriz_confusion"]):
+            print(f"{etiqueta:<{ancho}}" + "".join(f"{valor:>{ancho}}" for valor in fila))
+        print(f"{'Etiqueta':<{ancho}}{'Precisión':>12}{'Recall':>12}")
+        for etiqueta in etiquetas:
+            print(f"{etiqueta:<{ancho}}{resultado['precision'][etiqueta] * 100:>11.2f}%{resultado['recall'][etiqueta] * 100:>11.2f}%")
+        print(f"Evaluación de {resultado['muestras']} muestras en {resultado['tiempo_total'] * 1000:.1f} ms "
+              f"(predicción por lotes: {resultado['tiempo_prediccion'] * 1000:.1f} ms).")
 
     def evaluar_audio(self):
         """Evalúa el rendimiento del clasificador de audio y calcula el porcentaje de aciertos general y por cada clase de verdura."""
-        if self.clasificador_audio is None or not hasattr(self.clasificador_audio, 'predecir'):
-            print("Error: El clasificador de audio no está entrenado o no tiene el método 'predecir'.")
-            return 0.0, {}
-
-        aciertos_por_etiqueta = {}
-        total_por_etiqueta = {}
-        aciertos_totales = 0
-        total = len(self.caracteristicas_audio)
-        
-        # Inicializar contadores para cada etiqueta
-        etiquetas_unicas = np.unique(self.labels_audio)
-        for etiqueta in etiquetas_unicas:
-            aciertos_por_etiqueta[etiqueta] = 0
-            total_por_etiqueta[etiqueta] = 0
-        
-        # Contar aciertos y totales por etiqueta
-        for i, caracteristicas in enumerate(self.caracteristicas_audio):
-            etiqueta_real = self.labels_audio[i]
-            prediccion = self.clasificador_audio.predecir(caracteristicas)
-            
-            total_por_etiqueta[etiqueta_real] += 1
-            if prediccion == etiqueta_real:
-                aciertos_por_etiqueta[etiqueta_real] += 1
-                aciertos_totales += 1
-        
-        # Calcular porcentaje de aciertos por etiqueta
-        porcentaje_aciertos_por_etiqueta = {
-            etiqueta: (aciertos_por_etiqueta[etiqueta] / total_por_etiqueta[etiqueta] * 100 if total_por_etiqueta[etiqueta] > 0 else 0.0)
-            for etiqueta in etiquetas_unicas
-        }
-        
-        # Calcular porcentaje de aciertos general
-        porcentaje_aciertos_general = (aciertos_totales / total) * 100 if total > 0 else 0.0
+        if self.clasificador_audio is None or not hasattr(self.clasificador_audio, 'predecir_lote'):
+            print("Error: El clasificador de audio no está entrenado o no tiene el método 'predecir_lote'.")
+            return 0.0
+
+        resultado = self.evaluar('audio')
+        porcentaje_aciertos_general = resultado["exactitud"] * 100
         print(f"Porcentaje de aciertos general en audios: {porcentaje_aciertos_general:.2f}%")
-        
-        # Mostrar resultados por etiqueta
-        for etiqueta, porcentaje in porcentaje_aciertos_por_etiqueta.items():
-            print(f"Porcentaje de aciertos en audios para '{etiqueta}': {porcentaje:.2f}%")
-        
+
+        # Mostrar resultados por etiqueta (las etiquetas reales, como hasta ahora)
+        for etiqueta in np.unique(self.labels_audio):
+            print(f"Porcentaje de aciertos en audios para '{etiqueta}': {resultado['recall'][str(etiqueta)] * 100:.2f}%")
+        self.mostrar_resultados(resultado, 'audios')
+
         return porcentaje_aciertos_general
 
     def evaluar_imagen(self):
         """Evalúa el rendimiento del clasificador de imagen y calcula el porcentaje de aciertos general y por cada clase de verdura."""
-        if self.clasificador_imagen is None or not hasattr(self.clasificador_imagen, 'predecir'):
-            print("Error: El clasificador de imagen no está entrenado o no tiene el método 'predecir'.")
-            return 0.0, {}
-
-        aciertos_por_etiqueta = {}
-        total_por_etiqueta = {}
-        aciertos_totales = 0
-        total = len(self.caracteristicas_imagen)
-        
-        # Inicializar contadores para cada etiqueta
-        etiquetas_unicas = np.unique(self.labels_imagen)
-        for etiqueta in etiquetas_unicas:
-            aciertos_por_etiqueta[etiqueta] = 0
-            total_por_etiqueta[etiqueta] = 0
-        
-        # Contar aciertos y totales por etiqueta
-        for i, caracteristicas in enumerate(self.caracteristicas_imagen):
-            etiqueta_real = self.labels_imagen[i]
-            prediccion = self.clasificador_imagen.predecir(caracteristicas)
-            
-            total_por_etiqueta[etiqueta_real] += 1
-            if prediccion == etiqueta_real:
-                aciertos_por_etiqueta[etiqueta_real] += 1
-                aciertos_totales += 1
-        
-        # Calcular porcentaje de aciertos por etiqueta
-        porcentaje_aciertos_por_etiqueta = {
-            etiqueta: (aciertos_por_etiqueta[etiqueta] / total_por_etiqueta[etiqueta] * 100 if total_por_etiqueta[etiqueta] > 0 else 0.0)
-            for etiqueta in etiquetas_unicas
-        }
-        
-        # Calcular porcentaje de aciertos general
-        porcentaje_aciertos_general = (aciertos_totales / total) * 100 if total > 0 else 0.0
+        if self.clasificador_imagen is None or not hasattr(self.clasificador_imagen, 'predecir_lote'):
+            print("Error: El clasificador de imagen no está entrenado o no tiene el método 'predecir_lote'.")
+            return 0.0
+
+        resultado = self.evaluar('imagen')
+        porcentaje_aciertos_general = resultado["exactitud"] * 100
         print(f"Porcentaje de aciertos general en imágenes: {porcentaje_aciertos_general:.2f}%")
-        
-        # Mostrar resultados por etiqueta
-        for etiqueta, porcentaje in porcentaje_aciertos_por_etiqueta.items():
-            print(f"Porcentaje de aciertos en imágenes para '{etiqueta}': {porcentaje:.2f}%")
-        
+
+        # Mostrar resultados por etiqueta (las etiquetas reales, como hasta ahora)
+        for etiqueta in np.unique(self.labels_imagen):
+            print(f"Porcentaje de aciertos en imágenes para '{etiqueta}': {resultado['recall'][str(etiqueta)] * 100:.2f}%")
+        self.mostrar_resultados(resultado, 'imágenes')
+
         return porcentaje_aciertos_general
 
     def ejecutar_evaluacion(self):
@@ -193,7 +208,61 @@ class Evaluador:
         print("Evaluación completada.")
         return aciertos_audio, aciertos_imagen
 
-    def plot_3d_caracteristicas(self, tipo='audio'):
+    def submuestreo_estratificado(self, etiquetas, max_puntos, semilla=0):
+        """
+        Elige como máximo 'max_puntos' índices manteniendo la proporción de cada etiqueta (al menos uno por etiqueta).
+
+        :return: Array ordenado de índices elegidos.
+        """
+        etiquetas = np.asarray(etiquetas)
+        if len(etiquetas) <= max_puntos:
+            return np.arange(len(etiquetas))
+        generador = np.random.default_rng(semilla)
+        etiquetas_unicas, indices_etiqueta, conteos = np.unique(etiquetas, return_inverse=True, return_counts=True)
+        cupos = np.maximum(1, np.floor(conteos * max_puntos / len(etiquetas)).astype(int))
+        # Agrupar los índices por etiqueta con un solo ordenamiento estable
+        orden = np.argsort(indices_etiqueta, kind='stable')
+        grupos = np.split(orden, np.cumsum(conteos)[:-1])
+        elegidos = [generador.choice(grupo, size=cupo, replace=False) for grupo, cupo in zip(grupos, cupos)]
+        return np.sort(np.concatenate(elegidos))
+
+    def ajustar_proyeccion(self, caracteristicas, etiquetas=None, n_componentes=3, max_muestras_ajuste=20000, semilla=0):
+        """
+        Ajusta una única proyección PCA que luego se usa tanto para las muestras como para los centroides.
+
+        Con muchas muestras el ajuste se hace sobre un submuestreo estratificado con el solver aleatorizado,
+        así el tiempo y la memoria quedan acotados sin importar el tamaño de la base.
+
+        :return: Objeto PCA ajustado (con el método 'transform').
+        """
+        from sklearn.decomposition import PCA
+
+        if len(caracteristicas) <= max_muestras_ajuste:
+            pca = PCA(n_components=n_componentes)
+            pca.fit(caracteristicas)
+        else:
+            if etiquetas is None:
+                etiquetas = np.zeros(len(caracteristicas), dtype=int)
+            indices = self.submuestreo_estratificado(etiquetas, max_muestras_ajuste, semilla)
+            pca = PCA(n_components=n_componentes, svd_solver='randomized', random_state=semilla)
+            pca.fit(caracteristicas[indices])
+        print(f"Proyección PCA de {caracteristicas.shape[1]} a {n_componentes} componentes "
+              f"(varianza explicada: {pca.explained_variance_ratio_.sum() * 100:.1f}%).")
+        return pca
+
+    def plot_3d_caracteristicas(self, tipo='audio', ruta_salida=None, max_puntos=5000):
+        """
+        Grafica las características en 3D (proyectadas con PCA si tienen más dimensiones) y, para imagen, los centroides
+        en la misma proyección.
+
+        :param tipo: 'audio' o 'imagen'.
+        :param ruta_salida: Si se indica, guarda la figura en ese archivo (.png o .svg) con el backend Agg, sin abrir
+                            ventanas; si no, la muestra con plt.show().
+        :param max_puntos: Cantidad máxima de muestras dibujadas (submuestreo estratificado por etiqueta).
+        :return: La ruta del archivo generado, o None si se mostró en pantalla.
+        """
+        from matplotlib import colormaps
+
         if tipo == 'audio':
             caracteristicas = self.caracteristicas_audio
             etiquetas = self.labels_audio
@@ -203,63 +272,63 @@ class Evaluador:
             etiquetas = self.labels_imagen
             titulo = "Distribución 3D de Características de Imagen"
 
-        if caracteristicas is None or caracteristicas.shape[1] < 3:
+        if caracteristicas is None or caracteristicas.ndim != 2 or caracteristicas.shape[1] < 3:
             print(f"Advertencia: Las características de {tipo} no están disponibles o tienen menos de 3 dimensiones.")
-            return
+            return None
 
-        if caracteristicas.shape[1] > 3:
-            caracteristicas = self.reducir_dimensionalidad(caracteristicas)
+        # Una sola proyección para muestras y centroides; solo se transforman los puntos que se dibujan
+        pca = self.ajustar_proyeccion(caracteristicas, etiquetas) if caracteristicas.shape[1] > 3 else None
+        proyectar = pca.transform if pca is not None else (lambda x: np.asarray(x)[:, :3])
+        indices = self.submuestreo_estratificado(etiquetas, max_puntos)
+        if len(indices) < len(etiquetas):
+            print(f"Se dibujan {len(indices)} de {len(etiquetas)} muestras (submuestreo estratificado).")
+        puntos = proyectar(caracteristicas[indices])
+        etiquetas_puntos = np.asarray(etiquetas)[indices]
 
         # Asignar colores a cada etiqueta
         etiquetas_unicas = np.unique(etiquetas)
-        num_etiquetas = len(etiquetas_unicas)
-        colores_cmap = plt.cm.get_cmap('tab10', num_etiquetas)
+        colores_cmap = colormaps['tab10']
+        etiqueta_a_color = {etiqueta: colores_cmap(idx % colores_cmap.N) for idx, etiqueta in enumerate(etiquetas_unicas)}
 
-        # Crear un diccionario para mapear etiquetas a colores
-        etiqueta_a_color = {etiqueta: colores_cmap(idx) for idx, etiqueta in enumerate(etiquetas_unicas)}
+        if ruta_salida:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from mpl_toolkits.mplot3d import Axes3D  # registra la proyección '3d'
+
+            fig = Figure(figsize=(9, 7))
+            FigureCanvasAgg(fig)
+        else:
+            import matplotlib.pyplot as plt
+            from mpl_toolkits.mplot3d import Axes3D  # registra la proyección '3d'
 
-        fig = plt.figure()
+            fig = plt.figure()
         ax = fig.add_subplot(111, projection='3d')
 
-        # Graficar cada punto con el color correspondiente a su etiqueta
+        # Graficar los puntos de cada etiqueta con una sola llamada por etiqueta
         for etiqueta in etiquetas_unicas:
-            indices = np.where(etiquetas == etiqueta)
+            mascara = etiquetas_puntos == etiqueta
             ax.scatter(
-                caracteristicas[indices, 0], 
-                caracteristicas[indices, 1], 
-                caracteristicas[indices, 2],
+                puntos[mascara, 0],
+                puntos[mascara, 1],
+                puntos[mascara, 2],
                 color=etiqueta_a_color[etiqueta],
-                marker='o', alpha=0.7, s=30, label=f"Etiqueta: {etiqueta}"
+                marker='o', alpha=0.7, s=30 if len(puntos) <= 1000 else 6, label=f"Etiqueta: {etiqueta}"
             )
 
         # Verificar si es tipo 'imagen' y hay centroides disponibles
         if tipo == 'imagen' and self.clasificador_imagen.centroides is not None and self.clasificador_imagen.etiquetas_centroides is not None:
-            unique_labels = self.clasificador_imagen.etiquetas_centroides
-            num_centroides = len(self.clasificador_imagen.centroides)
-            num_unique_labels = len(np.unique(unique_labels))
-
-            if num_centroides != num_unique_labels:
-                print("Advertencia: El número de centroides no coincide con el número de etiquetas únicas.")
-                # Asignar un color predeterminado si no hay correspondencia
-                centroid_colors = ['black'] * num_centroides
-            else:
-                # Asignar el color de la etiqueta correspondiente a cada centroide
-                centroid_colors = [etiqueta_a_color[etiqueta] for etiqueta in unique_labels]
-
-            # Reducir dimensionalidad de los centroides si es necesario
-            if self.clasificador_imagen.centroides.shape[1] > 3:
-                centroides_reducidos = self.reducir_dimensionalidad(self.clasificador_imagen.centroides)
-            else:
-                centroides_reducidos = self.clasificador_imagen.centroides
-
-            # Graficar los centroides
+            etiquetas_centroides = self.clasificador_imagen.etiquetas_centroides
+            centroid_colors = [etiqueta_a_color.get(etiqueta, 'black') for etiqueta in etiquetas_centroides]
+
+            # Proyectar los centroides con la misma PCA que las muestras
+            centroides_reducidos = proyectar(np.asarray(self.clasificador_imagen.centroides, dtype=float))
+
             for idx, centroide in enumerate(centroides_reducidos):
-                etiqueta = unique_labels[idx]
                 ax.scatter(
                     centroide[0], centroide[1], centroide[2],
                     color=centroid_colors[idx],
                     marker='^', s=100, edgecolors='k',
-                    label=f"Centroide: {etiqueta}"
+                    label=f"Centroide: {etiquetas_centroides[idx]}"
                 )
 
         # Evitar duplicación de etiquetas en la leyenda
@@ -271,4 +340,13 @@ class Evaluador:
         ax.set_ylabel("Componente Principal 2")
         ax.set_zlabel("Componente Principal 3")
         ax.set_title(titulo)
-        plt.show()
\ No newline at end of file
+
+        if ruta_salida:
+            directorio = os.path.dirname(ruta_salida)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            fig.savefig(ruta_salida)
+            print(f"Gráfico guardado en: {ruta_salida}")
+            return ruta_salida
+        plt.show()
+        return None
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import struct
+import numpy as np
+
+# Formato binario de modelos:
+#   [firma (8 bytes)] [versión (uint32)] [largo del encabezado (uint32)] [encabezado JSON] [arreglos alineados]
+# El encabezado describe cada arreglo (offset, forma y dtype) para poder mapearlo en memoria sin parsearlo.
+FIRMA = b"IA1MODEL"
+VERSION_FORMATO = 1
+ALINEACION = 64
+_ESTRUCTURA_PREAMBULO = struct.Struct("<8sII")
+
+
+def es_formato_binario(ruta_modelo):
+    """Indica si el archivo de modelo está en formato binario (según su firma)."""
+    with open(ruta_modelo, 'rb') as f:
+        return f.read(len(FIRMA)) == FIRMA
+
+
+def _alinear(posicion):
+    return (posicion + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe en un archivo temporal y lo reemplaza de forma atómica, para no dejar modelos a medio escribir."""
+    ruta_temporal = f"{ruta}.tmp{os.getpid()}"
+    try:
+        with open(ruta_temporal, 'wb') as f:
+            escribir(f)
+        os.replace(ruta_temporal, ruta)
+    finally:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+
+
+def guardar_binario(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """
+    Guarda ambos clasificadores en el formato binario versionado.
+
+    Las matrices se guardan como float32 y las etiquetas de audio como texto de ancho fijo,
+    de modo que todo puede mapearse en memoria al cargar.
+    """
+    arreglos = {}
+    encabezado = {"version": VERSION_FORMATO, "clasificador_audio": {"k": clasificador_audio.k}, "clasificador_imagen": {}}
+
+    if clasificador_audio.audios_entrenamiento is not None and clasificador_audio.labels_audio_entrenamiento is not None:
+        arreglos["audios_entrenamiento"] = np.ascontiguousarray(clasificador_audio.audios_entrenamiento, dtype='<f4')
+        arreglos["labels_audio_entrenamiento"] = np.array([str(label) for label in clasificador_audio.labels_audio_entrenamiento], dtype=str)
+    if clasificador_imagen.centroides is not None:
+        arreglos["centroides"] = np.ascontiguousarray(clasificador_imagen.centroides, dtype='<f4')
+        encabezado["clasificador_imagen"]["etiquetas_centroides"] = (
+            [str(etiqueta) for etiqueta in clasificador_imagen.etiquetas_centroides]
+            if clasificador_imagen.etiquetas_centroides is not None else None
+        )
+    if clasificador_imagen.conteos_centroides is not None:
+        arreglos["conteos_centroides"] = np.ascontiguousarray(clasificador_imagen.conteos_centroides, dtype='<i8')
+
+    # El encabezado depende de los offsets y los offsets del largo del encabezado: se reserva
+    # espacio calculando primero con offsets provisorios y luego con los definitivos.
+    descripcion = {nombre: {"offset": 0, "shape": list(arreglo.shape), "dtype": arreglo.dtype.str} for nombre, arreglo in arreglos.items()}
+    encabezado["arreglos"] = descripcion
+    for _ in range(2):
+        encabezado_bytes = json.dumps(encabezado).encode('utf-8')
+        posicion = _alinear(_ESTRUCTURA_PREAMBULO.size + len(encabezado_bytes) + ALINEACION)
+        for nombre, arreglo in arreglos.items():
+            descripcion[nombre]["offset"] = posicion
+            posicion = _alinear(posicion + arreglo.nbytes)
+    encabezado_bytes = json.dumps(encabezado).encode('utf-8')
+
+    def escribir(f):
+        f.write(_ESTRUCTURA_PREAMBULO.pack(FIRMA, VERSION_FORMATO, len(encabezado_bytes)))
+        f.write(encabezado_bytes)
+        for nombre, arreglo in arreglos.items():
+            f.write(b"\0" * (descripcion[nombre]["offset"] - f.tell()))
+            f.write(arreglo.tobytes())
+
+    _escribir_atomico(ruta_modelo, escribir)
+
+
+def leer_binario(ruta_modelo):
+    """
+    Lee el encabezado de un modelo binario y mapea sus arreglos en memoria (solo lectura).
+
+    :return: Tupla (encabezado, arreglos) donde arreglos es un diccionario de np.memmap.
+    """
+    with open(ruta_modelo, 'rb') as f:
+        preambulo = f.read(_ESTRUCTURA_PREAMBULO.size)
+        if len(preambulo) < _ESTRUCTURA_PREAMBULO.size:
+            raise ValueError(f"El archivo de modelo {ruta_modelo} está truncado.")
+        firma, version, largo_encabezado = _ESTRUCTURA_PREAMBULO.unpack(preambulo)
+        if firma != FIRMA:
+            raise ValueError(f"El archivo {ruta_modelo} no es un modelo binario válido.")
+        if version != VERSION_FORMATO:
+            raise ValueError(f"Versión de formato de modelo no soportada: {version} (se esperaba {VERSION_FORMATO}).")
+        encabezado = json.loads(f.read(largo_encabezado).decode('utf-8'))
+
+    arreglos = {}
+    for nombre, info in encabezado.get("arreglos", {}).items():
+        forma = tuple(info["shape"])
+        if 0 in forma:
+            arreglos[nombre] = np.empty(forma, dtype=info["dtype"])
+        else:
+            arreglos[nombre] = np.memmap(ruta_modelo, dtype=info["dtype"], mode='r', offset=info["offset"], shape=forma)
+    return encabezado, arreglos
+
+
+def cargar_binario(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """Carga ambos clasificadores desde un modelo binario mapeado en memoria."""
+    encabezado, arreglos = leer_binario(ruta_modelo)
+
+    clasificador_audio.k = encabezado["clasificador_audio"].get("k", 5)
+    clasificador_audio.audios_entrenamiento = arreglos.get("audios_entrenamiento")
+    clasificador_audio.labels_audio_entrenamiento = arreglos.get("labels_audio_entrenamiento")
+    if clasificador_audio.audios_entrenamiento is None:
+        print("Advertencia: No se pudieron cargar los datos de entrenamiento para el clasificador de audio.")
+
+    # Los centroides son pocos y se modifican con las actualizaciones incrementales: se copian a memoria
+    centroides = arreglos.get("centroides")
+    conteos = arreglos.get("conteos_centroides")
+    clasificador_imagen.centroides = np.array(centroides, dtype=float) if centroides is not None else None
+    clasificador_imagen.etiquetas_centroides = encabezado["clasificador_imagen"].get("etiquetas_centroides")
+    clasificador_imagen.conteos_centroides = np.array(conteos, dtype=int) if conteos is not None else None
+    if clasificador_imagen.centroides is None:
+        print("Centroides no encontrados en el modelo binario.")
+
+
+def guardar_json(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """Guarda ambos clasificadores en JSON (formato de intercambio)."""
+    modelos = {
+        'clasificador_audio': clasificador_audio.to_dict(),
+        'clasificador_imagen': clasificador_imagen.to_dict()  # Guardar centroides y etiquetas
+    }
+    _escribir_atomico(ruta_modelo, lambda f: f.write(json.dumps(modelos, indent=4).encode('utf-8')))
+
+
+def cargar_json(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """Carga ambos clasificadores desde un modelo en JSON."""
+    with open(ruta_modelo, 'r') as f:
+        modelos = json.load(f)
+    clasificador_audio.from_dict(modelos['clasificador_audio'])
+    clasificador_imagen.from_dict(modelos['clasificador_imagen'])
+
+
+def guardar_modelos(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """Guarda los clasificadores en JSON si la ruta termina en '.json' y en formato binario en otro caso."""
+    if ruta_modelo.endswith('.json'):
+        guardar_json(ruta_modelo, clasificador_audio, clasificador_imagen)
+    else:
+        guardar_binario(ruta_modelo, clasificador_audio, clasificador_imagen)
+
+
+def cargar_modelos(ruta_modelo, clasificador_audio, clasificador_imagen):
+    """Carga los clasificadores detectando el formato del archivo por su firma."""
+    if es_formato_binario(ruta_modelo):
+        cargar_binario(ruta_modelo, clasificador_audio, clasificador_imagen)
+    else:
+        cargar_json(ruta_modelo, clasificador_audio, clasificador_imagen)
+
+
+if __name__ == "__main__":
+    # Conversión entre formatos: python FormatoModelo.py origen destino
+    if len(sys.argv) != 3:
+        print("Uso: python FormatoModelo.py <modelo_origen> <modelo_destino>")
+        sys.exit(1)
+
+    from ClasificadorAudio import ClasificadorAudio
+    from ClasificadorImagen import ClasificadorImagen
+
+    origen, destino = sys.argv[1], sys.argv[2]
+    clasificador_audio = ClasificadorAudio()
+    clasificador_imagen = ClasificadorImagen()
+    cargar_modelos(origen, clasificador_audio, clasificador_imagen)
+    guardar_modelos(destino, clasificador_audio, clasificador_imagen)
+    print(f"Modelo convertido de {origen} a {destino} ({os.path.getsize(origen)} -> {os.path.getsize(destino)} bytes).")
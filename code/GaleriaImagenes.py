@@ -0,0 +1,147 @@
+import os
+import math
+import uuid
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+class GaleriaImagenes:
+    def __init__(self, directorio=None, max_por_etiqueta=12, max_bytes=20 * 1024 * 1024, lado_miniatura=200, calidad_jpeg=80):
+        """
+        Galería acotada de miniaturas de las imágenes clasificadas, agrupadas por etiqueta.
+
+        :param directorio: Carpeta donde se guardan las miniaturas (por defecto, una carpeta temporal propia).
+        :param max_por_etiqueta: Cantidad máxima de miniaturas por etiqueta.
+        :param max_bytes: Tamaño total máximo en disco de la galería.
+        :param lado_miniatura: Lado mayor de las miniaturas en píxeles.
+        :param calidad_jpeg: Calidad JPEG de las miniaturas (0-100).
+        """
+        self.directorio = directorio or tempfile.mkdtemp(prefix="galeria_")
+        os.makedirs(self.directorio, exist_ok=True)
+        self.max_por_etiqueta = max_por_etiqueta
+        self.max_bytes = max_bytes
+        self.lado_miniatura = lado_miniatura
+        self.calidad_jpeg = calidad_jpeg
+
+        self.bytes_totales = 0
+        self.desalojos = 0
+        # Orden global de uso (LRU): id -> (etiqueta, ruta, tamaño)
+        self._imagenes = OrderedDict()
+        self._lock = threading.Lock()
+        # Con varios procesos (ver compartir), miniaturas por etiqueta que se muestran juntando las de todos
+        self.max_mostradas = None
+
+    def compartir(self, n_procesos):
+        """
+        Reparte la galería entre los procesos trabajadores del servidor prefork: cada uno guarda a lo sumo su parte
+        de los límites y ids_por_etiqueta lista las miniaturas de todos desde la carpeta, que es compartida.
+        """
+        self.max_mostradas = self.max_por_etiqueta
+        self.max_por_etiqueta = math.ceil(self.max_por_etiqueta / n_procesos)
+        self.max_bytes = self.max_bytes // n_procesos
+
+    def _carpeta(self, etiqueta):
+        """Carpeta de las miniaturas de una etiqueta (el nombre se limita a caracteres seguros)."""
+        carpeta = os.path.join(self.directorio, "".join(c if c.isalnum() else "_" for c in str(etiqueta)))
+        os.makedirs(carpeta, exist_ok=True)
+        return carpeta
+
+    def generar_miniatura(self, imagen):
+        """Reduce la imagen (BGR) para que su lado mayor sea 'lado_miniatura' y la codifica como JPEG."""
+        alto, ancho = imagen.shape[:2]
+        escala = self.lado_miniatura / max(alto, ancho)
+        if escala < 1:
+            imagen = cv2.resize(imagen, (max(1, int(ancho * escala)), max(1, int(alto * escala))), interpolation=cv2.INTER_AREA)
+        exito, codificada = cv2.imencode('.jpg', imagen, [cv2.IMWRITE_JPEG_QUALITY, self.calidad_jpeg])
+        if not exito:
+            raise ValueError("No se pudo codificar la miniatura.")
+        return codificada.tobytes()
+
+    def agregar(self, etiqueta, datos=None, imagen=None):
+        """
+        Genera la miniatura de una imagen y la agrega a la galería, desalojando las más antiguas si hace falta.
+
+        :param etiqueta: Etiqueta predicha de la imagen.
+        :param datos: Imagen codificada (bytes); se usa si no se indica la imagen ya decodificada.
+        :param imagen: Imagen BGR ya decodificada, para no volver a decodificarla.
+        :return: Identificador de la miniatura.
+        """
+        if imagen is None:
+            imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if imagen is None:
+                raise ValueError("No se pudo decodificar la imagen para la galería.")
+        miniatura = self.generar_miniatura(imagen)
+
+        id_imagen = uuid.uuid4().hex
+        ruta = os.path.join(self._carpeta(etiqueta), f"{id_imagen}.jpg")
+        with open(ruta, 'wb') as f:
+            f.write(miniatura)
+
+        with self._lock:
+            self._imagenes[id_imagen] = (etiqueta, ruta, len(miniatura))
+            self.bytes_totales += len(miniatura)
+            self._desalojar(etiqueta)
+        return id_imagen
+
+    def _desalojar(self, etiqueta):
+        """Elimina las miniaturas menos usadas que excedan el límite por etiqueta o el tamaño total."""
+        de_la_etiqueta = [id_imagen for id_imagen, (etiqueta_imagen, _, _) in self._imagenes.items() if etiqueta_imagen == etiqueta]
+        sobrantes = de_la_etiqueta[:max(0, len(de_la_etiqueta) - self.max_por_etiqueta)]
+        for id_imagen in sobrantes:
+            self._eliminar(id_imagen)
+        while self.bytes_totales > self.max_bytes and len(self._imagenes) > 1:
+            self._eliminar(next(iter(self._imagenes)))
+
+    def _eliminar(self, id_imagen):
+        _, ruta, tamano = self._imagenes.pop(id_imagen)
+        self.bytes_totales -= tamano
+        self.desalojos += 1
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    def obtener_ruta(self, id_imagen):
+        """Devuelve la ruta de la miniatura (marcándola como usada) o None si no está en la galería."""
+        with self._lock:
+            if id_imagen in self._imagenes:
+                self._imagenes.move_to_end(id_imagen)
+                return self._imagenes[id_imagen][1]
+        # Con varios procesos trabajadores la carpeta es compartida: la miniatura pudo guardarla otro proceso
+        if len(id_imagen) == 32 and all(c in "0123456789abcdef" for c in id_imagen):
+            with os.scandir(self.directorio) as carpetas:
+                for carpeta in carpetas:
+                    ruta = os.path.join(carpeta.path, f"{id_imagen}.jpg")
+                    if carpeta.is_dir() and os.path.exists(ruta):
+                        return ruta
+        return None
+
+    def ids_por_etiqueta(self, etiqueta):
+        """Devuelve los identificadores de las miniaturas de una etiqueta, de la más reciente a la más antigua."""
+        if self.max_mostradas is not None:
+            # Las miniaturas de los demás procesos solo están en la carpeta compartida
+            carpeta = self._carpeta(etiqueta)
+            miniaturas = []
+            for nombre in os.listdir(carpeta):
+                try:
+                    miniaturas.append((os.path.getmtime(os.path.join(carpeta, nombre)), nombre[:-len(".jpg")]))
+                except OSError:
+                    # Otro proceso la desalojó mientras se listaba
+                    pass
+            return [id_imagen for _, id_imagen in sorted(miniaturas, reverse=True)[:self.max_mostradas]]
+        with self._lock:
+            return [id_imagen for id_imagen, (etiqueta_imagen, _, _) in reversed(self._imagenes.items()) if etiqueta_imagen == etiqueta]
+
+    def estadisticas(self):
+        with self._lock:
+            return {"imagenes": len(self._imagenes), "bytes": self.bytes_totales, "max_bytes": self.max_bytes, "desalojos": self.desalojos}
+
+    def vaciar(self):
+        """Elimina todas las miniaturas y la carpeta de la galería."""
+        with self._lock:
+            self._imagenes.clear()
+            self.bytes_totales = 0
+        shutil.rmtree(self.directorio, ignore_errors=True)
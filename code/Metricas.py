@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import fcntl
+import itertools
+import threading
+from contextlib import contextmanager
+
+# Límites (en segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escapar(valor):
+    """Escapa el valor de una etiqueta según el formato de texto de Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_valor(valor):
+    """Formatea un valor sin perder precisión (los enteros sin decimales)."""
+    valor = float(valor)
+    return str(int(valor)) if valor.is_integer() else repr(valor)
+
+
+class Metricas:
+    def __init__(self, prefijo="ia1", n_fragmentos=16):
+        """
+        Registro de métricas (contadores, indicadores e histogramas) exportables en formato de texto de Prometheus.
+
+        Los valores se reparten en una cantidad fija de fragmentos, cada uno con su lock; a cada hilo se le asigna uno
+        en forma circular la primera vez que registra algo, así los hilos rara vez compiten por el mismo lock. Como
+        los fragmentos no dependen de los hilos, la memoria no crece aunque el servidor cree un hilo por conexión.
+        Al exportar se suman los fragmentos.
+
+        :param n_fragmentos: Cantidad de fragmentos (y de locks) entre los que se reparten los hilos.
+        """
+        self.prefijo = prefijo
+        self._definiciones = {}
+        self._fragmentos = [(threading.Lock(), {}) for _ in range(n_fragmentos)]
+        self._siguiente_fragmento = itertools.count()
+        self._recolectores = []
+        self._local = threading.local()
+        # Carpeta compartida entre los procesos del servidor prefork (ver compartir), o None con un solo proceso
+        self.directorio = None
+        self.intervalo_instantaneas = None
+
+    def definir_contador(self, nombre, ayuda):
+        self._definiciones[nombre] = ("counter", ayuda, None)
+
+    def definir_indicador(self, nombre, ayuda):
+        self._definiciones[nombre] = ("gauge", ayuda, None)
+
+    def definir_histograma(self, nombre, ayuda, limites=LIMITES_LATENCIA):
+        self._definiciones[nombre] = ("histogram", ayuda, tuple(limites))
+
+    def agregar_recolector(self, recolector):
+        """
+        Registra una función que se llama al exportar y devuelve métricas calculadas en ese momento,
+        como lista de tuplas (nombre, tipo, ayuda, [(etiquetas, valor), ...]).
+        """
+        self._recolectores.append(recolector)
+
+    def _fragmento(self):
+        """Devuelve el fragmento (lock, series) asignado al hilo actual."""
+        indice = getattr(self._local, "indice", None)
+        if indice is None:
+            # Asignación circular: next() sobre itertools.count es atómico con el GIL
+            indice = self._local.indice = next(self._siguiente_fragmento) % len(self._fragmentos)
+        return self._fragmentos[indice]
+
+    def _valores(self, series, nombre, etiquetas):
+        """Devuelve los valores de una serie dentro de un fragmento, creándolos si es la primera vez (con su lock tomado)."""
+        clave = (nombre, tuple(sorted(etiquetas.items())) if etiquetas else ())
+        valores = series.get(clave)
+        if valores is None:
+            tipo, _, limites = self._definiciones[nombre]
+            valores = series[clave] = [0.0] * (len(limites) + 2) if tipo == "histogram" else [0.0]
+        return valores
+
+    def incrementar(self, nombre, etiquetas=None, valor=1):
+        """Suma un valor a un contador o indicador."""
+        lock, series = self._fragmento()
+        with lock:
+            self._valores(series, nombre, etiquetas)[0] += valor
+
+    def observar(self, nombre, valor, etiquetas=None):
+        """Registra una observación en un histograma."""
+        limites = self._definiciones[nombre][2]
+        posicion = next((i for i, limite in enumerate(limites) if valor <= limite), None)
+        lock, series = self._fragmento()
+        with lock:
+            valores = self._valores(series, nombre, etiquetas)
+            if posicion is not None:
+                valores[posicion] += 1
+            valores[-2] += valor
+            valores[-1] += 1
+
+    @contextmanager
+    def medir(self, nombre, etiquetas=None):
+        """Mide la duración del bloque y la registra en el histograma indicado."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, etiquetas)
+
+    def compartir(self, directorio, intervalo=1.0):
+        """
+        Comparte las métricas entre los procesos trabajadores del servidor prefork. Cada proceso escribe una
+        instantánea de sus series en directorio/<pid>.json (cada 'intervalo' segundos y al exportar) y /metrics suma
+        las de todos, así cualquier trabajador que atienda la consulta devuelve los totales del servidor.
+
+        Solo se leen instantáneas ya escritas, que nunca retroceden, por lo que los contadores no bajan entre dos
+        consultas atendidas por procesos distintos. Al terminar un trabajador, absorber_proceso pasa sus contadores
+        e histogramas a acumulado.json; los indicadores solo se suman entre los procesos vivos, y las métricas de
+        los recolectores (el estado de cada proceso) se exportan por separado con la etiqueta 'pid'.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.intervalo_instantaneas = intervalo
+
+    def iniciar_proceso(self):
+        """
+        Se llama en cada trabajador recién creado: descarta los valores heredados del padre (que no atiende
+        solicitudes) e inicia el hilo que guarda las instantáneas, ya que los hilos no sobreviven al fork.
+        """
+        self._fragmentos = [(threading.Lock(), {}) for _ in self._fragmentos]
+        self._local = threading.local()
+        threading.Thread(target=self._guardar_periodicamente, name="metricas", daemon=True).start()
+
+    def _guardar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo_instantaneas)
+            self.guardar_instantanea()
+
+    def guardar_instantanea(self):
+        """Escribe las series de este proceso y las métricas de sus recolectores en directorio/<pid>.json."""
+        instantanea = {
+            "series": [[nombre, etiquetas, valores] for (nombre, etiquetas), valores in self._series_propias().items()],
+            "recolectadas": self._recolectar(),
+        }
+        ruta = os.path.join(self.directorio, f"{os.getpid()}.json")
+        try:
+            with open(f"{ruta}.tmp", 'w') as f:
+                json.dump(instantanea, f)
+            os.replace(f"{ruta}.tmp", ruta)
+        except OSError as e:
+            print(f"Error al guardar la instantánea de métricas: {e}")
+
+    def _bloquear(self, modo):
+        """Abre el archivo de bloqueo de la carpeta compartida y lo toma en el modo indicado (fcntl.LOCK_SH o LOCK_EX)."""
+        archivo = open(os.path.join(self.directorio, ".lock"), 'a')
+        fcntl.flock(archivo, modo)
+        return archivo
+
+    def absorber_proceso(self, pid):
+        """
+        Se llama en el padre al recoger un trabajador terminado: suma sus contadores e histogramas a acumulado.json
+        y borra su instantánea, para que las métricas no retrocedan y la carpeta no crezca con cada reinicio.
+        """
+        if self.directorio is None:
+            return
+        ruta = os.path.join(self.directorio, f"{pid}.json")
+        ruta_acumulado = os.path.join(self.directorio, "acumulado.json")
+        with self._bloquear(fcntl.LOCK_EX):
+            try:
+                with open(ruta) as f:
+                    instantanea = json.load(f)
+            except (OSError, ValueError):
+                return
+            acumulado = {}
+            try:
+                with open(ruta_acumulado) as f:
+                    self._sumar_series(acumulado, json.load(f)["series"], con_indicadores=False)
+            except (OSError, ValueError):
+                pass
+            self._sumar_series(acumulado, instantanea["series"], con_indicadores=False)
+            with open(f"{ruta_acumulado}.tmp", 'w') as f:
+                json.dump({"series": [[nombre, etiquetas, valores] for (nombre, etiquetas), valores in acumulado.items()]}, f)
+            os.replace(f"{ruta_acumulado}.tmp", ruta_acumulado)
+            os.remove(ruta)
+
+    def _sumar_series(self, series, instantanea, con_indicadores=True):
+        """Suma a 'series' las series de una instantánea leída de disco (las etiquetas vuelven como listas)."""
+        for nombre, etiquetas, valores in instantanea:
+            definicion = self._definiciones.get(nombre)
+            if definicion is None or (definicion[0] == "gauge" and not con_indicadores):
+                continue
+            clave = (nombre, tuple(tuple(par) for par in etiquetas))
+            total = series.get(clave)
+            series[clave] = valores if total is None else [a + b for a, b in zip(total, valores)]
+
+    def _series_compartidas(self):
+        """Suma las instantáneas de todos los procesos (y lo acumulado de los que terminaron) y agrupa sus recolectadas por pid."""
+        self.guardar_instantanea()
+        series, recolectadas = {}, []
+        with self._bloquear(fcntl.LOCK_SH):
+            for nombre_archivo in sorted(os.listdir(self.directorio)):
+                raiz, extension = os.path.splitext(nombre_archivo)
+                if extension != ".json":
+                    continue
+                try:
+                    with open(os.path.join(self.directorio, nombre_archivo)) as f:
+                        instantanea = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                self._sumar_series(series, instantanea["series"])
+                for nombre, tipo, ayuda, valores in instantanea.get("recolectadas", []):
+                    recolectadas.append((nombre, tipo, ayuda, [(dict(etiquetas, pid=raiz), valor) for etiquetas, valor in valores]))
+        return series, recolectadas
+
+    def _series_propias(self):
+        """Suma los fragmentos de este proceso: {(nombre, etiquetas): valores}."""
+        series = {}
+        for lock, series_fragmento in self._fragmentos:
+            with lock:
+                for clave, valores in series_fragmento.items():
+                    total = series.get(clave)
+                    series[clave] = list(valores) if total is None else [a + b for a, b in zip(total, valores)]
+        return series
+
+    def _recolectar(self):
+        """Llama a los recolectores y devuelve sus métricas; un recolector que falla no impide exportar el resto."""
+        recolectadas = []
+        for recolector in self._recolectores:
+            try:
+                recolectadas.extend(recolector())
+            except Exception as e:
+                print(f"Error al recolectar métricas: {e}")
+        return recolectadas
+
+    def _formatear_etiquetas(self, etiquetas, extra=None):
+        pares = list(etiquetas) + (list(extra) if extra else [])
+        if not pares:
+            return ""
+        texto = ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares)
+        return "{" + texto + "}"
+
+    def exportar(self):
+        """Devuelve todas las métricas (de todos los procesos, si se comparten) en formato de texto de Prometheus."""
+        if self.directorio is not None:
+            series, recolectadas = self._series_compartidas()
+        else:
+            series, recolectadas = self._series_propias(), self._recolectar()
+
+        lineas = []
+        for nombre, (tipo, ayuda, limites) in self._definiciones.items():
+            nombre_completo = f"{self.prefijo}_{nombre}"
+            lineas.append(f"# HELP {nombre_completo} {ayuda}")
+            lineas.append(f"# TYPE {nombre_completo} {tipo}")
+            for (nombre_serie, etiquetas), total in series.items():
+                if nombre_serie != nombre:
+                    continue
+                if tipo != "histogram":
+                    lineas.append(f"{nombre_completo}{self._formatear_etiquetas(etiquetas)} {_formatear_valor(total[0])}")
+                    continue
+                acumulado = 0
+                for limite, cantidad in zip(limites, total):
+                    acumulado += cantidad
+                    lineas.append(f"{nombre_completo}_bucket{self._formatear_etiquetas(etiquetas, [('le', f'{limite:g}')])} {_formatear_valor(acumulado)}")
+                lineas.append(f"{nombre_completo}_bucket{self._formatear_etiquetas(etiquetas, [('le', '+Inf')])} {_formatear_valor(total[-1])}")
+                lineas.append(f"{nombre_completo}_sum{self._formatear_etiquetas(etiquetas)} {_formatear_valor(total[-2])}")
+                lineas.append(f"{nombre_completo}_count{self._formatear_etiquetas(etiquetas)} {_formatear_valor(total[-1])}")
+
+        # Las series de una misma métrica van juntas bajo un solo HELP/TYPE, aunque vengan de varios procesos
+        agrupadas = {}
+        for nombre, tipo, ayuda, valores in recolectadas:
+            agrupadas.setdefault(nombre, (tipo, ayuda, []))[2].extend(valores)
+        for nombre, (tipo, ayuda, valores) in agrupadas.items():
+            nombre_completo = f"{self.prefijo}_{nombre}"
+            lineas.append(f"# HELP {nombre_completo} {ayuda}")
+            lineas.append(f"# TYPE {nombre_completo} {tipo}")
+            for etiquetas, valor in valores:
+                lineas.append(f"{nombre_completo}{self._formatear_etiquetas(sorted(etiquetas.items()))} {_formatear_valor(valor)}")
+        return "\n".join(lineas) + "\n"
@@ -0,0 +1,144 @@
+import os
+import cv2
+import numpy as np
+
+class ModeloFondo:
+    def __init__(self, umbral_minimo=25, factor_ruido=1.5, max_primer_plano=0.6, max_deriva_borde=0.2, ancho_borde=0.05):
+        """
+        Modelo de fondo estático para una cámara fija: se aprende una vez a partir de unas pocas imágenes de la cinta
+        vacía y después cada imagen se segmenta con una diferencia y un umbral por píxel, sin el filtro LAB, la
+        conversión a HSV ni las operaciones morfológicas del método por color.
+
+        :param umbral_minimo: Diferencia mínima (0-255, en el canal que más cambie) para considerar un píxel primer plano.
+        :param factor_ruido: Multiplica la variación de cada píxel entre las imágenes de calibración para su umbral.
+        :param max_primer_plano: Si más de esta fracción de la imagen resulta primer plano, se considera que la escena cambió.
+        :param max_deriva_borde: Fracción máxima de primer plano en el borde de la imagen, donde se espera solo fondo.
+        :param ancho_borde: Ancho del borde, como fracción del lado de la imagen.
+        """
+        self.umbral_minimo = umbral_minimo
+        self.factor_ruido = factor_ruido
+        self.max_primer_plano = max_primer_plano
+        self.max_deriva_borde = max_deriva_borde
+        self.ancho_borde = ancho_borde
+        self.fondo = None
+        self.umbral = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    @property
+    def calibrado(self):
+        return self.fondo is not None
+
+    def calibrar(self, imagenes, ancho_maximo=None):
+        """
+        Aprende el fondo como la mediana por píxel de las imágenes (BGR, todas del mismo tamaño) y el umbral de cada
+        píxel a partir de cuánto varía entre ellas.
+
+        :param ancho_maximo: Reduce las imágenes más anchas igual que ProcesadorVideo, para que el fondo tenga el
+                             tamaño de los frames que se van a clasificar.
+        """
+        if ancho_maximo is not None:
+            imagenes = [cv2.resize(imagen, (ancho_maximo, imagen.shape[0] * ancho_maximo // imagen.shape[1]), interpolation=cv2.INTER_AREA)
+                        if imagen.shape[1] > ancho_maximo else imagen for imagen in imagenes]
+        if len(imagenes) == 0:
+            raise ValueError("Se necesita al menos una imagen de la cinta vacía para calibrar el fondo.")
+        forma = imagenes[0].shape
+        if any(imagen.shape != forma for imagen in imagenes):
+            raise ValueError("Las imágenes de calibración deben tener todas el mismo tamaño.")
+
+        pila = np.stack(imagenes)
+        # np.partition conserva uint8 (np.median pasaría toda la pila a float64)
+        self.fondo = np.ascontiguousarray(np.partition(pila, len(imagenes) // 2, axis=0)[len(imagenes) // 2])
+
+        variacion = np.zeros(forma[:2], dtype=np.uint8)
+        for imagen in imagenes:
+            cv2.max(variacion, self.diferencia_maxima(imagen), dst=variacion)
+        umbral = np.maximum(variacion.astype(np.float32) * self.factor_ruido, self.umbral_minimo)
+        self.umbral = np.clip(umbral, 0, 255).astype(np.uint8)
+        print(f"Fondo calibrado con {len(imagenes)} imágenes de {forma[1]}x{forma[0]}.")
+
+    def calibrar_desde_archivos(self, rutas, ancho_maximo=None):
+        imagenes = []
+        for ruta in rutas:
+            imagen = cv2.imread(ruta)
+            if imagen is None:
+                raise ValueError(f"No se pudo cargar la imagen de calibración: {ruta}")
+            imagenes.append(imagen)
+        self.calibrar(imagenes, ancho_maximo)
+
+    def calibrar_desde_video(self, ruta_video, cantidad=10, cada_n_frames=1, ancho_maximo=None):
+        """Calibra con los primeros frames de un video en el que la cinta está vacía."""
+        captura = cv2.VideoCapture(ruta_video)
+        if not captura.isOpened():
+            raise ValueError(f"No se pudo abrir el video: {ruta_video}")
+        imagenes = []
+        indice = 0
+        try:
+            while len(imagenes) < cantidad:
+                exito, frame = captura.read()
+                if not exito:
+                    break
+                if indice % cada_n_frames == 0:
+                    imagenes.append(frame)
+                indice += 1
+        finally:
+            captura.release()
+        self.calibrar(imagenes, ancho_maximo)
+
+    def diferencia_maxima(self, imagen):
+        """Diferencia absoluta con el fondo en el canal que más cambia, por píxel (uint8)."""
+        b, g, r = cv2.split(cv2.absdiff(imagen, self.fondo))
+        cv2.max(b, g, dst=b)
+        cv2.max(b, r, dst=b)
+        return b
+
+    def mascara_fondo(self, imagen):
+        """
+        Segmenta la imagen contra el fondo aprendido.
+
+        :return: (mascara, motivo). La máscara vale 255 en el fondo, como la del método HSV. Si la imagen no es del
+                 tamaño calibrado o la escena parece haber cambiado (luz, cámara movida), la máscara es None y el motivo
+                 explica por qué, para volver al método HSV.
+        """
+        if not self.calibrado:
+            return None, "el fondo no está calibrado"
+        if imagen.shape != self.fondo.shape:
+            return None, f"la imagen mide {imagen.shape[1]}x{imagen.shape[0]} y el fondo {self.fondo.shape[1]}x{self.fondo.shape[0]}"
+
+        primer_plano = cv2.compare(self.diferencia_maxima(imagen), self.umbral, cv2.CMP_GT)
+        primer_plano = cv2.morphologyEx(primer_plano, cv2.MORPH_OPEN, self._kernel)
+
+        fraccion = cv2.countNonZero(primer_plano) / primer_plano.size
+        if fraccion > self.max_primer_plano:
+            return None, f"{fraccion:.0%} de la imagen difiere del fondo"
+
+        alto, ancho = primer_plano.shape
+        borde = max(1, int(min(alto, ancho) * self.ancho_borde))
+        en_borde = (cv2.countNonZero(primer_plano[:borde]) + cv2.countNonZero(primer_plano[-borde:])
+                    + cv2.countNonZero(primer_plano[borde:-borde, :borde]) + cv2.countNonZero(primer_plano[borde:-borde, -borde:]))
+        pixeles_borde = 2 * borde * ancho + 2 * borde * (alto - 2 * borde)
+        if en_borde / pixeles_borde > self.max_deriva_borde:
+            return None, f"{en_borde / pixeles_borde:.0%} del borde difiere del fondo"
+
+        return cv2.bitwise_not(primer_plano), None
+
+    def guardar(self, ruta):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(ruta, 'wb') as f:
+            np.savez_compressed(f, fondo=self.fondo, umbral=self.umbral,
+                                parametros=np.array([self.umbral_minimo, self.factor_ruido, self.max_primer_plano,
+                                                     self.max_deriva_borde, self.ancho_borde], dtype=np.float64))
+        print(f"Modelo de fondo guardado en: {ruta}")
+
+    @classmethod
+    def cargar(cls, ruta):
+        if not os.path.exists(ruta):
+            print(f"Error: No se encontró el modelo de fondo en: {ruta}")
+            raise FileNotFoundError(f"Modelo de fondo '{ruta}' no encontrado.")
+        with np.load(ruta) as datos:
+            umbral_minimo, factor_ruido, max_primer_plano, max_deriva_borde, ancho_borde = datos['parametros'].tolist()
+            modelo = cls(int(umbral_minimo), factor_ruido, max_primer_plano, max_deriva_borde, ancho_borde)
+            modelo.fondo = datos['fondo']
+            modelo.umbral = datos['umbral']
+        return modelo
@@ -0,0 +1,142 @@
+import os
+import io
+import json
+import time
+import threading
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+def memoria_rss():
+    """Memoria residente actual del proceso en bytes (None si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def memoria_procesos(pid, con_pss=True):
+    """
+    Suma la memoria del proceso y de todos sus descendientes (los trabajadores del servidor prefork o del pool de
+    extracción), en bytes.
+
+    Devuelve (rss, pss): el PSS reparte las páginas compartidas entre los procesos que las usan, así que no cuenta
+    N veces los modelos heredados copy-on-write. Leerlo es más lento; con con_pss=False se devuelve None en su lugar.
+    Si el proceso ya no existe devuelve (None, None).
+    """
+    pendientes, rss, pss = [pid], 0, 0 if con_pss else None
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with open(f"/proc/{actual}/statm") as f:
+                rss += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            if pss is not None:
+                try:
+                    with open(f"/proc/{actual}/smaps_rollup") as f:
+                        pss += next(int(linea.split()[1]) * 1024 for linea in f if linea.startswith("Pss:"))
+                except (OSError, StopIteration):
+                    pss = None
+            with open(f"/proc/{actual}/task/{actual}/children") as f:
+                pendientes.extend(int(hijo) for hijo in f.read().split())
+        except (OSError, ValueError):
+            if actual == pid:
+                return None, None
+    return rss, pss
+
+
+class Perfilador:
+    def __init__(self, directorio=None):
+        """
+        Si se indica un directorio, registra el tiempo y la memoria de cada etapa de una ejecución y la perfila
+        completa con cProfile. Solo se perfila el proceso que lo crea: el trabajo que hacen los procesos hijos
+        (por ejemplo, un pool de extracción) aparece como espera, y su memoria solo en el pico con hijos.
+
+        :param directorio: Carpeta donde guardar perfil.prof, perfil.txt (pstats) y etapas.json.
+                           Si es None el perfilador está inactivo y las etapas no se miden.
+        """
+        self.directorio = directorio
+        self.etapas = []
+        self._perfil = None
+        self._inicio = None
+
+    @property
+    def activo(self):
+        return self.directorio is not None
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self.activo:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+
+    @contextmanager
+    def etapa(self, nombre, intervalo_muestreo=0.01):
+        """
+        Mide el tiempo real, el tiempo de CPU y la memoria (RSS al terminar y pico) de un bloque. El pico se toma
+        muestreando el RSS durante la etapa (ru_maxrss es el máximo desde que arrancó el proceso y repetiría el de
+        una etapa anterior), tanto del proceso solo como junto con sus procesos hijos (por ejemplo, los trabajadores).
+        Si el perfilador está inactivo no mide nada, para no pagar el hilo de muestreo en las ejecuciones normales.
+        """
+        if not self.activo:
+            yield
+            return
+
+        inicio = time.perf_counter()
+        inicio_cpu = time.process_time()
+        rss_inicial = memoria_rss()
+        picos = [rss_inicial or 0, memoria_procesos(os.getpid(), con_pss=False)[0] or 0]
+        detener = threading.Event()
+
+        def muestrear():
+            while not detener.wait(intervalo_muestreo):
+                picos[0] = max(picos[0], memoria_rss() or 0)
+                picos[1] = max(picos[1], memoria_procesos(os.getpid(), con_pss=False)[0] or 0)
+
+        hilo = threading.Thread(target=muestrear, daemon=True)
+        hilo.start()
+        try:
+            yield
+        finally:
+            detener.set()
+            hilo.join()
+            rss_final = memoria_rss()
+            self.etapas.append({
+                "etapa": nombre,
+                "tiempo": time.perf_counter() - inicio,
+                "tiempo_cpu": time.process_time() - inicio_cpu,
+                "rss_inicial": rss_inicial,
+                "rss_final": rss_final,
+                "rss_pico": max(picos[0], rss_final or 0),
+                "rss_pico_con_hijos": max(picos[1], rss_final or 0),
+            })
+
+    def mostrar_resumen(self):
+        """Muestra una tabla con el tiempo y la memoria de cada etapa."""
+        mb = lambda valor: f"{valor / 2**20:.1f}" if valor is not None else "-"
+        print("\nResumen por etapa:")
+        print(f"{'Etapa':<32}{'Tiempo (s)':>12}{'CPU (s)':>10}{'RSS final (MB)':>16}{'Pico (MB)':>11}{'Pico con hijos (MB)':>21}")
+        for etapa in self.etapas:
+            print(f"{etapa['etapa']:<32}{etapa['tiempo']:>12.3f}{etapa['tiempo_cpu']:>10.3f}{mb(etapa['rss_final']):>16}"
+                  f"{mb(etapa['rss_pico']):>11}{mb(etapa['rss_pico_con_hijos']):>21}")
+        if self._inicio is not None:
+            print(f"Tiempo total: {time.perf_counter() - self._inicio:.3f} s")
+
+    def finalizar(self, lineas_pstats=30):
+        """Detiene cProfile, guarda los resultados en el directorio y muestra el resumen por etapa."""
+        if self._perfil is not None:
+            self._perfil.disable()
+            ruta_prof = os.path.join(self.directorio, "perfil.prof")
+            self._perfil.dump_stats(ruta_prof)
+
+            salida = io.StringIO()
+            estadisticas = pstats.Stats(self._perfil, stream=salida)
+            estadisticas.sort_stats("cumulative").print_stats(lineas_pstats)
+            with open(os.path.join(self.directorio, "perfil.txt"), "w") as f:
+                f.write(salida.getvalue())
+            with open(os.path.join(self.directorio, "etapas.json"), "w") as f:
+                json.dump(self.etapas, f, indent=4)
+            self._perfil = None
+            print(f"Perfil guardado en {self.directorio} (perfil.prof, perfil.txt, etapas.json). "
+                  f"Para explorarlo: python -m pstats {ruta_prof}")
+        self.mostrar_resumen()
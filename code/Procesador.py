@@ -1,16 +1,136 @@
 import os
 import json
+import hashlib
+import time
+import threading
+import tracemalloc
+from collections import deque
+from functools import partial, lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from ProcesadorAudio import ProcesadorAudio
 from ProcesadorImagen import ProcesadorImagen
+from ModeloFondo import ModeloFondo
+from Perfilador import memoria_rss, memoria_procesos
+from ControlCalidad import ImagenRechazada, MOTIVOS
+
+def extraer_caracteristicas_audio(archivo_audio):
+    """Ejecuta el pipeline de audio sobre un archivo y devuelve sus características como lista."""
+    procesador_audio = ProcesadorAudio(archivo_audio)
+    procesador_audio.cargar_audio()
+    procesador_audio.preprocesar_audio()
+    procesador_audio.extraer_caracteristicas()
+    return procesador_audio.caracteristicas.tolist()
+
+@lru_cache(maxsize=None)
+def cargar_modelo_fondo(ruta):
+    """Carga un modelo de fondo una sola vez por proceso (los trabajadores creados con fork heredan el ya cargado)."""
+    return ModeloFondo.cargar(ruta)
+
+def extraer_caracteristicas_imagen(archivo_imagen, ruta_fondo=None):
+    """
+    Ejecuta el pipeline de imagen sobre un archivo y devuelve sus características como lista.
+
+    :param ruta_fondo: Modelo de fondo calibrado para una cámara fija, o None para eliminar el fondo por HSV.
+    """
+    modelo_fondo = cargar_modelo_fondo(ruta_fondo) if ruta_fondo else None
+    procesador_imagen = ProcesadorImagen(archivo_imagen, conservar_intermedios=False, modelo_fondo=modelo_fondo)
+    procesador_imagen.cargar_imagen()
+    procesador_imagen.aplicar_retoque_lab()
+    procesador_imagen.eliminar_fondo()
+    procesador_imagen.extraer_caracteristicas()
+    return procesador_imagen.caracteristicas.tolist()
+
+def extraer_midiendo_memoria(extraer, archivo, intervalo_muestreo=0.005, con_tracemalloc=True):
+    """
+    Ejecuta extraer(archivo) y mide su pico de memoria. tracemalloc registra lo que reservan Python y numpy, y el RSS
+    muestreado en un hilo cubre además lo que reservan OpenCV y las bibliotecas en C, que tracemalloc no ve.
+
+    :param con_tracemalloc: Si es False solo se muestrea el RSS, que no enlentece cada reserva de memoria como tracemalloc.
+    :return: (caracteristicas, memoria) con memoria = {'tracemalloc_pico', 'rss_inicial', 'rss_pico', 'incremento'} en
+             bytes ('tracemalloc_pico' es None sin tracemalloc).
+    """
+    ya_activo = tracemalloc.is_tracing()
+    if con_tracemalloc:
+        if not ya_activo:
+            tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+    rss_inicial = memoria_rss() or 0
+    pico = [rss_inicial]
+    detener = threading.Event()
+
+    def muestrear():
+        while not detener.wait(intervalo_muestreo):
+            pico[0] = max(pico[0], memoria_rss() or 0)
+
+    hilo = threading.Thread(target=muestrear, daemon=True)
+    hilo.start()
+    try:
+        caracteristicas = extraer(archivo)
+    finally:
+        detener.set()
+        hilo.join()
+        if con_tracemalloc:
+            _, pico_tracemalloc = tracemalloc.get_traced_memory()
+            if not ya_activo:
+                tracemalloc.stop()
+    rss_pico = max(pico[0], memoria_rss() or 0)
+    tracemalloc_pico = pico_tracemalloc - base if con_tracemalloc else None
+    return caracteristicas, {
+        "tracemalloc_pico": tracemalloc_pico,
+        "rss_inicial": rss_inicial,
+        "rss_pico": rss_pico,
+        # Memoria adicional que necesitó el archivo: el RSS puede no crecer si se reutilizan páginas ya reservadas
+        "incremento": max(rss_pico - rss_inicial, tracemalloc_pico or 0),
+    }
 
 class Procesador:
-    def __init__(self, rutas_db):
+    def __init__(self, rutas_db, cache_caracteristicas=None, n_trabajadores=1, medir_memoria=False, presupuesto_memoria=None,
+                 control_calidad=None, ruta_fondo=None):
         """
         Inicializa el procesador general.
 
         :param rutas_db: Lista de rutas a las carpetas que contienen archivos de audio e imagen.
+        :param cache_caracteristicas: CacheCaracteristicas opcional para no volver a extraer archivos ya procesados.
+        :param n_trabajadores: Procesos que extraen características en paralelo (1 procesa todo en este proceso).
+        :param medir_memoria: Si es True, registra el pico de memoria de cada archivo (con tracemalloc y RSS) y lo
+                              muestra en el resumen.
+        :param presupuesto_memoria: Memoria máxima en bytes de este proceso más sus trabajadores. Se envían archivos al
+                                    pool solo mientras la memoria estimada quede por debajo; la estimación sale del
+                                    RSS muestreado, sin tracemalloc salvo que también se pida medir_memoria.
+        :param control_calidad: ControlCalidad opcional que revisa una vista previa de cada imagen antes de extraerla.
+        :param ruta_fondo: Modelo de fondo calibrado (ver 'main.py calibrar-fondo') con que eliminar el fondo de las
+                           imágenes, o None para usar el método HSV.
         """
         self.rutas_db = rutas_db
+        self.cache_caracteristicas = cache_caracteristicas
+        self.n_trabajadores = max(1, n_trabajadores)
+        self.presupuesto_memoria = presupuesto_memoria
+        self.medir_memoria = medir_memoria
+        # El presupuesto necesita el incremento de cada archivo, pero alcanza con muestrear el RSS
+        self.muestrear_memoria = medir_memoria or presupuesto_memoria is not None
+        self._pool = None
+        self._memoria_reposo = None
+        # Memoria por archivo, mayor incremento observado por tipo, cuántas veces (y cuánto tiempo) el presupuesto
+        # retuvo archivos en la cola y máximo de archivos procesándose a la vez (sin contar los enviados que esperan
+        # un trabajador libre)
+        self.memoria_archivos = []
+        self.estimacion_memoria = {}
+        self.esperas_memoria = 0
+        self.tiempo_espera_memoria = 0.0
+        self.max_en_curso = 0
+        self.control_calidad = control_calidad
+        self.ruta_fondo = ruta_fondo
+        # Las características de imagen dependen del modelo de fondo: la cache las guarda aparte para cada modelo
+        self.tipos_cache = {'audio': 'audio', 'imagen': 'imagen'}
+        if ruta_fondo is not None:
+            cargar_modelo_fondo(ruta_fondo)
+            with open(ruta_fondo, 'rb') as f:
+                self.tipos_cache['imagen'] = f"imagen-fondo-{hashlib.sha256(f.read()).hexdigest()[:16]}"
+        # Imágenes rechazadas (o solo marcadas, si el control no rechaza) por motivo
+        self.imagenes_rechazadas = {}
+        self.imagenes_marcadas = {}
         self.datos_audio = []
         self.datos_imagen = []
         self.etiquetas_audio = []
@@ -38,6 +158,147 @@ class Procesador:
         """Genera la etiqueta basada en el nombre de la carpeta."""
         return os.path.basename(os.path.normpath(carpeta))
 
+    def extraer_archivos(self, tipo, archivos, extraer):
+        """
+        Extrae las características de varios archivos, tomando de la cache las ya conocidas y repartiendo el resto
+        entre los procesos trabajadores si hay más de uno.
+
+        :return: Lista de tuplas (archivo, caracteristicas, error) en el mismo orden que 'archivos'.
+        """
+        resultados = {}
+        pendientes = []
+        for archivo in archivos:
+            clave = None
+            if self.cache_caracteristicas is not None:
+                try:
+                    clave, caracteristicas = self.cache_caracteristicas.buscar(self.tipos_cache[tipo], archivo)
+                except OSError as e:
+                    resultados[archivo] = (None, e)
+                    continue
+                if caracteristicas is not None:
+                    print(f"Características de {tipo} tomadas de la cache: {archivo}")
+                    resultados[archivo] = (caracteristicas, None)
+                    continue
+            if tipo == 'imagen' and self.control_calidad is not None:
+                try:
+                    self.revisar_calidad(archivo)
+                except Exception as e:
+                    resultados[archivo] = (None, e)
+                    continue
+            pendientes.append((archivo, clave))
+
+        funcion = partial(extraer_midiendo_memoria, extraer, con_tracemalloc=self.medir_memoria) if self.muestrear_memoria else extraer
+        if self._pool is not None and len(pendientes) > 1:
+            extraidos = self.extraer_en_pool(tipo, pendientes, funcion)
+        else:
+            extraidos = []
+            for archivo, clave in pendientes:
+                print(f"Procesando {tipo}: {archivo}")
+                try:
+                    extraidos.append((archivo, clave, self.registrar_memoria(tipo, archivo, funcion(archivo)), None))
+                except Exception as e:
+                    extraidos.append((archivo, clave, None, e))
+
+        for archivo, clave, caracteristicas, error in extraidos:
+            if error is None and clave is not None:
+                self.cache_caracteristicas.agregar(clave, caracteristicas)
+            resultados[archivo] = (caracteristicas, error)
+        return [(archivo,) + resultados[archivo] for archivo in archivos]
+
+    def revisar_calidad(self, archivo):
+        """Revisa la vista previa de una imagen antes de enviarla a extraer; lanza ImagenRechazada si no pasa el control."""
+        resultado = self.control_calidad.verificar(archivo)
+        for motivo in resultado['motivos']:
+            self.imagenes_marcadas.setdefault(motivo, []).append(archivo)
+            print(f"Advertencia: {archivo}: {MOTIVOS[motivo]}")
+
+    def extraer_en_pool(self, tipo, pendientes, funcion):
+        """
+        Reparte los archivos entre los procesos del pool. Con presupuesto de memoria, se envía un archivo nuevo solo
+        si la memoria actual (o la reservada por los archivos en curso) más la estimada para él entra en el presupuesto.
+
+        :return: Lista de tuplas (archivo, clave, caracteristicas, error) en el orden de 'pendientes'.
+        """
+        cola = deque(pendientes)
+        en_vuelo = {}
+        resultados = {}
+        esperando_desde = None
+        while cola or en_vuelo:
+            while cola and self.hay_memoria_disponible(tipo, len(en_vuelo)):
+                if esperando_desde is not None:
+                    self.tiempo_espera_memoria += time.perf_counter() - esperando_desde
+                    esperando_desde = None
+                archivo, clave = cola.popleft()
+                print(f"Procesando {tipo}: {archivo}")
+                en_vuelo[self._pool.submit(funcion, archivo)] = (archivo, clave)
+            self.max_en_curso = max(self.max_en_curso, min(len(en_vuelo), self.n_trabajadores))
+            if cola and esperando_desde is None:
+                # Empieza una espera: el presupuesto retiene el siguiente archivo hasta que se libere memoria
+                self.esperas_memoria += 1
+                esperando_desde = time.perf_counter()
+
+            # Con archivos en espera se vuelve a mirar la memoria periódicamente, ya que los trabajadores la liberan
+            listos, _ = wait(en_vuelo, timeout=0.2 if cola else None, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                archivo, clave = en_vuelo.pop(futuro)
+                try:
+                    resultados[archivo] = (archivo, clave, self.registrar_memoria(tipo, archivo, futuro.result()), None)
+                except Exception as e:
+                    resultados[archivo] = (archivo, clave, None, e)
+        return [resultados[archivo] for archivo, _ in pendientes]
+
+    def hay_memoria_disponible(self, tipo, en_vuelo):
+        """Indica si se puede enviar otro archivo de este tipo al pool sin superar el presupuesto de memoria."""
+        if self.presupuesto_memoria is None or en_vuelo == 0:
+            # Siempre se procesa al menos un archivo, aunque él solo supere el presupuesto
+            return True
+        estimado = self.estimacion_memoria.get(tipo)
+        if estimado is None:
+            # Hasta medir el primer archivo de este tipo se procesa de a uno
+            return False
+        memoria_actual = self.memoria_en_uso()
+        reservado = self._memoria_reposo + estimado * en_vuelo
+        return max(memoria_actual, reservado) + estimado <= self.presupuesto_memoria
+
+    def memoria_en_uso(self):
+        """
+        Memoria de este proceso más sus trabajadores. Se usa el PSS, que cuenta una sola vez las páginas compartidas
+        (las bibliotecas heredadas con fork), y el RSS si el sistema no informa el PSS.
+        """
+        rss, pss = memoria_procesos(os.getpid())
+        return pss if pss is not None else (rss or 0)
+
+    def precargar_pipelines(self):
+        """
+        Pasa un audio y una imagen sintéticos por los pipelines en este proceso antes de crear el pool: los trabajadores
+        heredan con fork las bibliotecas ya importadas y los kernels de librosa ya compilados, compartiendo esas páginas
+        en lugar de cargar cada uno su propia copia.
+        """
+        from Calentamiento import generar_audio_sintetico, generar_imagen_sintetica
+
+        print("Precargando los pipelines antes de crear los trabajadores...")
+        procesador_audio = ProcesadorAudio("precarga.wav", datos=generar_audio_sintetico())
+        procesador_audio.cargar_audio()
+        procesador_audio.preprocesar_audio()
+        procesador_audio.extraer_caracteristicas()
+        procesador_imagen = ProcesadorImagen("precarga.jpg", datos=generar_imagen_sintetica(), conservar_intermedios=False)
+        procesador_imagen.cargar_imagen()
+        procesador_imagen.aplicar_retoque_lab()
+        procesador_imagen.eliminar_fondo()
+        procesador_imagen.extraer_caracteristicas()
+
+    def registrar_memoria(self, tipo, archivo, resultado):
+        """Guarda la memoria medida de un archivo (si se midió) y devuelve sus características."""
+        if not self.muestrear_memoria:
+            return resultado
+        caracteristicas, memoria = resultado
+        self.memoria_archivos.append(dict(memoria, archivo=archivo, tipo=tipo))
+        anterior = self.estimacion_memoria.get(tipo, 0)
+        self.estimacion_memoria[tipo] = max(anterior, memoria["incremento"])
+        if self.presupuesto_memoria is not None and memoria["incremento"] > self.presupuesto_memoria > anterior:
+            print(f"Advertencia: {archivo} necesitó {memoria['incremento'] / 2**20:.1f} MB, más que todo el presupuesto de memoria.")
+        return caracteristicas
+
     def procesar_audios(self, carpeta):
         """Procesa todos los archivos de audio en una carpeta específica."""
         etiqueta = self.obtener_etiqueta(carpeta)
@@ -46,20 +307,14 @@ class Procesador:
             print(f"Advertencia: No se encontraron archivos de audio en {carpeta}.")
             return
 
-        for archivo_audio in archivos_audio:
-            print(f"Procesando audio: {archivo_audio}")
-            try:
-                procesador_audio = ProcesadorAudio(archivo_audio)
-                procesador_audio.cargar_audio()
-                procesador_audio.preprocesar_audio()
-                procesador_audio.extraer_caracteristicas()
-                
-                self.datos_audio.append(procesador_audio.caracteristicas.tolist()) 
+        for archivo_audio, caracteristicas, error in self.extraer_archivos('audio', archivos_audio, extraer_caracteristicas_audio):
+            if error is None:
+                self.datos_audio.append(caracteristicas)
                 self.etiquetas_audio.append(etiqueta)
                 self.audios_exitosos += 1
-                print(f"Características de audio extraídas: {procesador_audio.caracteristicas}")
-            except Exception as e:
-                print(f"Error al procesar el audio {archivo_audio}: {e}")
+                print(f"Características de audio extraídas: {caracteristicas}")
+            else:
+                print(f"Error al procesar el audio {archivo_audio}: {error}")
                 self.errores_audio += 1
                 self.archivos_audio_error.append(archivo_audio)
 
@@ -71,32 +326,41 @@ class Procesador:
             print(f"Advertencia: No se encontraron archivos de imagen en {carpeta}.")
             return
 
-        for archivo_imagen in archivos_imagen:
-            print(f"Procesando imagen: {archivo_imagen}")
-            try:
-                procesador_imagen = ProcesadorImagen(archivo_imagen)
-                procesador_imagen.cargar_imagen()
-                procesador_imagen.aplicar_retoque_lab()
-                procesador_imagen.eliminar_fondo()
-                procesador_imagen.extraer_caracteristicas()
-                
-                self.datos_imagen.append(procesador_imagen.caracteristicas.tolist())
+        extraer = partial(extraer_caracteristicas_imagen, ruta_fondo=self.ruta_fondo)
+        for archivo_imagen, caracteristicas, error in self.extraer_archivos('imagen', archivos_imagen, extraer):
+            if error is None:
+                self.datos_imagen.append(caracteristicas)
                 self.etiquetas_imagen.append(etiqueta)
                 self.imagenes_exitosas += 1
-                print(f"Características de imagen extraídas: {procesador_imagen.caracteristicas}")
-            except Exception as e:
-                print(f"Error al procesar la imagen {archivo_imagen}: {e}")
+                print(f"Características de imagen extraídas: {caracteristicas}")
+            elif isinstance(error, ImagenRechazada):
+                print(f"{archivo_imagen}: {error}")
+                for motivo in error.motivos:
+                    self.imagenes_rechazadas.setdefault(motivo, []).append(archivo_imagen)
+            else:
+                print(f"Error al procesar la imagen {archivo_imagen}: {error}")
                 self.errores_imagen += 1
                 self.archivos_imagen_error.append(archivo_imagen)
 
     def procesar_varias_carpetas(self):
         """Procesa archivos de audio e imagen en todas las carpetas especificadas."""
-        for carpeta in self.rutas_db:
-            print(f"\nProcesando carpeta: {carpeta}")
-            self.procesar_audios(carpeta)
-            self.procesar_imagenes(carpeta)
+        if self.n_trabajadores > 1:
+            self.precargar_pipelines()
+            self._pool = ProcessPoolExecutor(max_workers=self.n_trabajadores)
+            self._memoria_reposo = self.memoria_en_uso()
+        try:
+            for carpeta in self.rutas_db:
+                print(f"\nProcesando carpeta: {carpeta}")
+                self.procesar_audios(carpeta)
+                self.procesar_imagenes(carpeta)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        if self.cache_caracteristicas is not None:
+            self.cache_caracteristicas.guardar()
 
-    def guardar_datos(self):
+    def guardar_datos(self, ruta="saves/datos_procesados.json"):
         """Guarda los datos de audio e imagen procesados en un archivo JSON."""
         datos = {
             "audio": self.datos_audio,
@@ -104,9 +368,9 @@ class Procesador:
             "etiquetas_audio": self.etiquetas_audio,
             "etiquetas_imagen": self.etiquetas_imagen
         }
-        with open("saves/datos_procesados.json", "w") as f:
+        with open(ruta, "w") as f:
             json.dump(datos, f, indent=4)
-        print("Datos procesados guardados en: saves/datos_procesados.json")
+        print(f"Datos procesados guardados en: {ruta}")
 
     def mostrar_resumen(self):
         """Muestra un resumen del procesamiento de los archivos."""
@@ -124,6 +388,42 @@ class Procesador:
             print("Archivos de imagen con errores:")
             for archivo in self.archivos_imagen_error:
                 print(f" - {archivo}")
+        self.mostrar_resumen_calidad()
+
+        if self.memoria_archivos:
+            self.mostrar_resumen_memoria()
+
+    def mostrar_resumen_calidad(self):
+        """Muestra las imágenes rechazadas o marcadas por el control de calidad, agrupadas por motivo."""
+        for titulo, por_motivo in (("rechazadas", self.imagenes_rechazadas), ("marcadas", self.imagenes_marcadas)):
+            if not por_motivo:
+                continue
+            print(f"Imágenes {titulo} por el control de calidad: {len(set().union(*por_motivo.values()))}")
+            for motivo, archivos in por_motivo.items():
+                print(f" {MOTIVOS[motivo].capitalize()} ({len(archivos)}):")
+                for archivo in archivos:
+                    print(f"  - {archivo}")
+
+    def mostrar_resumen_memoria(self, cantidad_mayores=5):
+        """Muestra el pico de memoria por tipo de archivo y los archivos que más memoria necesitaron."""
+        mb = lambda valor: f"{valor / 2**20:.1f} MB"
+        print("\nMemoria por archivo:")
+        for tipo in ("audio", "imagen"):
+            registros = [r for r in self.memoria_archivos if r["tipo"] == tipo]
+            if not registros:
+                continue
+            incrementos = [r["incremento"] for r in registros]
+            pico_tracemalloc = f"pico tracemalloc {mb(max(r['tracemalloc_pico'] for r in registros))}, " if self.medir_memoria else ""
+            print(f"{tipo.capitalize()}: {len(registros)} archivos, incremento medio {mb(sum(incrementos) / len(incrementos))}, "
+                  f"máximo {mb(max(incrementos))}, {pico_tracemalloc}"
+                  f"RSS pico de un proceso {mb(max(r['rss_pico'] for r in registros))}")
+        print("Archivos que más memoria necesitaron:")
+        for registro in sorted(self.memoria_archivos, key=lambda r: r["incremento"], reverse=True)[:cantidad_mayores]:
+            detalle = f" (tracemalloc {mb(registro['tracemalloc_pico'])})" if self.medir_memoria else ""
+            print(f" - {registro['archivo']}: {mb(registro['incremento'])}{detalle}")
+        if self.presupuesto_memoria is not None:
+            print(f"Presupuesto de memoria: {mb(self.presupuesto_memoria)}; máximo de archivos en curso a la vez: "
+                  f"{self.max_en_curso}; esperas por memoria: {self.esperas_memoria} ({self.tiempo_espera_memoria:.1f} s)")
 
 if __name__ == "__main__":
     ruta_real = input("Ingrese la ruta de la carpeta para probar: ").strip()
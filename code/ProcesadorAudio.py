@@ -1,19 +1,22 @@
 import numpy as np
 import os
-import pyaudio
-import tkinter as tk
+import io
 from scipy.io import wavfile
-import scipy.signal as signal
-from python_speech_features import mfcc
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
 import threading
 
+# Las dependencias pesadas se importan en los métodos que las usan: scipy.signal en los filtros,
+# python_speech_features y librosa en la extracción de características, y pyaudio, tkinter y matplotlib
+# en la reproducción y visualización. Así importar este módulo es rápido y el servidor sin interfaz
+# gráfica no depende de ellas.
+
 class ProcesadorAudio:
-    def __init__(self, ruta_audio):
-        """param: ruta_audio: Ruta al archivo de audio (.wav)."""
+    def __init__(self, ruta_audio, datos=None):
+        """
+        param: ruta_audio: Ruta al archivo de audio (.wav), o nombre descriptivo si se indican los datos.
+        param: datos: Contenido del archivo WAV (bytes) para leerlo en memoria sin acceder al disco.
+        """
         self.ruta_audio = ruta_audio
+        self.datos = datos
         self.audio = None
         self.tasa_muestreo = None
         self.caracteristicas = None
@@ -29,9 +32,10 @@ class ProcesadorAudio:
         self.caracteristicas_spectral_contrast = None
 
     def cargar_audio(self):
-        """Carga el audio desde la ruta especificada usando scipy.io.wavfile."""
+        """Carga el audio desde la ruta especificada (o desde los datos en memoria) usando scipy.io.wavfile."""
         try:
-            self.tasa_muestreo, audio = wavfile.read(self.ruta_audio)
+            origen = io.BytesIO(self.datos) if self.datos is not None else self.ruta_audio
+            self.tasa_muestreo, audio = wavfile.read(origen)
 
             # Verificar si el audio es estéreo y seleccionar un solo canal
             if audio.ndim == 2:
@@ -68,6 +72,7 @@ class ProcesadorAudio:
             raise
 
     def filtrar_pasabajo(self, datos, frecuencia_corte=3000):
+        import scipy.signal as signal
         frecuencia_nyquist = self.tasa_muestreo / 2.0
         corte_normalizado = frecuencia_corte / frecuencia_nyquist
         b, a = signal.butter(4, corte_normalizado, btype='low', analog=False)
@@ -76,6 +81,7 @@ class ProcesadorAudio:
         return datos_filtrados
 
     def filtrar_pasaalto(self, datos, frecuencia_corte=300):
+        import scipy.signal as signal
         frecuencia_nyquist = self.tasa_muestreo / 2.0
         corte_normalizado = frecuencia_corte / frecuencia_nyquist
         b, a = signal.butter(4, corte_normalizado, btype='high', analog=False)
@@ -158,6 +164,9 @@ class ProcesadorAudio:
         if self.audio_final is None:
             raise ValueError("El audio no ha sido preprocesado. Llama a 'preprocesar_audio()' primero.")
 
+        from python_speech_features import mfcc
+        import librosa
+
         # Convertir audio a float para librosa
         audio_float = self.audio_final.astype(float)
         audio_float /= np.max(np.abs(audio_float))  # Normalizar entre -1 y 1
@@ -189,6 +198,7 @@ class ProcesadorAudio:
 
     def reproducir_audio(self, datos):
         try:
+            import pyaudio
             p = pyaudio.PyAudio()
 
             formato = pyaudio.paInt16
@@ -225,6 +235,7 @@ class ProcesadorAudio:
             print("Audio preprocesado no disponible.")
 
     def mostrar_interfaz(self):
+        import tkinter as tk
         ventana = tk.Tk()
         ventana.title("Reproductor de Audio Procesado")
         ventana.geometry("300x150")
@@ -233,6 +244,42 @@ class ProcesadorAudio:
         tk.Button(ventana, text="Reproducir Filtrado y Normalizado", command=self.reproducir_preprocesado).pack(pady=10)
         ventana.mainloop()
 
+    def renderizar_resultados_png(self):
+        """
+        Dibuja la señal original y la preprocesada con su espectrograma y devuelve la figura como PNG (bytes).
+
+        Usa el backend Agg directamente, sin pyplot, por lo que no abre ventanas ni requiere interfaz gráfica.
+        """
+        if self.audio is None or self.audio_final is None:
+            raise ValueError("El audio no ha sido preprocesado. Llama a 'preprocesar_audio()' primero.")
+
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figura = Figure(figsize=(12, 8))
+        FigureCanvasAgg(figura)
+        axs = figura.subplots(3, 1)
+
+        tiempo_original = np.arange(len(self.audio)) / self.tasa_muestreo
+        axs[0].plot(tiempo_original, self.audio, linewidth=0.5)
+        axs[0].set_title("Audio Original")
+        axs[0].set_xlabel("Tiempo (s)")
+
+        tiempo_final = np.arange(len(self.audio_final)) / self.tasa_muestreo
+        axs[1].plot(tiempo_final, self.audio_final, linewidth=0.5, color='tab:orange')
+        axs[1].set_title("Audio Recortado, Filtrado y Normalizado")
+        axs[1].set_xlabel("Tiempo (s)")
+
+        axs[2].specgram(self.audio_final.astype(float), Fs=self.tasa_muestreo, NFFT=1024, noverlap=512)
+        axs[2].set_title("Espectrograma del Audio Preprocesado")
+        axs[2].set_xlabel("Tiempo (s)")
+        axs[2].set_ylabel("Frecuencia (Hz)")
+
+        figura.tight_layout()
+        salida = io.BytesIO()
+        figura.savefig(salida, format='png')
+        return salida.getvalue()
+
 if __name__ == "__main__":
     ruta_prueba = input("Ingrese la ruta del archivo para analizar: ").strip()
 
@@ -1,11 +1,25 @@
 import cv2
 import numpy as np
 import os
-import matplotlib.pyplot as plt
+import io
 
 class ProcesadorImagen:
-    def __init__(self, ruta_imagen, lower_white=0, upper_white=255):
+    def __init__(self, ruta_imagen, lower_white=0, upper_white=255, datos=None, conservar_intermedios=True, modelo_fondo=None):
+        """
+        :param ruta_imagen: Ruta al archivo de imagen (o nombre descriptivo si se indican los datos).
+        :param datos: Contenido codificado de la imagen (bytes) para decodificarla en memoria sin leer el disco.
+        :param conservar_intermedios: Si es False, se liberan las imágenes intermedias apenas dejan de usarse y no se
+                                      generan las de visualización (contorno y color), para procesar lotes con menos memoria.
+        :param modelo_fondo: ModeloFondo calibrado para una cámara fija. Si se indica, el fondo se elimina por diferencia
+                             con él y solo se vuelve al método HSV cuando la escena cambió.
+        """
         self.ruta_imagen = ruta_imagen
+        self.datos = datos
+        self.conservar_intermedios = conservar_intermedios
+        self.modelo_fondo = modelo_fondo
+        # Método con que se eliminó el fondo ('estatico' o 'hsv') y, si se volvió a HSV, por qué
+        self.metodo_fondo = None
+        self.motivo_respaldo = None
         self.imagen = None
         self.imagen_retoque = None
         self.caracteristicas = None
@@ -17,9 +31,16 @@ class ProcesadorImagen:
         self.imagen_contorno = None
         self.mascara_color = None
 
+        # Objetos de OpenCV reutilizables entre imágenes (por ejemplo, entre los frames de un video)
+        self._clahe = None
+        self._kernel = None
+
     def cargar_imagen(self):
         try:
-            self.imagen = cv2.imread(self.ruta_imagen)
+            if self.datos is not None:
+                self.imagen = cv2.imdecode(np.frombuffer(self.datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                self.imagen = cv2.imread(self.ruta_imagen)
             if self.imagen is None:
                 raise ValueError(f"No se pudo cargar la imagen desde la ruta: {self.ruta_imagen}")
             print(f"Imagen cargada correctamente desde {self.ruta_imagen}")
@@ -30,28 +51,65 @@ class ProcesadorImagen:
             print(f"Error al cargar la imagen: {e}")
             raise
 
+    def cargar_frame(self, frame, nombre=None):
+        """
+        Usa un frame ya decodificado (por ejemplo, de un video) como imagen a procesar, descartando los resultados
+        del anterior. Permite reutilizar el mismo procesador para todos los frames.
+        """
+        self.imagen = frame
+        if nombre is not None:
+            self.ruta_imagen = nombre
+        self.imagen_retoque = self.mascara_fondo = self.imagen_sin_fondo = None
+        self.imagen_contorno = self.mascara_color = self.caracteristicas = None
+        self.metodo_fondo = self.motivo_respaldo = None
+
     def aplicar_retoque_lab(self):
+        if self.modelo_fondo is not None and not self.conservar_intermedios:
+            # Con fondo calibrado el retoque solo hace falta si se vuelve al método HSV; se calcula en ese caso
+            return
+        self._calcular_retoque_lab()
+
+    def _calcular_retoque_lab(self):
         lab = cv2.cvtColor(self.imagen, cv2.COLOR_BGR2LAB)
         l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l_clahe = clahe.apply(l)
+        if self._clahe is None:
+            self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        l_clahe = self._clahe.apply(l)
         lab_clahe = cv2.merge((l_clahe, a, b))
         self.imagen_retoque = cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2BGR)
         print("Filtro LAB aplicado para mejorar la diferenciación.")
 
+    def mascara_fondo_hsv(self):
+        """Máscara de fondo (255 en el fondo) por umbral de saturación en HSV sobre la imagen con retoque LAB."""
+        hsv = cv2.cvtColor(self.imagen_retoque, cv2.COLOR_BGR2HSV)
+        lower_bound = np.array([0, 0, self.lower_white])
+        upper_bound = np.array([180, 30, self.upper_white])
+        mask = cv2.inRange(hsv, lower_bound, upper_bound)
+        if self._kernel is None:
+            self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel, iterations=2)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, self._kernel, iterations=1)
+        return mask
+
     def eliminar_fondo(self):
-        if self.imagen_retoque is None:
+        mask = None
+        if self.modelo_fondo is not None:
+            mask, self.motivo_respaldo = self.modelo_fondo.mascara_fondo(self.imagen)
+            if mask is None:
+                print(f"Advertencia: Se usa el método HSV en {self.ruta_imagen}: {self.motivo_respaldo}")
+                if self.imagen_retoque is None:
+                    self._calcular_retoque_lab()
+
+        if mask is None and self.imagen_retoque is None:
             print("Error: La imagen con retoques no ha sido generada.")
             raise ValueError("La imagen con retoques no ha sido generada.")
 
         try:
-            hsv = cv2.cvtColor(self.imagen_retoque, cv2.COLOR_BGR2HSV)
-            lower_bound = np.array([0, 0, self.lower_white])
-            upper_bound = np.array([180, 30, self.upper_white])
-            mask = cv2.inRange(hsv, lower_bound, upper_bound)
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, kernel, iterations=1)
+            if mask is None:
+                mask = self.mascara_fondo_hsv()
+                self.metodo_fondo = 'hsv'
+            else:
+                self.metodo_fondo = 'estatico'
             self.mascara_fondo = mask
             mask_fg = cv2.bitwise_not(mask)
             self.imagen_sin_fondo = cv2.bitwise_and(self.imagen, self.imagen, mask=mask_fg)
@@ -61,6 +119,10 @@ class ProcesadorImagen:
             if porcentaje_fondo < 0.5:
                 print(f"Advertencia: Menos del 50% del fondo eliminado en {self.ruta_imagen}")
                 self.errores_porcentaje_fondo.append(self.ruta_imagen)
+
+            if not self.conservar_intermedios:
+                # La extracción solo usa la imagen sin fondo
+                self.imagen = self.imagen_retoque = self.mascara_fondo = None
         except Exception as e:
             print(f"Error al eliminar el fondo: {e}")
             raise
@@ -94,8 +156,9 @@ class ProcesadorImagen:
                 momentos = cv2.moments(contorno)
                 hu = cv2.HuMoments(momentos).flatten()
                 hu = -np.sign(hu) * np.log10(np.abs(hu) + 1e-10)
-                self.imagen_contorno = self.imagen_sin_fondo.copy()
-                cv2.drawContours(self.imagen_contorno, [contorno], -1, (0, 255, 0), 2)
+                if self.conservar_intermedios:
+                    self.imagen_contorno = self.imagen_sin_fondo.copy()
+                    cv2.drawContours(self.imagen_contorno, [contorno], -1, (0, 255, 0), 2)
 
                 # Crear una máscara a partir del contorno
                 mascara = np.zeros_like(gris)
@@ -115,11 +178,14 @@ class ProcesadorImagen:
                         color_representativo = np.median(rgb_filtrado, axis=0).astype(np.uint8)
 
                 # Crear una imagen con el color representativo
-                self.mascara_color = np.zeros_like(self.imagen_sin_fondo)
-                self.mascara_color[mascara == 255] = color_representativo
+                if self.conservar_intermedios:
+                    self.mascara_color = np.zeros_like(self.imagen_sin_fondo)
+                    self.mascara_color[mascara == 255] = color_representativo
             else:
                 hu = np.zeros(7)
-                self.imagen_contorno = self.imagen_sin_fondo.copy()
+                color_representativo = np.array([0, 0, 0], dtype=np.uint8)
+                if self.conservar_intermedios:
+                    self.imagen_contorno = self.imagen_sin_fondo.copy()
                 print("Advertencia: No se encontraron contornos para calcular los momentos de Hu.")
 
             indices_hu_seleccionados = [0, 1, 2, 3]
@@ -136,44 +202,67 @@ class ProcesadorImagen:
             print(f"Error al extraer características: {e}")
             raise
 
-    def visualizar_resultados(self):
-        try:
-            fig, axs = plt.subplots(1, 6, figsize=(24, 5))
-            imagen_rgb = cv2.cvtColor(self.imagen, cv2.COLOR_BGR2RGB)
-            axs[0].imshow(imagen_rgb)
-            axs[0].set_title("Imagen Original")
-            axs[0].axis('off')
-
-            imagen_retoque_rgb = cv2.cvtColor(self.imagen_retoque, cv2.COLOR_BGR2RGB)
-            axs[1].imshow(imagen_retoque_rgb)
-            axs[1].set_title("Imagen con Retoques")
-            axs[1].axis('off')
-
-            axs[2].imshow(self.mascara_fondo, cmap='gray')
-            axs[2].set_title("Máscara de Fondo")
-            axs[2].axis('off')
-
-            imagen_sin_fondo_rgb = cv2.cvtColor(self.imagen_sin_fondo, cv2.COLOR_BGR2RGB)
-            axs[3].imshow(imagen_sin_fondo_rgb)
-            axs[3].set_title("Imagen sin Fondo")
-            axs[3].axis('off')
-
-            imagen_contorno_rgb = cv2.cvtColor(self.imagen_contorno, cv2.COLOR_BGR2RGB)
-            axs[4].imshow(imagen_contorno_rgb)
-            axs[4].set_title("Imagen con Contornos")
-            axs[4].axis('off')
+    def _dibujar_resultados(self, axs):
+        """Dibuja cada etapa del procesamiento en los ejes indicados."""
+        imagen_rgb = cv2.cvtColor(self.imagen, cv2.COLOR_BGR2RGB)
+        axs[0].imshow(imagen_rgb)
+        axs[0].set_title("Imagen Original")
+        axs[0].axis('off')
 
+        imagen_retoque_rgb = cv2.cvtColor(self.imagen_retoque, cv2.COLOR_BGR2RGB)
+        axs[1].imshow(imagen_retoque_rgb)
+        axs[1].set_title("Imagen con Retoques")
+        axs[1].axis('off')
+
+        axs[2].imshow(self.mascara_fondo, cmap='gray')
+        axs[2].set_title("Máscara de Fondo")
+        axs[2].axis('off')
+
+        imagen_sin_fondo_rgb = cv2.cvtColor(self.imagen_sin_fondo, cv2.COLOR_BGR2RGB)
+        axs[3].imshow(imagen_sin_fondo_rgb)
+        axs[3].set_title("Imagen sin Fondo")
+        axs[3].axis('off')
+
+        imagen_contorno_rgb = cv2.cvtColor(self.imagen_contorno, cv2.COLOR_BGR2RGB)
+        axs[4].imshow(imagen_contorno_rgb)
+        axs[4].set_title("Imagen con Contornos")
+        axs[4].axis('off')
+
+        if self.mascara_color is not None:
             mascara_color_rgb = cv2.cvtColor(self.mascara_color, cv2.COLOR_BGR2RGB)
             axs[5].imshow(mascara_color_rgb)
-            axs[5].set_title("Máscara con Color")
-            axs[5].axis('off')
+        axs[5].set_title("Máscara con Color")
+        axs[5].axis('off')
 
+    def visualizar_resultados(self):
+        try:
+            import matplotlib.pyplot as plt
+            fig, axs = plt.subplots(1, 6, figsize=(24, 5))
+            self._dibujar_resultados(axs)
             plt.tight_layout()
             plt.show()
         except Exception as e:
             print(f"Error al visualizar resultados: {e}")
             raise
 
+    def renderizar_resultados_png(self):
+        """
+        Dibuja las etapas del procesamiento y devuelve la figura como PNG (bytes).
+
+        Usa el backend Agg directamente, sin pyplot, por lo que no abre ventanas ni requiere interfaz gráfica.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        figura = Figure(figsize=(24, 5))
+        FigureCanvasAgg(figura)
+        axs = figura.subplots(1, 6)
+        self._dibujar_resultados(axs)
+        figura.tight_layout()
+        salida = io.BytesIO()
+        figura.savefig(salida, format='png')
+        return salida.getvalue()
+
 def procesar_y_mostrar_imagen(ruta_imagen, lower_white=0, upper_white=255):
     procesador = ProcesadorImagen(ruta_imagen, lower_white=lower_white, upper_white=upper_white)
     try:
@@ -0,0 +1,201 @@
+import os
+import time
+from collections import Counter, deque
+from contextlib import redirect_stdout
+import cv2
+from ProcesadorImagen import ProcesadorImagen
+
+class ProcesadorVideo:
+    def __init__(self, ruta_video, clasificador_imagen, cada_n_frames=5, umbral_movimiento=None, ventana_suavizado=5,
+                 ancho_maximo=None, ancho_movimiento=160, modelo_fondo=None):
+        """
+        Clasifica los frames de un video de la cinta transportadora con el clasificador de imágenes.
+
+        Solo se decodifica uno de cada N frames (el resto se saltea sin decodificar) y, si se indica un umbral de
+        movimiento, de esos solo se clasifican los que cambiaron respecto del último clasificado. Las etiquetas se
+        suavizan por votación en una ventana deslizante para que un frame aislado no cambie la decisión.
+
+        :param ruta_video: Archivo de video (cualquier formato que lea cv2.VideoCapture).
+        :param clasificador_imagen: ClasificadorImagen con los centroides cargados.
+        :param cada_n_frames: Se examina un frame de cada N.
+        :param umbral_movimiento: Fracción de píxeles que deben cambiar para volver a clasificar (None clasifica todos los examinados).
+        :param ventana_suavizado: Cantidad de clasificaciones recientes que votan la etiqueta suavizada.
+        :param ancho_maximo: Si se indica, los frames más anchos se reducen a este ancho antes de clasificarlos.
+        :param ancho_movimiento: Ancho de la versión reducida en escala de grises usada para detectar movimiento.
+        :param modelo_fondo: ModeloFondo calibrado con la cinta vacía; se calibra al tamaño de los frames que se
+                             clasifican (después de reducirlos con ancho_maximo).
+        """
+        self.ruta_video = ruta_video
+        self.clasificador_imagen = clasificador_imagen
+        self.cada_n_frames = max(1, cada_n_frames)
+        self.umbral_movimiento = umbral_movimiento
+        self.ventana_suavizado = ventana_suavizado
+        self.ancho_maximo = ancho_maximo
+        self.ancho_movimiento = ancho_movimiento
+
+        # Se reutiliza el mismo procesador (y sus objetos de OpenCV) y los mismos buffers en todos los frames
+        self.procesador_imagen = ProcesadorImagen(ruta_video, conservar_intermedios=False, modelo_fondo=modelo_fondo)
+        self._frame = None
+        self._frame_reducido = None
+        self._gris = None
+        self._referencia = None
+        self._diferencia = None
+
+        self.resultados = []
+        self.estadisticas = {}
+        self.metodos_fondo = {}
+
+    def hay_movimiento(self, frame):
+        """
+        Compara una versión reducida y suavizada del frame con la del último frame clasificado.
+
+        :return: (hay_movimiento, fraccion_de_pixeles_que_cambiaron).
+        """
+        alto, ancho = frame.shape[:2]
+        tamano = (self.ancho_movimiento, max(1, alto * self.ancho_movimiento // ancho))
+        pequeno = cv2.resize(frame, tamano, interpolation=cv2.INTER_AREA)
+        self._gris = cv2.cvtColor(pequeno, cv2.COLOR_BGR2GRAY, dst=self._gris)
+        self._gris = cv2.GaussianBlur(self._gris, (5, 5), 0, dst=self._gris)
+        if self._referencia is None:
+            return True, 1.0
+        self._diferencia = cv2.absdiff(self._gris, self._referencia, dst=self._diferencia)
+        _, self._diferencia = cv2.threshold(self._diferencia, 25, 255, cv2.THRESH_BINARY, dst=self._diferencia)
+        fraccion = cv2.countNonZero(self._diferencia) / self._diferencia.size
+        return fraccion >= self.umbral_movimiento, fraccion
+
+    def actualizar_referencia(self):
+        # Se intercambian los buffers en lugar de copiar
+        self._referencia, self._gris = self._gris, self._referencia
+
+    def clasificar_frame(self, frame, indice):
+        if self.ancho_maximo is not None and frame.shape[1] > self.ancho_maximo:
+            alto = frame.shape[0] * self.ancho_maximo // frame.shape[1]
+            self._frame_reducido = cv2.resize(frame, (self.ancho_maximo, alto), dst=self._frame_reducido, interpolation=cv2.INTER_AREA)
+            frame = self._frame_reducido
+        procesador = self.procesador_imagen
+        procesador.cargar_frame(frame, nombre=f"{self.ruta_video}#{indice}")
+        procesador.aplicar_retoque_lab()
+        procesador.eliminar_fondo()
+        procesador.extraer_caracteristicas()
+        self.metodos_fondo[procesador.metodo_fondo] = self.metodos_fondo.get(procesador.metodo_fondo, 0) + 1
+        return self.clasificador_imagen.predecir(procesador.caracteristicas)
+
+    def suavizar(self, recientes):
+        """Etiqueta más votada en la ventana; ante empate gana la más reciente."""
+        votos = Counter(recientes)
+        maximo = max(votos.values())
+        return next(etiqueta for etiqueta in reversed(recientes) if votos[etiqueta] == maximo)
+
+    def procesar(self, max_frames=None):
+        """
+        Recorre el video y clasifica los frames seleccionados.
+
+        :param max_frames: Si se indica, se detiene después de esa cantidad de frames.
+        :return: Lista con un diccionario por frame clasificado (índice, tiempo, etiqueta y etiqueta suavizada).
+        """
+        captura = cv2.VideoCapture(self.ruta_video)
+        if not captura.isOpened():
+            print(f"Error: No se pudo abrir el video: {self.ruta_video}")
+            raise ValueError(f"No se pudo abrir el video: {self.ruta_video}")
+
+        fps_video = captura.get(cv2.CAP_PROP_FPS) or None
+        recientes = deque(maxlen=self.ventana_suavizado)
+        self.resultados = []
+        self.metodos_fondo = {}
+        frames_leidos = frames_decodificados = errores = 0
+        tiempo_clasificacion = 0.0
+        inicio = time.perf_counter()
+        try:
+            # Los pipelines de imagen informan cada paso por consola; en un video serían miles de líneas
+            with open(os.devnull, 'w') as silencio:
+                while max_frames is None or frames_leidos < max_frames:
+                    indice = frames_leidos
+                    if indice % self.cada_n_frames != 0:
+                        # grab() avanza sin decodificar el frame
+                        if not captura.grab():
+                            break
+                        frames_leidos += 1
+                        continue
+
+                    exito, frame = captura.read(self._frame)
+                    if not exito:
+                        break
+                    self._frame = frame
+                    frames_leidos += 1
+                    frames_decodificados += 1
+
+                    fraccion = None
+                    if self.umbral_movimiento is not None:
+                        movimiento, fraccion = self.hay_movimiento(frame)
+                        if not movimiento:
+                            continue
+                        self.actualizar_referencia()
+
+                    inicio_clasificacion = time.perf_counter()
+                    try:
+                        with redirect_stdout(silencio):
+                            etiqueta = self.clasificar_frame(frame, indice)
+                    except Exception as e:
+                        print(f"Error al clasificar el frame {indice}: {e}")
+                        errores += 1
+                        continue
+                    finally:
+                        tiempo_clasificacion += time.perf_counter() - inicio_clasificacion
+
+                    recientes.append(etiqueta)
+                    self.resultados.append({
+                        "frame": indice,
+                        "tiempo": indice / fps_video if fps_video else None,
+                        "etiqueta": etiqueta,
+                        "etiqueta_suavizada": self.suavizar(recientes),
+                        "movimiento": fraccion,
+                    })
+        finally:
+            captura.release()
+
+        duracion = time.perf_counter() - inicio
+        clasificados = len(self.resultados)
+        fps_procesamiento = frames_leidos / duracion if duracion > 0 else None
+        self.estadisticas = {
+            "fps_video": fps_video,
+            "frames_leidos": frames_leidos,
+            "frames_decodificados": frames_decodificados,
+            "frames_clasificados": clasificados,
+            "errores": errores,
+            "tiempo_total": duracion,
+            # Frames del video recorridos por segundo y clasificaciones por segundo de cómputo
+            "fps_procesamiento": fps_procesamiento,
+            "fps_clasificacion": clasificados / tiempo_clasificacion if tiempo_clasificacion > 0 else None,
+            "tiempo_medio_clasificacion": tiempo_clasificacion / clasificados if clasificados else None,
+            # Mayor o igual a 1 si el video se procesa al menos tan rápido como se reproduce
+            "factor_tiempo_real": fps_procesamiento / fps_video if fps_procesamiento and fps_video else None,
+            # Frames segmentados con el fondo calibrado y con el método HSV
+            "metodos_fondo": dict(self.metodos_fondo),
+        }
+        return self.resultados
+
+    def segmentos(self):
+        """Agrupa los frames clasificados consecutivos con la misma etiqueta suavizada: [(etiqueta, frame_inicial, frame_final)]."""
+        segmentos = []
+        for resultado in self.resultados:
+            if segmentos and segmentos[-1][0] == resultado["etiqueta_suavizada"]:
+                segmentos[-1] = (segmentos[-1][0], segmentos[-1][1], resultado["frame"])
+            else:
+                segmentos.append((resultado["etiqueta_suavizada"], resultado["frame"], resultado["frame"]))
+        return segmentos
+
+    def mostrar_resumen(self):
+        e = self.estadisticas
+        print(f"\nVideo: {self.ruta_video}")
+        print(f"Frames leídos: {e['frames_leidos']}, decodificados: {e['frames_decodificados']}, "
+              f"clasificados: {e['frames_clasificados']}, con errores: {e['errores']}")
+        print(f"Tiempo total: {e['tiempo_total']:.2f} s; {e['fps_procesamiento']:.1f} frames/s recorridos"
+              + (f" (video a {e['fps_video']:.1f} fps, factor de tiempo real {e['factor_tiempo_real']:.2f})" if e['fps_video'] else ""))
+        if e['fps_clasificacion']:
+            print(f"Clasificación: {e['fps_clasificacion']:.1f} frames/s ({e['tiempo_medio_clasificacion'] * 1000:.1f} ms por frame)")
+        if self.procesador_imagen.modelo_fondo is not None:
+            print(f"Eliminación del fondo: {e['metodos_fondo'].get('estatico', 0)} frames con el fondo calibrado, "
+                  f"{e['metodos_fondo'].get('hsv', 0)} con el método HSV")
+        print("Segmentos (etiqueta suavizada):")
+        for etiqueta, primero, ultimo in self.segmentos():
+            print(f" - {etiqueta}: frames {primero} a {ultimo}")
@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from Perfilador import memoria_procesos
+from Rutas import EVALUATION_DB_PATHS
+
+EXTENSIONES = {'audio': ('.wav',), 'imagen': ('.jpg', '.jpeg', '.png')}
+ENDPOINTS = {'audio': '/clasificar_audio', 'imagen': '/clasificar_imagen', 'multimodal': '/clasificar_multimodal'}
+PERCENTILES = (50, 95, 99)
+
+def cuerpo_multipart(campos):
+    """
+    Arma un cuerpo multipart/form-data con los archivos indicados.
+
+    :param campos: Lista de (nombre_campo, nombre_archivo, datos).
+    :return: (cuerpo en bytes, valor del encabezado Content-Type).
+    """
+    limite = uuid.uuid4().hex
+    partes = []
+    for campo, nombre_archivo, datos in campos:
+        partes.append(f'--{limite}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nombre_archivo}"\r\n'
+                      f'Content-Type: application/octet-stream\r\n\r\n'.encode() + datos + b'\r\n')
+    partes.append(f'--{limite}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={limite}'
+
+def resumir_latencias(latencias):
+    if not latencias:
+        return dict({f"p{p}": None for p in PERCENTILES}, media=None, maxima=None)
+    valores = np.asarray(latencias)
+    resumen = {f"p{p}": float(np.percentile(valores, p)) for p in PERCENTILES}
+    resumen["media"] = float(valores.mean())
+    resumen["maxima"] = float(valores.max())
+    return resumen
+
+
+class PruebaCarga:
+    def __init__(self, url="http://127.0.0.1:5000", mezcla=None, tasa=None, concurrencia=4, duracion=30,
+                 rutas_evaluacion=None, tiempo_espera=60, intervalo_memoria=0.5, pid_servidor=None, semilla=0, max_hilos=256):
+        """
+        Generador de carga para el servidor: envía archivos de db_evaluacion/ a los endpoints de clasificación y registra
+        la latencia de cada solicitud, el throughput, los errores y la memoria del servidor a lo largo de la prueba.
+
+        :param url: Dirección base del servidor.
+        :param mezcla: Pesos de cada tipo de solicitud, por ejemplo {'imagen': 3, 'audio': 1, 'multimodal': 1}.
+        :param tasa: Solicitudes por segundo a generar (carga abierta). Si es None se usa la concurrencia.
+        :param concurrencia: Clientes que envían una solicitud tras otra (carga cerrada), si no se indica la tasa.
+        :param duracion: Segundos que dura la prueba.
+        :param rutas_evaluacion: Carpetas con los archivos a enviar, una por etiqueta.
+        :param tiempo_espera: Segundos máximos de espera de cada respuesta.
+        :param intervalo_memoria: Segundos entre cada medición de la memoria del servidor.
+        :param pid_servidor: Proceso del servidor cuya memoria se mide (None para no medirla).
+        :param semilla: Semilla para la elección de tipos y archivos.
+        :param max_hilos: Solicitudes simultáneas como máximo en el modo por tasa.
+        """
+        self.url = url.rstrip('/')
+        self.mezcla = mezcla or {'imagen': 1, 'audio': 1}
+        self.tasa = tasa
+        self.concurrencia = concurrencia
+        self.duracion = duracion
+        self.rutas_evaluacion = rutas_evaluacion or EVALUATION_DB_PATHS
+        self.tiempo_espera = tiempo_espera
+        self.intervalo_memoria = intervalo_memoria
+        self.pid_servidor = pid_servidor
+        self.max_hilos = max_hilos
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.archivos = {}
+        self.solicitudes = []
+        self.memoria = []
+        self._inicio = None
+
+    def cargar_archivos(self):
+        """Lee a memoria todos los audios e imágenes de las carpetas de evaluación."""
+        self.archivos = {tipo: [] for tipo in EXTENSIONES}
+        for carpeta in self.rutas_evaluacion:
+            for nombre in sorted(os.listdir(carpeta)):
+                for tipo, extensiones in EXTENSIONES.items():
+                    if nombre.lower().endswith(extensiones):
+                        with open(os.path.join(carpeta, nombre), 'rb') as f:
+                            self.archivos[tipo].append((nombre, f.read()))
+        for tipo in self.mezcla:
+            necesarios = EXTENSIONES if tipo == 'multimodal' else [tipo]
+            if any(not self.archivos[t] for t in necesarios):
+                raise ValueError(f"No hay archivos para las solicitudes de tipo '{tipo}' en {self.rutas_evaluacion}.")
+        print(f"Archivos cargados: {len(self.archivos['audio'])} audios y {len(self.archivos['imagen'])} imágenes.")
+
+    def _elegir(self):
+        """Elige el tipo de solicitud según la mezcla y arma su cuerpo multipart."""
+        with self._lock:
+            tipo = self._aleatorio.choices(list(self.mezcla), weights=list(self.mezcla.values()))[0]
+            campos = [(t, *self._aleatorio.choice(self.archivos[t])) for t in (EXTENSIONES if tipo == 'multimodal' else [tipo])]
+        return tipo, cuerpo_multipart(campos)
+
+    def _enviar(self, tipo, cuerpo, momento_programado):
+        """
+        Envía una solicitud y registra su resultado. La latencia se mide desde el momento en que la solicitud debía
+        salir, así las demoras del propio generador cuando el servidor se atrasa también cuentan.
+        """
+        datos, tipo_contenido = cuerpo
+        solicitud = urllib.request.Request(self.url + ENDPOINTS[tipo], data=datos, headers={'Content-Type': tipo_contenido})
+        codigo, error = None, None
+        try:
+            with urllib.request.urlopen(solicitud, timeout=self.tiempo_espera) as respuesta:
+                respuesta.read()
+                codigo = respuesta.status
+        except urllib.error.HTTPError as e:
+            codigo = e.code
+        except Exception as e:
+            error = type(e).__name__
+        fin = time.perf_counter()
+        with self._lock:
+            self.solicitudes.append({"tipo": tipo, "inicio": momento_programado - self._inicio,
+                                     "latencia": fin - momento_programado, "codigo": codigo, "error": error})
+
+    def _medir_memoria(self, detener):
+        while not detener.is_set():
+            rss, pss = memoria_procesos(self.pid_servidor)
+            if rss is not None:
+                self.memoria.append({"tiempo": time.perf_counter() - self._inicio, "rss": rss, "pss": pss})
+            detener.wait(self.intervalo_memoria)
+
+    def _carga_abierta(self, fin):
+        """Envía solicitudes a intervalos regulares según la tasa, sin esperar a que terminen las anteriores."""
+        with ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix="carga") as pool:
+            for i in range(int(self.duracion * self.tasa)):
+                momento = self._inicio + i / self.tasa
+                if momento >= fin:
+                    break
+                espera = momento - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                tipo, cuerpo = self._elegir()
+                pool.submit(self._enviar, tipo, cuerpo, momento)
+
+    def _carga_cerrada(self, fin):
+        """Cada cliente envía una solicitud, espera la respuesta y envía la siguiente hasta que termina la prueba."""
+        def cliente():
+            while time.perf_counter() < fin:
+                tipo, cuerpo = self._elegir()
+                self._enviar(tipo, cuerpo, time.perf_counter())
+        hilos = [threading.Thread(target=cliente, name=f"cliente-{i}") for i in range(self.concurrencia)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    def ejecutar(self):
+        """Ejecuta la prueba y devuelve el reporte."""
+        if not self.archivos:
+            self.cargar_archivos()
+        self.solicitudes, self.memoria = [], []
+        modo = f"{self.tasa:g} solicitudes/s" if self.tasa else f"{self.concurrencia} clientes"
+        print(f"Prueba de carga contra {self.url} durante {self.duracion} s ({modo}, mezcla {self.mezcla})...")
+
+        detener = threading.Event()
+        self._inicio = time.perf_counter()
+        fin = self._inicio + self.duracion
+        hilo_memoria = None
+        if self.pid_servidor is not None:
+            hilo_memoria = threading.Thread(target=self._medir_memoria, args=(detener,), daemon=True)
+            hilo_memoria.start()
+        try:
+            if self.tasa:
+                self._carga_abierta(fin)
+            else:
+                self._carga_cerrada(fin)
+        finally:
+            # Incluye el tiempo de las últimas respuestas, que llegan después de 'fin'
+            duracion_real = time.perf_counter() - self._inicio
+            detener.set()
+            if hilo_memoria is not None:
+                hilo_memoria.join()
+        return self.reporte(duracion_real)
+
+    def resumir(self, solicitudes, duracion):
+        exitosas = [s for s in solicitudes if s["codigo"] is not None and 200 <= s["codigo"] < 300]
+        rechazadas = sum(1 for s in solicitudes if s["codigo"] == 503)
+        total = len(solicitudes)
+        return {
+            "solicitudes": total,
+            "exitosas": len(exitosas),
+            "rechazadas_503": rechazadas,
+            "errores": total - len(exitosas),
+            "tasa_error": (total - len(exitosas)) / total if total else None,
+            "throughput": len(exitosas) / duracion if duracion else None,
+            "latencia": resumir_latencias([s["latencia"] for s in exitosas]),
+        }
+
+    def reporte(self, duracion):
+        """
+        Arma el reporte de la prueba: configuración, resumen global y por tipo, memoria a lo largo del tiempo y,
+        en 'resultados', las métricas principales en el formato que compara 'python Benchmark.py comparar'.
+        """
+        global_ = self.resumir(self.solicitudes, duracion)
+        por_tipo = {tipo: self.resumir([s for s in self.solicitudes if s["tipo"] == tipo], duracion) for tipo in self.mezcla}
+        errores = {}
+        for s in self.solicitudes:
+            if s["error"] or not (s["codigo"] and 200 <= s["codigo"] < 300):
+                motivo = s["error"] or f"HTTP {s['codigo']}"
+                errores[motivo] = errores.get(motivo, 0) + 1
+
+        rss = [m["rss"] for m in self.memoria]
+        memoria = {
+            "rss_inicial": rss[0] if rss else None,
+            "rss_final": rss[-1] if rss else None,
+            "rss_pico": max(rss) if rss else None,
+            "pss_pico": max((m["pss"] for m in self.memoria if m["pss"] is not None), default=None),
+            "serie": self.memoria,
+        }
+
+        resultados = {}
+        def agregar(nombre, valor, unidad, mayor_es_mejor):
+            if valor is not None:
+                resultados[nombre] = {"valor": valor, "unidad": unidad, "mayor_es_mejor": mayor_es_mejor}
+        for nombre, resumen in [("global", global_)] + list(por_tipo.items()):
+            agregar(f"{nombre}/throughput", resumen["throughput"], "solicitudes/s", True)
+            for p in PERCENTILES:
+                agregar(f"{nombre}/latencia_p{p}", resumen["latencia"][f"p{p}"], "s", False)
+        agregar("global/tasa_error", global_["tasa_error"], "fracción", False)
+        agregar("servidor/rss_pico", memoria["rss_pico"], "bytes", False)
+        agregar("servidor/pss_pico", memoria["pss_pico"], "bytes", False)
+
+        return {
+            "configuracion": {"url": self.url, "mezcla": self.mezcla, "tasa": self.tasa,
+                              "concurrencia": None if self.tasa else self.concurrencia,
+                              "duracion": self.duracion, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "duracion_real": duracion,
+            "global": global_,
+            "por_tipo": por_tipo,
+            "errores": errores,
+            "memoria": memoria,
+            "resultados": resultados,
+            "solicitudes": self.solicitudes,
+        }
+
+
+def mostrar_reporte(reporte):
+    ms = lambda valor: f"{valor * 1000:.1f}" if valor is not None else "-"
+    print(f"\n{'Tipo':<12}{'Solicitudes':>12}{'Errores':>9}{'503':>6}{'Sol/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for nombre, resumen in [("global", reporte["global"])] + list(reporte["por_tipo"].items()):
+        latencia = resumen["latencia"]
+        print(f"{nombre:<12}{resumen['solicitudes']:>12}{resumen['errores']:>9}{resumen['rechazadas_503']:>6}"
+              f"{resumen['throughput']:>9.2f}{ms(latencia['p50']):>10}{ms(latencia['p95']):>10}{ms(latencia['p99']):>10}")
+    if reporte["errores"]:
+        print("Errores: " + ", ".join(f"{motivo}: {cantidad}" for motivo, cantidad in reporte["errores"].items()))
+    memoria = reporte["memoria"]
+    if memoria["rss_pico"] is not None:
+        mb = lambda valor: f"{valor / 2**20:.1f} MB" if valor is not None else "-"
+        print(f"Memoria del servidor: RSS inicial {mb(memoria['rss_inicial'])}, final {mb(memoria['rss_final'])}, "
+              f"pico {mb(memoria['rss_pico'])} (PSS pico {mb(memoria['pss_pico'])}).")
+
+def iniciar_servidor(puerto, trabajadores=None, sin_cache=False, calidad='marcar', registro=None, tiempo_max_inicio=120):
+    """
+    Inicia servidor.py (o ServidorPrefork.py si se indican trabajadores) en un proceso aparte y espera a que
+    /salud responda 200, es decir, a que termine el calentamiento.
+
+    :return: Proceso del servidor.
+    """
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    if trabajadores:
+        comando = [sys.executable, 'ServidorPrefork.py', '--trabajadores', str(trabajadores), '--host', '127.0.0.1', '--puerto', str(puerto)]
+    else:
+        comando = [sys.executable, 'servidor.py', '--puerto', str(puerto)]
+    comando += ['--calidad', calidad]
+    if sin_cache:
+        comando.append('--sin-cache')
+    salida = open(registro, 'w') if registro else subprocess.DEVNULL
+    proceso = subprocess.Popen(comando, cwd=directorio, stdout=salida, stderr=subprocess.STDOUT)
+    if registro:
+        salida.close()
+
+    limite = time.monotonic() + tiempo_max_inicio
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al iniciar (código {proceso.returncode}).")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/salud", timeout=2) as respuesta:
+                if respuesta.status == 200:
+                    print(f"Servidor listo (pid {proceso.pid}).")
+                    return proceso
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    detener_servidor(proceso)
+    raise TimeoutError(f"El servidor no estuvo listo en {tiempo_max_inicio} s.")
+
+def detener_servidor(proceso, tiempo_max=35):
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=tiempo_max)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+        proceso.wait()
+
+def leer_mezcla(texto):
+    """Convierte 'imagen=3,audio=1' en {'imagen': 3.0, 'audio': 1.0}."""
+    mezcla = {}
+    for parte in texto.split(','):
+        tipo, _, peso = parte.partition('=')
+        tipo = tipo.strip()
+        if tipo not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Tipo de solicitud desconocido: '{tipo}' (válidos: {', '.join(ENDPOINTS)}).")
+        mezcla[tipo] = float(peso) if peso else 1.0
+    return mezcla
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor con archivos de db_evaluacion/.")
+    parser.add_argument('--url', default=None, help="Servidor ya iniciado a probar. Si se omite, se inicia uno local.")
+    parser.add_argument('--pid', type=int, default=None, help="Proceso del servidor indicado con --url cuya memoria se mide.")
+    parser.add_argument('--puerto', type=int, default=5050, help="Puerto del servidor local.")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Inicia el servidor prefork con N trabajadores.")
+    parser.add_argument('--con-cache', action='store_true', help="Mantiene la cache de predicciones del servidor local "
+                                                                  "(por defecto se desactiva, ya que los archivos se repiten).")
+    parser.add_argument('--calidad', choices=['rechazar', 'marcar', 'no'], default='marcar',
+                        help="Control de calidad de imágenes del servidor local.")
+    parser.add_argument('--registro-servidor', default=None, metavar='RUTA', help="Archivo donde guardar la salida del servidor local.")
+    parser.add_argument('--mezcla', type=leer_mezcla, default={'imagen': 1.0, 'audio': 1.0}, help="Pesos por tipo, por ejemplo imagen=3,audio=1,multimodal=1.")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--tasa', type=float, default=None, help="Solicitudes por segundo (carga abierta).")
+    modo.add_argument('--concurrencia', type=int, default=4, help="Clientes simultáneos (carga cerrada).")
+    parser.add_argument('--duracion', type=float, default=30)
+    parser.add_argument('--salida', default="saves/prueba_carga.json", help="Archivo JSON del reporte.")
+    argumentos = parser.parse_args()
+
+    proceso = None
+    url, pid = argumentos.url, argumentos.pid
+    if url is None:
+        proceso = iniciar_servidor(argumentos.puerto, argumentos.trabajadores, sin_cache=not argumentos.con_cache,
+                                   calidad=argumentos.calidad, registro=argumentos.registro_servidor)
+        url, pid = f"http://127.0.0.1:{argumentos.puerto}", proceso.pid
+    try:
+        prueba = PruebaCarga(url, mezcla=argumentos.mezcla, tasa=argumentos.tasa, concurrencia=argumentos.concurrencia,
+                             duracion=argumentos.duracion, pid_servidor=pid)
+        reporte = prueba.ejecutar()
+    finally:
+        if proceso is not None:
+            detener_servidor(proceso)
+
+    reporte["configuracion"]["trabajadores"] = argumentos.trabajadores
+    mostrar_reporte(reporte)
+    directorio = os.path.dirname(argumentos.salida)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(argumentos.salida, 'w') as f:
+        json.dump(reporte, f, indent=4, ensure_ascii=False)
+    print(f"Reporte guardado en: {argumentos.salida}. Para comparar dos reportes: python Benchmark.py comparar ANTES DESPUES")
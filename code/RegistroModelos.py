@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from Entrenador import Entrenador
+
+class ModelosCargados:
+    """Versión inmutable de los clasificadores en servicio. Cada solicitud trabaja con una sola versión."""
+
+    def __init__(self, clasificador_audio, clasificador_imagen, version, cargado_en):
+        self.clasificador_audio = clasificador_audio
+        self.clasificador_imagen = clasificador_imagen
+        self.version = version
+        self.cargado_en = cargado_en
+
+
+class RegistroModelos:
+    def __init__(self, ruta_modelo, intervalo_verificacion=1.0):
+        """
+        Registro que carga los modelos una sola vez y los reemplaza de forma atómica cuando cambia el archivo.
+
+        :param ruta_modelo: Ruta al archivo de modelos entrenados.
+        :param intervalo_verificacion: Segundos entre cada verificación del archivo en disco.
+        """
+        self.ruta_modelo = ruta_modelo
+        self.ruta_deltas = Entrenador.ruta_deltas(ruta_modelo)
+        self.intervalo_verificacion = intervalo_verificacion
+        self.cantidad_cargas = 0
+
+        self._actual = None
+        self._firma_archivos = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._oyentes = []
+        self._hilo_vigilancia = None
+        self._detener_vigilancia = threading.Event()
+
+    def _firma(self):
+        """Identifica el estado en disco del modelo y de sus deltas (fecha de modificación y tamaño)."""
+        firma = []
+        for ruta in (self.ruta_modelo, self.ruta_deltas):
+            try:
+                estado = os.stat(ruta)
+                firma.append((estado.st_mtime_ns, estado.st_size))
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def _publicar(self, entrenador):
+        """Reemplaza la versión en servicio. Las solicitudes en curso conservan la versión que ya obtuvieron."""
+        self._version += 1
+        self._actual = ModelosCargados(entrenador.clasificador_audio, entrenador.clasificador_imagen, self._version, time.time())
+        for oyente in self._oyentes:
+            try:
+                oyente(self._actual)
+            except Exception as e:
+                print(f"Error al notificar el cambio de modelos: {e}")
+
+    def cargar(self):
+        """Construye los clasificadores a partir del archivo, aparte de los que están en servicio, y los publica."""
+        with self._lock:
+            firma = self._firma()
+            entrenador = Entrenador()
+            entrenador.cargar_modelos(self.ruta_modelo)
+            self._firma_archivos = firma
+            self.cantidad_cargas += 1
+            self._publicar(entrenador)
+            print(f"Modelos publicados en el registro (versión {self._version}).")
+            return self._actual
+
+    def obtener(self):
+        """Devuelve la versión de los modelos en servicio, cargándolos si todavía no se cargaron."""
+        actual = self._actual
+        if actual is None:
+            actual = self.cargar()
+        return actual
+
+    def version_actual(self):
+        """Devuelve la versión en servicio, o None si todavía no se cargaron modelos (sin disparar la carga)."""
+        actual = self._actual
+        return actual.version if actual is not None else None
+
+    def verificar_cambios(self):
+        """Recarga los modelos si el archivo o sus deltas cambiaron en disco. Devuelve True si hubo recarga."""
+        if self._actual is not None and self._firma() == self._firma_archivos:
+            return False
+        try:
+            self.cargar()
+            return True
+        except Exception as e:
+            print(f"Error al recargar los modelos, se mantiene la versión anterior: {e}")
+            return False
+
+    def iniciar_vigilancia(self):
+        """Inicia un hilo que verifica periódicamente si el archivo de modelos cambió."""
+        if self._hilo_vigilancia is not None:
+            return
+
+        def vigilar():
+            while not self._detener_vigilancia.wait(self.intervalo_verificacion):
+                self.verificar_cambios()
+
+        self._hilo_vigilancia = threading.Thread(target=vigilar, name="vigilancia-modelos", daemon=True)
+        self._hilo_vigilancia.start()
+
+    def detener_vigilancia(self):
+        """Detiene el hilo de vigilancia del archivo de modelos."""
+        self._detener_vigilancia.set()
+        if self._hilo_vigilancia is not None:
+            self._hilo_vigilancia.join()
+            self._hilo_vigilancia = None
+
+    def agregar_oyente(self, oyente):
+        """Registra una función que se llama con la nueva versión cada vez que se publican modelos."""
+        self._oyentes.append(oyente)
+
+    def _actualizar(self, aplicar):
+        """Aplica una actualización incremental sobre una copia de los modelos y publica la copia."""
+        with self._lock:
+            actual = self._actual
+            if actual is None:
+                raise ValueError("No hay modelos cargados en el registro.")
+            entrenador = Entrenador()
+            entrenador.clasificador_audio = actual.clasificador_audio.copiar()
+            entrenador.clasificador_imagen = actual.clasificador_imagen.copiar()
+            aplicar(entrenador)
+            # El delta lo escribimos nosotros: no hace falta recargar el archivo
+            self._firma_archivos = self._firma()
+            self._publicar(entrenador)
+            return self._actual
+
+    def agregar_muestra_audio(self, caracteristicas, etiqueta):
+        """Agrega un audio etiquetado, persiste el delta y publica una nueva versión de los modelos."""
+        self.obtener()
+        return self._actualizar(lambda entrenador: entrenador.agregar_muestra_audio(caracteristicas, etiqueta, ruta_modelo=self.ruta_modelo))
+
+    def agregar_muestra_imagen(self, caracteristicas, etiqueta):
+        """Incorpora una imagen etiquetada, persiste el delta y publica una nueva versión de los modelos."""
+        self.obtener()
+        return self._actualizar(lambda entrenador: entrenador.agregar_muestra_imagen(caracteristicas, etiqueta, ruta_modelo=self.ruta_modelo))
@@ -0,0 +1,4 @@
+# Carpetas de la base de datos (una por etiqueta) y de la base de evaluación, relativas a code/
+ETIQUETAS = ["papa", "zanahoria", "camote", "berenjena"]
+DB_PATHS = [f"../db/{etiqueta}/" for etiqueta in ETIQUETAS]
+EVALUATION_DB_PATHS = [f"../db_evaluacion/{etiqueta}/" for etiqueta in ETIQUETAS]
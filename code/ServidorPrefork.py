@@ -0,0 +1,201 @@
+import os
+import time
+import signal
+import socket
+import argparse
+import threading
+from ControlAdmision import leer_limite
+
+class ServidorPrefork:
+    def __init__(self, app, registro_modelos, host='0.0.0.0', puerto=5000, n_trabajadores=None, intervalo_verificacion=1.0, tiempo_max_cierre=30, calentamiento=None,
+                 al_iniciar_trabajador=None, al_terminar_trabajador=None, al_recoger_trabajador=None):
+        """
+        Servidor de producción: el proceso padre carga los modelos una sola vez, abre el socket y crea N procesos
+        trabajadores con fork. Los trabajadores comparten los modelos copy-on-write (los arreglos del formato binario,
+        además, están mapeados desde el mismo archivo), así que no hay N copias de la matriz de entrenamiento.
+
+        :param app: Aplicación WSGI que atienden los trabajadores.
+        :param registro_modelos: Registro de modelos; solo el padre vigila el archivo.
+        :param host: Dirección donde escuchar.
+        :param puerto: Puerto donde escuchar.
+        :param n_trabajadores: Cantidad de procesos trabajadores (por defecto, uno por núcleo).
+        :param intervalo_verificacion: Segundos entre cada verificación del archivo de modelos.
+        :param tiempo_max_cierre: Segundos que se espera a que un trabajador termine sus solicitudes antes de matarlo.
+        :param calentamiento: Calentamiento a ejecutar en el padre antes de crear los trabajadores, que lo heredan hecho.
+        :param al_iniciar_trabajador: Función que se llama en cada trabajador recién creado, antes de atender solicitudes.
+        :param al_terminar_trabajador: Función que se llama en el trabajador después de atender sus últimas solicitudes.
+        :param al_recoger_trabajador: Función que se llama en el padre con el pid de cada trabajador que terminó.
+        """
+        self.app = app
+        self.registro_modelos = registro_modelos
+        self.host = host
+        self.puerto = puerto
+        self.n_trabajadores = n_trabajadores or os.cpu_count() or 2
+        self.intervalo_verificacion = intervalo_verificacion
+        self.tiempo_max_cierre = tiempo_max_cierre
+        self.calentamiento = calentamiento
+        self.al_iniciar_trabajador = al_iniciar_trabajador
+        self.al_terminar_trabajador = al_terminar_trabajador
+        self.al_recoger_trabajador = al_recoger_trabajador
+
+        self.socket_escucha = None
+        self.generacion = 0
+        # pid -> generación de modelos con la que se creó el trabajador
+        self.trabajadores = {}
+        # pid -> momento en que se le pidió terminar
+        self.terminando = {}
+        self._detener = False
+        self._reiniciar = False
+
+    def _crear_socket(self):
+        familia = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self.socket_escucha = socket.create_server((self.host, self.puerto), family=familia, backlog=128, reuse_port=False)
+        self.socket_escucha.set_inheritable(True)
+
+    def _ejecutar_trabajador(self):
+        """Código del proceso hijo: atiende solicitudes sobre el socket heredado hasta recibir SIGTERM."""
+        from werkzeug.serving import make_server
+
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        if self.al_iniciar_trabajador is not None:
+            self.al_iniciar_trabajador()
+        servidor_wsgi = make_server(self.host, self.puerto, self.app, threaded=True, fd=self.socket_escucha.fileno())
+        # Al cerrar, esperar a que terminen las solicitudes en curso
+        servidor_wsgi.daemon_threads = False
+        servidor_wsgi.block_on_close = True
+
+        def terminar(signum, frame):
+            threading.Thread(target=servidor_wsgi.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, terminar)
+        servidor_wsgi.serve_forever()
+        servidor_wsgi.server_close()
+        if self.al_terminar_trabajador is not None:
+            self.al_terminar_trabajador()
+
+    def _crear_trabajador(self):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                self._ejecutar_trabajador()
+            except Exception as e:
+                print(f"Error en el trabajador {os.getpid()}: {e}")
+                codigo = 1
+            finally:
+                # Sin os._exit se ejecutarían los atexit del padre (por ejemplo, vaciar la galería compartida)
+                os._exit(codigo)
+        self.trabajadores[pid] = self.generacion
+        return pid
+
+    def _crear_generacion(self):
+        """Crea un juego completo de trabajadores con los modelos cargados actualmente en el padre."""
+        self.generacion += 1
+        for _ in range(self.n_trabajadores):
+            self._crear_trabajador()
+        print(f"Generación {self.generacion}: {self.n_trabajadores} trabajadores con la versión {self.registro_modelos.obtener().version} de los modelos.")
+
+    def _terminar_trabajadores(self, pids):
+        for pid in pids:
+            if pid in self.terminando:
+                continue
+            try:
+                os.kill(pid, signal.SIGTERM)
+                self.terminando[pid] = time.monotonic()
+            except ProcessLookupError:
+                pass
+
+    def reiniciar(self):
+        """
+        Reinicio sin cortes: primero se crean los trabajadores nuevos y después se pide a los anteriores que terminen;
+        el socket nunca deja de aceptar conexiones.
+        """
+        anteriores = [pid for pid, generacion in self.trabajadores.items() if generacion == self.generacion]
+        self._crear_generacion()
+        self._terminar_trabajadores(anteriores)
+
+    def _recolectar(self):
+        """Recoge los trabajadores que terminaron y reemplaza los de la generación actual que murieron inesperadamente."""
+        while True:
+            try:
+                pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generacion = self.trabajadores.pop(pid, None)
+            if self.al_recoger_trabajador is not None:
+                self.al_recoger_trabajador(pid)
+            esperado = self.terminando.pop(pid, None) is not None
+            if not esperado and generacion == self.generacion and not self._detener:
+                print(f"El trabajador {pid} terminó inesperadamente (estado {estado}), se crea uno nuevo.")
+                self._crear_trabajador()
+
+    def _matar_demorados(self):
+        ahora = time.monotonic()
+        for pid, pedido_en in list(self.terminando.items()):
+            if ahora - pedido_en > self.tiempo_max_cierre:
+                print(f"El trabajador {pid} no terminó a tiempo, se lo mata.")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _manejar_senal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reiniciar = True
+        else:
+            self._detener = True
+
+    def iniciar(self):
+        """Carga los modelos, crea los trabajadores y supervisa el archivo de modelos hasta recibir SIGTERM/SIGINT."""
+        # Cargar y calentar antes de crear el socket: no se acepta ninguna conexión hasta tener los modelos listos
+        self.registro_modelos.obtener()
+        if self.calentamiento is not None:
+            self.calentamiento.ejecutar()
+        self._crear_socket()
+        print(f"Servidor prefork escuchando en http://{self.host}:{self.puerto} (pid {os.getpid()})")
+
+        for senal in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(senal, self._manejar_senal)
+
+        self._crear_generacion()
+        try:
+            while not self._detener:
+                time.sleep(self.intervalo_verificacion)
+                self._recolectar()
+                self._matar_demorados()
+                # Los modelos se recargan en el padre; los trabajadores nuevos los heredan ya cargados
+                if self.registro_modelos.verificar_cambios() or self._reiniciar:
+                    self._reiniciar = False
+                    self.reiniciar()
+        finally:
+            self._detener = True
+            self._terminar_trabajadores(list(self.trabajadores))
+            limite = time.monotonic() + self.tiempo_max_cierre
+            while self.trabajadores and time.monotonic() < limite:
+                self._recolectar()
+                time.sleep(0.1)
+            self._matar_demorados()
+            self.socket_escucha.close()
+            print("Servidor prefork detenido.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor de clasificación con varios procesos trabajadores (pre-fork).")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Cantidad de procesos trabajadores (por defecto, uno por núcleo).")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--puerto', type=int, default=5000)
+    parser.add_argument('--sin-cache', action='store_true', help="Desactiva la cache de predicciones (por ejemplo, para pruebas de carga).")
+    parser.add_argument('--calidad', choices=['rechazar', 'marcar', 'no'], default='marcar',
+                        help="Qué hacer con las imágenes que no pasan el control de calidad de la vista previa.")
+    parser.add_argument('--fondo', default=None, metavar='RUTA', help="Modelo de fondo calibrado para una cámara fija.")
+    parser.add_argument('--limite', type=leer_limite, action='append', default=[], metavar='TIPO=N[,ESPERA[,SEG]]',
+                        help="Límite de admisión de un tipo (imagen, audio, lote, multimodal): solicitudes simultáneas, "
+                             "en espera y espera máxima en segundos. Se puede repetir.")
+    argumentos = parser.parse_args()
+
+    import servidor
+    servidor.configurar(argumentos.sin_cache, argumentos.calidad, argumentos.fondo, argumentos.limite)
+    servidor.crear_servidor_prefork(argumentos.host, argumentos.puerto, argumentos.trabajadores).iniciar()
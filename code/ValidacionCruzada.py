@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Entrenador import Entrenador
+
+def pliegues_estratificados(etiquetas, k_pliegues, semilla=0):
+    """
+    Reparte los índices de las muestras en k pliegues manteniendo la proporción de cada etiqueta.
+
+    :return: Lista de arrays de índices de prueba, uno por pliegue.
+    """
+    generador = np.random.default_rng(semilla)
+    pliegues = [[] for _ in range(k_pliegues)]
+    for etiqueta in np.unique(etiquetas):
+        indices = generador.permutation(np.flatnonzero(etiquetas == etiqueta))
+        for i, parte in enumerate(np.array_split(indices, k_pliegues)):
+            pliegues[i].extend(parte.tolist())
+    return [np.sort(np.array(pliegue, dtype=int)) for pliegue in pliegues]
+
+def entrenar_y_evaluar(audios_entrenamiento, labels_audio, imagenes_entrenamiento, labels_imagen,
+                       audios_prueba, labels_audio_prueba, imagenes_prueba, labels_imagen_prueba,
+                       k_vecinos=5, k_centroides=4, semilla=0):
+    """
+    Entrena ambos clasificadores con las características recibidas y devuelve la exactitud sobre las de prueba.
+
+    Está a nivel de módulo para poder ejecutarse en otro proceso.
+    """
+    np.random.seed(semilla)
+    entrenador = Entrenador(k_vecinos=k_vecinos, k_centroides=k_centroides)
+    entrenador.audios_entrenamiento = audios_entrenamiento
+    entrenador.labels_audio_entrenamiento = labels_audio
+    entrenador.imagenes_entrenamiento = imagenes_entrenamiento
+    entrenador.labels_imagen_entrenamiento = labels_imagen
+    entrenador.clasificador_audio.k = k_vecinos
+
+    inicio = time.perf_counter()
+    entrenador.configurar_clasificadores()
+    tiempo_entrenamiento = time.perf_counter() - inicio
+
+    resultado = {"tiempo_entrenamiento": tiempo_entrenamiento}
+    for tipo, clasificador, caracteristicas, etiquetas in (
+        ("audio", entrenador.clasificador_audio, audios_prueba, labels_audio_prueba),
+        ("imagen", entrenador.clasificador_imagen, imagenes_prueba, labels_imagen_prueba),
+    ):
+        if len(caracteristicas) == 0:
+            resultado[f"exactitud_{tipo}"] = None
+            continue
+        predichas = np.asarray(clasificador.predecir_lote(caracteristicas)).astype(str)
+        resultado[f"exactitud_{tipo}"] = float(np.mean(predichas == np.asarray(etiquetas).astype(str)))
+        resultado[f"muestras_{tipo}"] = len(caracteristicas)
+    return resultado
+
+def _evaluar_pliegue(datos, indices_audio, indices_imagen, k_vecinos, k_centroides, semilla, pliegue):
+    """Evalúa un pliegue: entrena con el resto de las muestras y prueba con las del pliegue."""
+    inicio = time.perf_counter()
+    audios, labels_audio, imagenes, labels_imagen = datos
+    prueba_audio = np.zeros(len(audios), dtype=bool)
+    prueba_audio[indices_audio] = True
+    prueba_imagen = np.zeros(len(imagenes), dtype=bool)
+    prueba_imagen[indices_imagen] = True
+
+    resultado = entrenar_y_evaluar(
+        audios[~prueba_audio], labels_audio[~prueba_audio], imagenes[~prueba_imagen], labels_imagen[~prueba_imagen],
+        audios[prueba_audio], labels_audio[prueba_audio], imagenes[prueba_imagen], labels_imagen[prueba_imagen],
+        k_vecinos=k_vecinos, k_centroides=k_centroides, semilla=semilla + pliegue,
+    )
+    resultado["pliegue"] = pliegue
+    resultado["tiempo"] = time.perf_counter() - inicio
+    return resultado
+
+
+class ValidacionCruzada:
+    def __init__(self, datos_procesados_path="saves/datos_procesados.json", k_pliegues=5, n_procesos=None,
+                 k_vecinos=5, k_centroides=4, semilla=0):
+        """
+        Validación cruzada en k pliegues de ambos clasificadores, con los pliegues evaluados en paralelo en varios
+        procesos. Usa las características ya extraídas en datos_procesados.json, sin volver a procesar archivos.
+
+        :param datos_procesados_path: Archivo con las características y etiquetas de entrenamiento.
+        :param k_pliegues: Cantidad de pliegues.
+        :param n_procesos: Procesos en paralelo (por defecto, uno por núcleo sin superar la cantidad de pliegues).
+        :param k_vecinos: Vecinos del K-NN de audio.
+        :param k_centroides: Centroides del K-means de imagen.
+        :param semilla: Semilla para el reparto de pliegues y la inicialización del K-means.
+        """
+        self.datos_procesados_path = datos_procesados_path
+        self.k_pliegues = k_pliegues
+        self.n_procesos = n_procesos or min(k_pliegues, os.cpu_count() or 1)
+        self.k_vecinos = k_vecinos
+        self.k_centroides = k_centroides
+        self.semilla = semilla
+        self.datos = None
+
+    def cargar_datos(self):
+        with open(self.datos_procesados_path, 'r') as f:
+            datos = json.load(f)
+        self.datos = (
+            np.array(datos['audio'], dtype=float), np.array(datos['etiquetas_audio']),
+            np.array(datos['imagen'], dtype=float), np.array(datos['etiquetas_imagen']),
+        )
+        print(f"Datos cargados: {len(self.datos[0])} audios y {len(self.datos[2])} imágenes.")
+        return self.datos
+
+    def resumir(self, resultados, tipo):
+        exactitudes = [r[f"exactitud_{tipo}"] for r in resultados if r.get(f"exactitud_{tipo}") is not None]
+        if not exactitudes:
+            return None, None
+        return float(np.mean(exactitudes)), float(np.std(exactitudes))
+
+    def ejecutar(self):
+        """
+        Ejecuta la validación cruzada y muestra la exactitud y el tiempo de cada pliegue y la media y el desvío.
+
+        :return: Diccionario con los resultados por pliegue y el resumen.
+        """
+        if self.datos is None:
+            self.cargar_datos()
+        audios, labels_audio, imagenes, labels_imagen = self.datos
+        pliegues_audio = pliegues_estratificados(labels_audio, self.k_pliegues, self.semilla)
+        pliegues_imagen = pliegues_estratificados(labels_imagen, self.k_pliegues, self.semilla)
+
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.n_procesos) as pool:
+            futuros = [
+                pool.submit(_evaluar_pliegue, self.datos, pliegues_audio[i], pliegues_imagen[i],
+                            self.k_vecinos, self.k_centroides, self.semilla, i)
+                for i in range(self.k_pliegues)
+            ]
+            resultados = [futuro.result() for futuro in futuros]
+        tiempo_total = time.perf_counter() - inicio
+
+        print(f"\nValidación cruzada en {self.k_pliegues} pliegues ({self.n_procesos} procesos):")
+        print(f"{'Pliegue':<10}{'Audio':>10}{'Imagen':>10}{'Tiempo (s)':>12}")
+        for r in resultados:
+            audio = f"{r['exactitud_audio'] * 100:.2f}%" if r['exactitud_audio'] is not None else "-"
+            imagen = f"{r['exactitud_imagen'] * 100:.2f}%" if r['exactitud_imagen'] is not None else "-"
+            print(f"{r['pliegue'] + 1:<10}{audio:>10}{imagen:>10}{r['tiempo']:>12.3f}")
+
+        resumen = {"tiempo_total": tiempo_total}
+        for tipo in ("audio", "imagen"):
+            media, desvio = self.resumir(resultados, tipo)
+            resumen[tipo] = {"media": media, "desvio": desvio}
+            if media is not None:
+                print(f"Exactitud de {tipo}: {media * 100:.2f}% ± {desvio * 100:.2f}%")
+        print(f"Tiempo total: {tiempo_total:.3f} s")
+        return {"pliegues": resultados, "resumen": resumen}
+
+    def evaluar_retenidos(self, rutas_evaluacion, cache_caracteristicas, ruta_salida=None):
+        """
+        Entrena con todos los datos procesados y evalúa sobre una base separada (por ejemplo db_evaluacion/),
+        cuyas características se extraen una sola vez a través de la cache de características.
+
+        :param rutas_evaluacion: Carpetas de la base de evaluación, una por etiqueta.
+        :param cache_caracteristicas: CacheCaracteristicas usada para la extracción.
+        :param ruta_salida: Si se indica, guarda ahí las características extraídas de la base de evaluación.
+        """
+        from Procesador import Procesador
+
+        if self.datos is None:
+            self.cargar_datos()
+
+        inicio = time.perf_counter()
+        procesador = Procesador(rutas_evaluacion, cache_caracteristicas=cache_caracteristicas)
+        procesador.procesar_varias_carpetas()
+        tiempo_extraccion = time.perf_counter() - inicio
+        if ruta_salida:
+            procesador.guardar_datos(ruta_salida)
+
+        audios, labels_audio, imagenes, labels_imagen = self.datos
+        resultado = entrenar_y_evaluar(
+            audios, labels_audio, imagenes, labels_imagen,
+            np.array(procesador.datos_audio, dtype=float), np.array(procesador.etiquetas_audio),
+            np.array(procesador.datos_imagen, dtype=float), np.array(procesador.etiquetas_imagen),
+            k_vecinos=self.k_vecinos, k_centroides=self.k_centroides, semilla=self.semilla,
+        )
+        resultado["tiempo_extraccion"] = tiempo_extraccion
+        resultado["cache"] = cache_caracteristicas.estadisticas()
+
+        print("\nEvaluación sobre la base retenida:")
+        for tipo in ("audio", "imagen"):
+            if resultado[f"exactitud_{tipo}"] is not None:
+                print(f"Exactitud de {tipo}: {resultado[f'exactitud_{tipo}'] * 100:.2f}% ({resultado[f'muestras_{tipo}']} muestras)")
+        print(f"Extracción: {tiempo_extraccion:.3f} s (cache: {resultado['cache']['aciertos']} aciertos, "
+              f"{resultado['cache']['fallos']} fallos); entrenamiento: {resultado['tiempo_entrenamiento']:.3f} s")
+        return resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validación cruzada en paralelo y evaluación sobre la base retenida.")
+    parser.add_argument('--pliegues', type=int, default=5)
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--datos', default="saves/datos_procesados.json", help="Características de entrenamiento.")
+    parser.add_argument('--retenidos', action='store_true', help="Evalúa además sobre ../db_evaluacion/.")
+    argumentos = parser.parse_args()
+
+    validacion = ValidacionCruzada(argumentos.datos, k_pliegues=argumentos.pliegues, n_procesos=argumentos.procesos)
+    validacion.ejecutar()
+    if argumentos.retenidos:
+        from CacheCaracteristicas import CacheCaracteristicas
+        from Rutas import EVALUATION_DB_PATHS
+        validacion.evaluar_retenidos(EVALUATION_DB_PATHS, CacheCaracteristicas(), ruta_salida="saves/evaluacion_procesados.json")
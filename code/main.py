@@ -1,29 +1,82 @@
-import questionary
 from Procesador import Procesador
 from Entrenador import Entrenador
 from Evaluador import Evaluador
+from ValidacionCruzada import ValidacionCruzada
+from CacheCaracteristicas import CacheCaracteristicas
+from Perfilador import Perfilador
+from ControlAdmision import leer_limite
+from Rutas import DB_PATHS, EVALUATION_DB_PATHS
 import subprocess
+import argparse
 import json
 import time
 import os
+import sys
 
 # Rutas para guardar los archivos procesados y entrenados
 PROCESSED_DATA_PATH = "saves/datos_procesados.json"
-TRAINED_MODEL_PATH = "saves/modelos_entrenados.json"
+TRAINED_MODEL_PATH = "saves/modelos_entrenados.bin"
 EVALUATION_RESULTS_PATH = "saves/evaluacion_procesados.json"
+FEATURE_CACHE_PATH = "saves/cache_caracteristicas.json"
+GRAPHS_DIR = "saves/graficos"
+BACKGROUND_MODEL_PATH = "saves/modelo_fondo.npz"
 
 # Variable global para el proceso del servidor
 server_process = None
 
-def procesar_datos():
-    rutas_db = ["../db/papa/", "../db/zanahoria/", "../db/camote/", "../db/berenjena/"]
-    procesador = Procesador(rutas_db)
-    procesador.procesar_varias_carpetas()
+# Inactivo salvo con 'python main.py --perfil DIR ...', que mide cada etapa y perfila con cProfile
+perfilador = Perfilador()
+
+def procesar_datos(rutas_db=None, ruta_salida=PROCESSED_DATA_PATH, n_trabajadores=1, ruta_cache=None,
+                   medir_memoria=False, presupuesto_memoria=None, control_calidad=None, ruta_fondo=None):
+    """
+    Extrae las características de todas las carpetas y las guarda en un JSON.
+
+    :param rutas_db: Carpetas a procesar (por defecto, DB_PATHS).
+    :param ruta_salida: Archivo donde guardar las características.
+    :param n_trabajadores: Procesos que extraen características en paralelo.
+    :param ruta_cache: Archivo de la cache de características, o None para no usarla.
+    :param medir_memoria: Si es True, el resumen incluye el pico de memoria de cada archivo.
+    :param presupuesto_memoria: Memoria máxima en bytes entre este proceso y los trabajadores, o None para no limitarlo.
+    :param control_calidad: 'rechazar' descarta las imágenes que no pasan el control de calidad, 'marcar' solo las
+                            informa en el resumen y None no lo ejecuta.
+    :param ruta_fondo: Modelo de fondo calibrado (ver 'calibrar-fondo'), o None para usar el método HSV.
+    """
+    cache = CacheCaracteristicas(ruta_cache) if ruta_cache else None
+    control = None
+    if control_calidad is not None:
+        from ControlCalidad import ControlCalidad
+        control = ControlCalidad(rechazar=control_calidad == 'rechazar')
+    procesador = Procesador(rutas_db or DB_PATHS, cache_caracteristicas=cache, n_trabajadores=n_trabajadores,
+                            medir_memoria=medir_memoria, presupuesto_memoria=presupuesto_memoria, control_calidad=control,
+                            ruta_fondo=ruta_fondo)
+    with perfilador.etapa("procesar: extraccion"):
+        procesador.procesar_varias_carpetas()
     procesador.mostrar_resumen()
-    procesador.guardar_datos()
+    with perfilador.etapa("procesar: guardado"):
+        procesador.guardar_datos(ruta_salida)
+
+def guardar_copia_json(ruta_modelo):
+    """Regenera la copia de intercambio en JSON (junto al modelo binario) para que no quede desactualizada."""
+    raiz, extension = os.path.splitext(ruta_modelo)
+    if extension != '.bin':
+        return
+    try:
+        copia = Entrenador()
+        copia.cargar_modelos(ruta_modelo)
+        copia.guardar_modelos(raiz + '.json')
+    except Exception as e:
+        print(f"Error al guardar la copia JSON del modelo: {e}")
+
+def entrenar_modelos(numero_iteraciones=10, ruta_datos=PROCESSED_DATA_PATH, ruta_modelo=TRAINED_MODEL_PATH):
+    """
+    Entrena varias veces (el K-means depende de la inicialización) y conserva el modelo con mejor calidad.
 
-def entrenar_modelos(numero_iteraciones=10):
-    entrenador = Entrenador(k_vecinos=5, k_centroides=4, datos_procesados_path=PROCESSED_DATA_PATH)
+    :param numero_iteraciones: Cantidad de entrenamientos a comparar.
+    :param ruta_datos: Características de entrenamiento.
+    :param ruta_modelo: Archivo donde guardar el mejor modelo (.bin binario, .json JSON).
+    """
+    entrenador = Entrenador(k_vecinos=5, k_centroides=4, datos_procesados_path=ruta_datos)
 
     # Cargar datos procesados
     try:
@@ -41,16 +94,18 @@ def entrenar_modelos(numero_iteraciones=10):
 
         # Entrenar clasificadores
         try:
-            entrenador.configurar_clasificadores()
+            with perfilador.etapa("entrenar: clasificadores"):
+                entrenador.configurar_clasificadores()
             print("Configuración y entrenamiento de clasificadores exitosa.")
         except Exception as e:
             print(f"Error en la configuración de clasificadores: {e}")
             continue
 
         # Guardar modelos entrenados temporalmente
-        modelo_temp_path = f"{TRAINED_MODEL_PATH}_temp_iter{iteracion}"
+        modelo_temp_path = f"{ruta_modelo}_temp_iter{iteracion}"
         try:
-            entrenador.guardar_modelos(modelo_temp_path)
+            with perfilador.etapa("entrenar: guardado"):
+                entrenador.guardar_modelos(modelo_temp_path)
             print(f"Modelo temporal guardado en: {modelo_temp_path}")
         except Exception as e:
             print(f"Error al guardar modelos en la iteración {iteracion}: {e}")
@@ -58,8 +113,9 @@ def entrenar_modelos(numero_iteraciones=10):
 
         # Evaluar calidad del modelo
         try:
-            evaluador = Evaluador(modelo_path=modelo_temp_path, datos_procesados_path=PROCESSED_DATA_PATH)
-            calidad = evaluador.evaluar_imagen()
+            with perfilador.etapa("entrenar: evaluacion"):
+                evaluador = Evaluador(modelo_path=modelo_temp_path, datos_procesados_path=ruta_datos)
+                calidad = evaluador.evaluar_imagen()
             print(f"Calidad del modelo temporal {iteracion}: {calidad}")
         except Exception as e:
             print(f"Error al evaluar el modelo en la iteración {iteracion}: {e}")
@@ -73,45 +129,73 @@ def entrenar_modelos(numero_iteraciones=10):
         else:
             print("No hubo mejora en la calidad del modelo.")
 
-    # Guardar el mejor modelo encontrado como TRAINED_MODEL_PATH
+    # Guardar el mejor modelo encontrado en ruta_modelo
     if mejor_modelo_path is not None:
         try:
-            import shutil
-            shutil.copyfile(mejor_modelo_path, TRAINED_MODEL_PATH)
-            print(f"\nMejor modelo guardado en: {TRAINED_MODEL_PATH}")
+            # Se renombra en lugar de copiar: los servidores tienen el modelo vigente mapeado en memoria y no deben
+            # ver nunca un archivo a medio escribir (el temporal está en el mismo directorio, así que es atómico)
+            os.replace(mejor_modelo_path, ruta_modelo)
+            # Las actualizaciones incrementales pertenecían al modelo anterior
+            ruta_deltas = Entrenador.ruta_deltas(ruta_modelo)
+            if os.path.exists(ruta_deltas):
+                os.remove(ruta_deltas)
+                print(f"Actualizaciones incrementales del modelo anterior descartadas: {ruta_deltas}")
+            print(f"\nMejor modelo guardado en: {ruta_modelo}")
             print(f"Calidad del mejor modelo: {mejor_calidad}")
         except Exception as e:
             print(f"Error al guardar el mejor modelo: {e}")
+        else:
+            guardar_copia_json(ruta_modelo)
     else:
         print("No se encontró un modelo con mejor calidad.")
 
     # Limpieza de modelos temporales
     try:
-        import os
         for iteracion in range(1, numero_iteraciones + 1):
-            modelo_temp_path = f"{TRAINED_MODEL_PATH}_temp_iter{iteracion}"
+            modelo_temp_path = f"{ruta_modelo}_temp_iter{iteracion}"
             if os.path.exists(modelo_temp_path):
                 os.remove(modelo_temp_path)
                 print(f"Modelo temporal eliminado: {modelo_temp_path}")
     except Exception as e:
         print(f"Error al eliminar modelos temporales: {e}")
 
-def evaluar_modelos():
+def sin_pantalla():
+    """True si no hay una pantalla donde abrir ventanas (por ejemplo, en un servidor por SSH)."""
+    if os.name == 'nt' or sys.platform == 'darwin':
+        return False
+    return not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+def evaluar_modelos(directorio_graficos=None, formato_graficos="png", ruta_modelo=TRAINED_MODEL_PATH, ruta_datos=PROCESSED_DATA_PATH, graficar=True):
+    """
+    Evalúa los clasificadores y grafica sus características.
+
+    :param directorio_graficos: Carpeta donde guardar los gráficos en lugar de abrir ventanas.
+                                Si no hay pantalla disponible se usa GRAPHS_DIR.
+    :param formato_graficos: 'png' o 'svg'.
+    :param ruta_modelo: Archivo de modelos a evaluar.
+    :param ruta_datos: Características con las que se evalúa.
+    :param graficar: Si es False, no genera los gráficos.
+    """
+    if directorio_graficos is None and sin_pantalla():
+        directorio_graficos = GRAPHS_DIR
+
     # Verificar que el archivo de modelos exista
-    if not os.path.exists(TRAINED_MODEL_PATH):
-        print(f"Error: El archivo de modelos entrenados '{TRAINED_MODEL_PATH}' no existe. Por favor, entrena los modelos primero.")
+    if not os.path.exists(ruta_modelo):
+        print(f"Error: El archivo de modelos entrenados '{ruta_modelo}' no existe. Por favor, entrena los modelos primero.")
         return
 
-    evaluador = Evaluador(modelo_path=TRAINED_MODEL_PATH, datos_procesados_path=PROCESSED_DATA_PATH)
+    evaluador = Evaluador(modelo_path=ruta_modelo, datos_procesados_path=ruta_datos)
 
     print("Evaluación completa de los clasificadores:")
-    evaluador.ejecutar_evaluacion()
-
-    print("Visualización de características de audio:")
-    evaluador.plot_3d_caracteristicas(tipo='audio')
+    with perfilador.etapa("evaluar: clasificadores"):
+        evaluador.ejecutar_evaluacion()
 
-    print("Visualización de características de imagen:")
-    evaluador.plot_3d_caracteristicas(tipo='imagen')
+    if graficar:
+        for tipo in ('audio', 'imagen'):
+            print(f"Visualización de características de {tipo}:")
+            ruta_grafico = os.path.join(directorio_graficos, f"caracteristicas_{tipo}.{formato_graficos}") if directorio_graficos else None
+            with perfilador.etapa(f"evaluar: grafico {tipo}"):
+                evaluador.plot_3d_caracteristicas(tipo=tipo, ruta_salida=ruta_grafico)
 
     print("Cálculo de estadísticas por etiqueta para audio:")
     evaluador.calcular_estadisticas_por_etiqueta(evaluador.caracteristicas_audio, evaluador.labels_audio, tipo='audio')
@@ -119,12 +203,42 @@ def evaluar_modelos():
     print("Cálculo de estadísticas por etiqueta para imagen:")
     evaluador.calcular_estadisticas_por_etiqueta(evaluador.caracteristicas_imagen, evaluador.labels_imagen, tipo='imagen')
 
-def iniciar_servidor():
+def validar_modelos(k_pliegues=5, ruta_datos=PROCESSED_DATA_PATH, n_procesos=None, rutas_evaluacion=None, ruta_cache=FEATURE_CACHE_PATH):
+    """Validación cruzada en paralelo sobre los datos procesados y evaluación sobre la base retenida (db_evaluacion)."""
+    if not os.path.exists(ruta_datos):
+        print(f"Error: El archivo de datos procesados '{ruta_datos}' no existe. Por favor, procesa los datos primero.")
+        return
+
+    validacion = ValidacionCruzada(ruta_datos, k_pliegues=k_pliegues, n_procesos=n_procesos)
+    with perfilador.etapa("validar: pliegues"):
+        validacion.ejecutar()
+
+    with perfilador.etapa("validar: base retenida"):
+        validacion.evaluar_retenidos(rutas_evaluacion or EVALUATION_DB_PATHS, CacheCaracteristicas(ruta_cache), ruta_salida=EVALUATION_RESULTS_PATH)
+
+def iniciar_servidor(prefork=False, trabajadores=None, sin_cache=False, calidad='marcar'):
+    """
+    Inicia el servidor en un proceso separado.
+
+    :param prefork: Si es True, usa el servidor de producción con varios procesos trabajadores.
+    :param trabajadores: Cantidad de procesos trabajadores del modo prefork (por defecto, uno por núcleo).
+    :param sin_cache: Desactiva la cache de predicciones.
+    :param calidad: 'rechazar', 'marcar' o 'no': qué hacer con las imágenes que no pasan el control de calidad.
+    """
     global server_process
     if server_process is None:
         try:
             # Inicia el servidor en un proceso separado
-            server_process = subprocess.Popen(["python", "servidor.py"])
+            if prefork:
+                comando = ["python", "ServidorPrefork.py"]
+                if trabajadores:
+                    comando += ["--trabajadores", str(trabajadores)]
+            else:
+                comando = ["python", "servidor.py"]
+            comando += ["--calidad", calidad]
+            if sin_cache:
+                comando.append("--sin-cache")
+            server_process = subprocess.Popen(comando)
             time.sleep(1)
             print("Servidor iniciado en http://localhost:5000")
         except Exception as e:
@@ -137,12 +251,181 @@ def detener_servidor():
     global server_process
     if server_process is not None:
         server_process.terminate()
+        try:
+            # El servidor prefork espera a que sus trabajadores terminen las solicitudes en curso
+            server_process.wait(timeout=35)
+        except subprocess.TimeoutExpired:
+            server_process.kill()
         server_process = None
         print("Servidor detenido.")
     else:
         print("El servidor no está en ejecución.")
 
+def servir(prefork=False, trabajadores=None, host='0.0.0.0', puerto=5000, sin_cache=False, calidad='marcar',
+           ruta_fondo=None, limites=None):
+    """Ejecuta el servidor en este proceso (en primer plano) hasta que se interrumpa."""
+    import servidor
+
+    servidor.configurar(sin_cache, calidad, ruta_fondo, limites)
+    if prefork:
+        servidor.crear_servidor_prefork(host, puerto, trabajadores).iniciar()
+    else:
+        servidor.cargar_modelos()
+        servidor.calentamiento.ejecutar_en_segundo_plano()
+        servidor.app.run(host=host, port=puerto, threaded=True)
+
+def clasificar_video(ruta_video, ruta_modelo=TRAINED_MODEL_PATH, cada_n_frames=5, umbral_movimiento=None,
+                     ventana_suavizado=5, ancho_maximo=None, ruta_salida=None, ruta_fondo=None):
+    """
+    Clasifica los frames de un video con el clasificador de imágenes y muestra las etiquetas suavizadas y los frames/s.
+
+    :param ruta_video: Archivo de video.
+    :param ruta_modelo: Archivo de modelos entrenados.
+    :param cada_n_frames: Se examina un frame de cada N.
+    :param umbral_movimiento: Fracción de píxeles que deben cambiar para volver a clasificar, o None.
+    :param ventana_suavizado: Clasificaciones que votan la etiqueta suavizada.
+    :param ancho_maximo: Ancho máximo de los frames a clasificar, o None para no reducirlos.
+    :param ruta_salida: Si se indica, guarda ahí los resultados por frame y las estadísticas en JSON.
+    :param ruta_fondo: Modelo de fondo calibrado (ver 'calibrar-fondo'), o None para usar el método HSV.
+    """
+    from ProcesadorVideo import ProcesadorVideo
+    from ModeloFondo import ModeloFondo
+
+    entrenador = Entrenador()
+    entrenador.cargar_modelos(ruta_modelo)
+    modelo_fondo = ModeloFondo.cargar(ruta_fondo) if ruta_fondo else None
+    procesador_video = ProcesadorVideo(ruta_video, entrenador.clasificador_imagen, cada_n_frames=cada_n_frames,
+                                       umbral_movimiento=umbral_movimiento, ventana_suavizado=ventana_suavizado,
+                                       ancho_maximo=ancho_maximo, modelo_fondo=modelo_fondo)
+    with perfilador.etapa("video: clasificacion"):
+        procesador_video.procesar()
+    procesador_video.mostrar_resumen()
+    if ruta_salida:
+        with open(ruta_salida, 'w') as f:
+            json.dump({"estadisticas": procesador_video.estadisticas, "frames": procesador_video.resultados}, f, indent=4)
+        print(f"Resultados del video guardados en: {ruta_salida}")
+
+def calibrar_fondo(origen, ruta_salida=BACKGROUND_MODEL_PATH, cantidad=10, ancho_maximo=None):
+    """
+    Aprende el fondo de una estación de cámara fija a partir de imágenes de la cinta vacía.
+
+    :param origen: Carpeta con imágenes de la cinta vacía, o un video cuyos primeros frames la muestran vacía.
+    :param ruta_salida: Archivo donde guardar el modelo de fondo.
+    :param cantidad: Imágenes (o frames) a usar como máximo.
+    :param ancho_maximo: Debe coincidir con el '--ancho-maximo' con que se clasificará el video.
+    """
+    from ModeloFondo import ModeloFondo
+
+    modelo_fondo = ModeloFondo()
+    if os.path.isdir(origen):
+        archivos = sorted(os.path.join(origen, a) for a in os.listdir(origen) if a.lower().endswith(('.jpg', '.jpeg', '.png')))
+        modelo_fondo.calibrar_desde_archivos(archivos[:cantidad], ancho_maximo)
+    else:
+        modelo_fondo.calibrar_desde_video(origen, cantidad, ancho_maximo=ancho_maximo)
+    modelo_fondo.guardar(ruta_salida)
+
+def crear_parser():
+    """Línea de comandos no interactiva: un subcomando por cada paso del pipeline."""
+    parser = argparse.ArgumentParser(description="Procesamiento, entrenamiento, evaluación y servidor de los clasificadores.")
+    parser.add_argument('--perfil', metavar='DIR',
+                        help="Perfila la ejecución con cProfile y guarda en DIR perfil.prof, perfil.txt y etapas.json. "
+                             "Solo se perfila el proceso principal: con 'procesar --trabajadores N' (N > 1) la "
+                             "extracción ocurre en procesos hijos y aparece como espera.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    procesar = subparsers.add_parser('procesar', help="Extrae las características de las carpetas de la base de datos.")
+    procesar.add_argument('--carpetas', nargs='+', default=DB_PATHS, help="Carpetas a procesar, una por etiqueta.")
+    procesar.add_argument('--salida', default=PROCESSED_DATA_PATH, help="Archivo JSON de salida.")
+    procesar.add_argument('--trabajadores', type=int, default=1, help="Procesos de extracción en paralelo.")
+    procesar.add_argument('--cache', nargs='?', const=FEATURE_CACHE_PATH, default=None, metavar='RUTA',
+                          help="Usa la cache de características (por defecto en %(const)s).")
+    procesar.add_argument('--memoria', action='store_true', help="Mide el pico de memoria de cada archivo y lo muestra en el resumen.")
+    procesar.add_argument('--presupuesto-memoria', type=float, default=None, metavar='MB',
+                          help="Memoria máxima (PSS) entre el proceso principal y los trabajadores; limita los archivos en curso.")
+    procesar.add_argument('--calidad', choices=['rechazar', 'marcar'], default=None,
+                          help="Revisa una vista previa de cada imagen (fondo, nitidez, exposición) antes de extraerla.")
+    procesar.add_argument('--fondo', default=None, metavar='RUTA', help="Modelo de fondo calibrado para una cámara fija.")
+
+    entrenar = subparsers.add_parser('entrenar', help="Entrena los clasificadores y guarda el mejor modelo.")
+    entrenar.add_argument('--datos', default=PROCESSED_DATA_PATH)
+    entrenar.add_argument('--modelo', default=None, help="Archivo del modelo (por defecto, saves/modelos_entrenados.<formato>).")
+    entrenar.add_argument('--formato', choices=['bin', 'json'], default='bin', help="Formato del modelo si no se indica --modelo.")
+    entrenar.add_argument('--iteraciones', type=int, default=10)
+
+    evaluar = subparsers.add_parser('evaluar', help="Evalúa los clasificadores y grafica sus características.")
+    evaluar.add_argument('--datos', default=PROCESSED_DATA_PATH)
+    evaluar.add_argument('--modelo', default=TRAINED_MODEL_PATH)
+    evaluar.add_argument('--graficos', default=None, metavar='DIR', help="Carpeta donde guardar los gráficos en lugar de abrir ventanas.")
+    evaluar.add_argument('--formato-graficos', choices=['png', 'svg'], default='png')
+    evaluar.add_argument('--sin-graficos', action='store_true')
+    evaluar.add_argument('--pliegues', type=int, default=0, help="Si es mayor que 1, agrega validación cruzada y evaluación sobre db_evaluacion.")
+    evaluar.add_argument('--procesos', type=int, default=None, help="Procesos para la validación cruzada.")
+
+    video = subparsers.add_parser('video', help="Clasifica los frames de un video de la cinta transportadora.")
+    video.add_argument('video', help="Archivo de video.")
+    video.add_argument('--modelo', default=TRAINED_MODEL_PATH)
+    video.add_argument('--cada', type=int, default=5, metavar='N', help="Examina un frame de cada N.")
+    video.add_argument('--movimiento', type=float, default=None, metavar='FRACCION',
+                       help="Solo clasifica los frames examinados en los que cambió al menos esta fracción de píxeles (por ejemplo 0.02).")
+    video.add_argument('--ventana', type=int, default=5, help="Clasificaciones que votan la etiqueta suavizada.")
+    video.add_argument('--ancho-maximo', type=int, default=None, help="Reduce los frames más anchos antes de clasificarlos.")
+    video.add_argument('--salida', default=None, help="Archivo JSON con los resultados por frame.")
+    video.add_argument('--fondo', default=None, metavar='RUTA', help="Modelo de fondo calibrado para una cámara fija.")
+
+    calibrar = subparsers.add_parser('calibrar-fondo', help="Aprende el fondo de una cámara fija con imágenes de la cinta vacía.")
+    calibrar.add_argument('origen', help="Carpeta con imágenes de la cinta vacía, o video que empieza con la cinta vacía.")
+    calibrar.add_argument('--salida', default=BACKGROUND_MODEL_PATH)
+    calibrar.add_argument('--cantidad', type=int, default=10, help="Imágenes o frames a usar.")
+    calibrar.add_argument('--ancho-maximo', type=int, default=None, help="El mismo que se usará al clasificar el video.")
+
+    servir_parser = subparsers.add_parser('servir', help="Inicia el servidor en primer plano.")
+    servir_parser.add_argument('--prefork', action='store_true', help="Usa varios procesos trabajadores.")
+    servir_parser.add_argument('--trabajadores', type=int, default=None)
+    servir_parser.add_argument('--host', default='0.0.0.0')
+    servir_parser.add_argument('--puerto', type=int, default=5000)
+    servir_parser.add_argument('--sin-cache', action='store_true', help="Desactiva la cache de predicciones.")
+    servir_parser.add_argument('--calidad', choices=['rechazar', 'marcar', 'no'], default='marcar',
+                               help="Qué hacer con las imágenes que no pasan el control de calidad de la vista previa.")
+    servir_parser.add_argument('--fondo', default=None, metavar='RUTA', help="Modelo de fondo calibrado para una cámara fija.")
+    servir_parser.add_argument('--limite', type=leer_limite, action='append', default=[], metavar='TIPO=N[,ESPERA[,SEG]]',
+                               help="Límite de admisión de un tipo (imagen, audio, lote, multimodal): solicitudes "
+                                    "simultáneas, en espera y espera máxima en segundos. Se puede repetir.")
+    return parser
+
+def ejecutar_comando(argumentos):
+    global perfilador
+    perfilador = Perfilador(argumentos.perfil)
+    perfilador.iniciar()
+    try:
+        if argumentos.comando == 'procesar':
+            presupuesto = int(argumentos.presupuesto_memoria * 2**20) if argumentos.presupuesto_memoria else None
+            procesar_datos(argumentos.carpetas, argumentos.salida, argumentos.trabajadores, argumentos.cache,
+                           medir_memoria=argumentos.memoria, presupuesto_memoria=presupuesto,
+                           control_calidad=argumentos.calidad, ruta_fondo=argumentos.fondo)
+        elif argumentos.comando == 'entrenar':
+            ruta_modelo = argumentos.modelo or f"saves/modelos_entrenados.{argumentos.formato}"
+            entrenar_modelos(argumentos.iteraciones, argumentos.datos, ruta_modelo)
+        elif argumentos.comando == 'evaluar':
+            evaluar_modelos(argumentos.graficos, argumentos.formato_graficos, argumentos.modelo, argumentos.datos,
+                            graficar=not argumentos.sin_graficos)
+            if argumentos.pliegues > 1:
+                validar_modelos(argumentos.pliegues, argumentos.datos, argumentos.procesos)
+        elif argumentos.comando == 'video':
+            clasificar_video(argumentos.video, argumentos.modelo, argumentos.cada, argumentos.movimiento,
+                             argumentos.ventana, argumentos.ancho_maximo, argumentos.salida, argumentos.fondo)
+        elif argumentos.comando == 'calibrar-fondo':
+            calibrar_fondo(argumentos.origen, argumentos.salida, argumentos.cantidad, argumentos.ancho_maximo)
+        elif argumentos.comando == 'servir':
+            servir(argumentos.prefork, argumentos.trabajadores, argumentos.host, argumentos.puerto,
+                   argumentos.sin_cache, argumentos.calidad, argumentos.fondo, argumentos.limite)
+    finally:
+        if argumentos.perfil:
+            perfilador.finalizar()
+
 def main():
+    """Menú interactivo; se usa cuando main.py se ejecuta sin argumentos."""
+    import questionary
+
     while True:
         opcion = questionary.select(
             "Seleccione una opción:",
@@ -150,7 +433,9 @@ def main():
                 "Procesar datos",
                 "Entrenar modelos",
                 "Evaluar modelos",
+                "Validación cruzada",
                 "Iniciar servidor",
+                "Iniciar servidor (varios procesos)",
                 "Salir"
             ]
         ).ask()
@@ -161,12 +446,19 @@ def main():
             entrenar_modelos()
         elif opcion == "Evaluar modelos":
             evaluar_modelos()
+        elif opcion == "Validación cruzada":
+            validar_modelos()
         elif opcion == "Iniciar servidor":
             iniciar_servidor()
+        elif opcion == "Iniciar servidor (varios procesos)":
+            iniciar_servidor(prefork=True)
         elif opcion == "Salir":
             print("Saliendo del programa.")
             detener_servidor()
             break
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        ejecutar_comando(crear_parser().parse_args())
+    else:
+        main()
\ No newline at end of file
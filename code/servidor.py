@@ -1,52 +1,341 @@
-from flask import Flask, request, jsonify, render_template, send_file, url_for
+from flask import Flask, request, jsonify, render_template, send_file, url_for, Response, stream_with_context, g
 import os
 import json
+import math
+import shutil
 import tempfile
+import zipfile
+import queue
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+import time
+import atexit
 import threading
-from Entrenador import Entrenador
+from RegistroModelos import RegistroModelos
+from ColaTrabajos import ColaTrabajos
+from ControlAdmision import ControlAdmision, leer_limite
+from CachePredicciones import CachePredicciones
+from GaleriaImagenes import GaleriaImagenes
+from Metricas import Metricas
+from Calentamiento import Calentamiento
 from ProcesadorAudio import ProcesadorAudio
 from ProcesadorImagen import ProcesadorImagen
-from werkzeug.utils import secure_filename
+from ControlCalidad import ControlCalidad, ImagenRechazada
+from ModeloFondo import ModeloFondo
 
 app = Flask(__name__)
 
-MODEL_PATH = "saves/modelos_entrenados.json"
-TEMP_DIR = tempfile.gettempdir()
+MODEL_PATH = "saves/modelos_entrenados.bin"
 EXTENSIONES_AUDIO_PERMITIDAS = {'wav'}
 EXTENSIONES_IMAGEN_PERMITIDAS = {'jpg', 'jpeg', 'png'}
 
+# Clasificación por lotes: archivos por solicitud y cantidad de resultados que se predicen juntos
+MAX_ARCHIVOS_LOTE = 500
+# Bytes (ya descomprimidos) que puede sumar un lote
+MAX_BYTES_LOTE = 200 * 1024 * 1024
+TAMANO_BLOQUE_LOTE = 16
+
+# Pool compartido para la extracción de características de los lotes (OpenCV y scipy liberan el GIL)
+pool_extraccion = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="extraccion")
+
+# Sin interfaz gráfica por defecto: las ventanas de depuración solo se abren con 'python servidor.py --gui'.
+# Las visualizaciones siguen disponibles como PNG en /depuracion_imagen y /depuracion_audio.
+MODO_GUI = False
+
 # Variable global para el proceso del servidor
 server_process = None
 
-# Diccionario para almacenar las imágenes recibidas temporalmente con sus etiquetas predecidas
-imagenes_temporales = {}
+# Trabajos asíncronos: cuántas extracciones corren a la vez, cuántas esperan y cuánto se guarda el resultado (s)
+cola_trabajos = ColaTrabajos(n_trabajadores=2, capacidad=32, expiracion=300)
+
+def respuesta_saturado(nombre, reintentar_en):
+    """Respuesta rápida para las solicitudes que superan la capacidad configurada."""
+    respuesta = jsonify({'error': f"El servidor está al límite de solicitudes de tipo '{nombre}', intente más tarde."})
+    respuesta.headers['Retry-After'] = str(reintentar_en)
+    return respuesta, 503
+
+# Control de admisión: solicitudes simultáneas, solicitudes en espera y espera máxima (s) por tipo de endpoint.
+# Se cambian al iniciar con '--limite TIPO=CONCURRENTES[,EN_ESPERA[,ESPERA_MAXIMA]]', por ejemplo '--limite imagen=8,16'
+control_admision = ControlAdmision(respuesta_saturado, reintentar_en=1)
+control_admision.agregar_limite('imagen', max_concurrentes=4, max_en_espera=8, tiempo_max_espera=5.0)
+control_admision.agregar_limite('audio', max_concurrentes=2, max_en_espera=8, tiempo_max_espera=5.0)
+control_admision.agregar_limite('lote', max_concurrentes=1, max_en_espera=2, tiempo_max_espera=5.0)
+control_admision.agregar_limite('multimodal', max_concurrentes=2, max_en_espera=8, tiempo_max_espera=5.0)
+
+# Pool propio para la mitad de audio de /clasificar_multimodal: en el pool de extracción esperaría detrás de los lotes.
+# Con un hilo por solicitud multimodal admitida, el audio nunca espera en la cola.
+pool_multimodal = ThreadPoolExecutor(max_workers=control_admision.limites['multimodal'].max_concurrentes,
+                                     thread_name_prefix="multimodal")
+
+# Galería acotada de miniaturas de las imágenes clasificadas, por etiqueta predicha
+galeria = GaleriaImagenes(max_por_etiqueta=12, max_bytes=20 * 1024 * 1024, lado_miniatura=200)
+atexit.register(galeria.vaciar)
+
+# Los modelos se cargan una sola vez y se reemplazan de forma atómica cuando cambia el archivo
+registro_modelos = RegistroModelos(MODEL_PATH)
+
+# Predicciones de archivos ya recibidos, por hash del contenido y versión del modelo; se vacía al cambiar de modelos
+cache_predicciones = CachePredicciones(max_entradas=1024, ttl=600)
+registro_modelos.agregar_oyente(cache_predicciones.invalidar)
+
+# Pasa un audio y una imagen sintéticos por los pipelines antes de declarar el servidor listo en /salud
+calentamiento = Calentamiento(registro_modelos)
+
+# Revisa una vista previa reducida de cada imagen y marca las inservibles en las métricas (None lo desactiva);
+# con 'python servidor.py --calidad rechazar' se rechazan antes del pipeline completo
+control_calidad = ControlCalidad(rechazar=False)
+
+# Fondo calibrado de una cámara fija con que segmentar las imágenes ('python servidor.py --fondo RUTA'); None usa HSV
+modelo_fondo = None
+
+# Métricas en formato Prometheus, expuestas en /metrics
+metricas = Metricas(prefijo="ia1")
+metricas.definir_contador('solicitudes_total', "Solicitudes atendidas por endpoint y código de respuesta.")
+metricas.definir_contador('errores_total', "Solicitudes que terminaron con un error del servidor (5xx) por endpoint.")
+metricas.definir_indicador('solicitudes_en_curso', "Solicitudes que se están procesando en este momento.")
+metricas.definir_histograma('duracion_solicitud_segundos', "Latencia de las solicitudes por endpoint.")
+metricas.definir_histograma('duracion_etapa_segundos', "Duración de cada etapa de los pipelines de audio e imagen.")
+metricas.definir_contador('imagenes_rechazadas_total', "Imágenes rechazadas por el control de calidad por motivo.")
+metricas.definir_contador('imagenes_marcadas_total', "Imágenes con problemas de calidad que se procesaron igual, por motivo.")
+
+def recolectar_metricas_componentes():
+    """Métricas que se leen de los componentes del servidor al momento de exportar."""
+    resultado = [
+        ('cargas_modelo_total', 'counter', "Veces que se cargaron los modelos desde disco.", [({}, registro_modelos.cantidad_cargas)]),
+    ]
+    estadisticas_cache = cache_predicciones.estadisticas()
+    resultado.append(('cache_consultas_total', 'counter', "Consultas a la cache de predicciones por resultado.",
+                      [({'resultado': 'acierto'}, estadisticas_cache['aciertos']), ({'resultado': 'fallo'}, estadisticas_cache['fallos'])]))
+    resultado.append(('cache_entradas', 'gauge', "Predicciones guardadas en la cache.", [({}, estadisticas_cache['entradas'])]))
+    limites = control_admision.estadisticas()
+    resultado.append(('admision_en_espera', 'gauge', "Solicitudes esperando un lugar por tipo.", [({'tipo': tipo}, datos['en_espera']) for tipo, datos in limites.items()]))
+    resultado.append(('admision_rechazadas_total', 'counter', "Solicitudes rechazadas por exceso de carga por tipo.", [({'tipo': tipo}, datos['rechazadas']) for tipo, datos in limites.items()]))
+    resultado.append(('admision_espera_promedio_segundos', 'gauge', "Espera promedio para obtener un lugar por tipo.", [({'tipo': tipo}, datos['tiempo_espera_promedio']) for tipo, datos in limites.items()]))
+    resultado.append(('trabajos_en_cola', 'gauge', "Trabajos asíncronos esperando ser ejecutados.", [({}, cola_trabajos.estadisticas()['en_cola'])]))
+    return resultado
+
+metricas.agregar_recolector(recolectar_metricas_componentes)
 
-entrenador = Entrenador(datos_procesados_path="saves/datos_procesados.json")
+@app.before_request
+def iniciar_medicion_solicitud():
+    g.inicio_solicitud = time.perf_counter()
+    metricas.incrementar('solicitudes_en_curso')
+
+@app.after_request
+def registrar_medicion_solicitud(respuesta):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'desconocido'
+    metricas.incrementar('solicitudes_total', {'endpoint': endpoint, 'codigo': respuesta.status_code})
+    if respuesta.status_code >= 500:
+        metricas.incrementar('errores_total', {'endpoint': endpoint})
+    metricas.observar('duracion_solicitud_segundos', time.perf_counter() - g.inicio_solicitud, {'endpoint': endpoint})
+    return respuesta
+
+@app.teardown_request
+def finalizar_medicion_solicitud(error=None):
+    if 'inicio_solicitud' in g:
+        metricas.incrementar('solicitudes_en_curso', valor=-1)
 
 def archivo_permitido(nombre_archivo, extensiones_permitidas):
     return '.' in nombre_archivo and nombre_archivo.rsplit('.', 1)[1].lower() in extensiones_permitidas
 
 def cargar_modelos():
-    """Carga los modelos entrenados desde el archivo JSON y actualiza los clasificadores en el entrenador."""
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"No se encontró el archivo de modelo en la ruta especificada: {MODEL_PATH}")
+    """Carga los modelos entrenados en el registro y activa la vigilancia del archivo de modelos."""
+    registro_modelos.cargar()
+    registro_modelos.iniciar_vigilancia()
+
+def configurar(sin_cache=False, calidad='marcar', ruta_fondo=None, limites=None):
+    """
+    Aplica las opciones de línea de comandos comunes a servidor.py, ServidorPrefork.py y 'main.py servir'.
+
+    :param sin_cache: Desactiva la cache de predicciones (por ejemplo, para pruebas de carga).
+    :param calidad: 'rechazar', 'marcar' o 'no': qué hacer con las imágenes que no pasan el control de calidad.
+    :param ruta_fondo: Modelo de fondo calibrado (ver 'main.py calibrar-fondo'), o None para usar el método HSV.
+    :param limites: Tuplas (tipo, max_concurrentes, max_en_espera, tiempo_max_espera) de leer_limite con que
+                    reemplazar los límites de admisión; los valores None conservan los actuales.
+    """
+    global control_calidad, modelo_fondo
+    if sin_cache:
+        cache_predicciones.max_entradas = 0
+    control_calidad = None if calidad == 'no' else ControlCalidad(rechazar=calidad == 'rechazar')
+    modelo_fondo = ModeloFondo.cargar(ruta_fondo) if ruta_fondo else None
+    for limite in limites or []:
+        control_admision.modificar_limite(*limite)
+    if limites:
+        ajustar_pool_multimodal()
+
+def ajustar_pool_multimodal():
+    """Vuelve a crear el pool multimodal con un hilo por solicitud multimodal admitida, tras cambiar su límite."""
+    global pool_multimodal
+    pool_multimodal.shutdown(wait=False)
+    pool_multimodal = ThreadPoolExecutor(max_workers=control_admision.limites['multimodal'].max_concurrentes,
+                                         thread_name_prefix="multimodal")
+
+def compartir_estado(n_trabajadores):
+    """
+    Prepara el estado del servidor para atenderlo con n_trabajadores procesos (ServidorPrefork). Los trabajos
+    asíncronos y las métricas se comparten en una carpeta temporal, así /trabajos/<id> y /metrics responden lo mismo
+    en cualquier trabajador; la galería se lista desde su carpeta, que ya es compartida. Los límites de admisión
+    y los de la galería se reparten entre los trabajadores para que sigan siendo los del servidor completo.
+    La cache de predicciones y /admision siguen siendo de cada trabajador (las respuestas indican su pid).
+    """
+    directorio = tempfile.mkdtemp(prefix="servidor_prefork_")
+    # Los trabajadores terminan con os._exit, así que solo el padre borra la carpeta al salir
+    atexit.register(shutil.rmtree, directorio, ignore_errors=True)
+    cola_trabajos.compartir(os.path.join(directorio, "trabajos"))
+    metricas.compartir(os.path.join(directorio, "metricas"))
+    galeria.compartir(n_trabajadores)
+    for nombre, limite in list(control_admision.limites.items()):
+        control_admision.modificar_limite(nombre, math.ceil(limite.max_concurrentes / n_trabajadores),
+                                          math.ceil(limite.max_en_espera / n_trabajadores))
+    ajustar_pool_multimodal()
+
+def terminar_trabajador():
+    """Al terminar un trabajador prefork: resuelve sus trabajos pendientes y deja sus métricas finales en disco."""
+    cola_trabajos.finalizar()
+    metricas.guardar_instantanea()
+
+def crear_servidor_prefork(host='0.0.0.0', puerto=5000, n_trabajadores=None):
+    """Crea el servidor de producción con varios procesos trabajadores sobre esta aplicación, con el estado compartido."""
+    from ServidorPrefork import ServidorPrefork
+
+    servidor_prefork = ServidorPrefork(app, registro_modelos, host=host, puerto=puerto, n_trabajadores=n_trabajadores,
+                                       calentamiento=calentamiento, al_iniciar_trabajador=metricas.iniciar_proceso,
+                                       al_terminar_trabajador=terminar_trabajador,
+                                       al_recoger_trabajador=metricas.absorber_proceso)
+    compartir_estado(servidor_prefork.n_trabajadores)
+    return servidor_prefork
+
+def procesar_audio(datos, nombre_archivo):
+    """Ejecuta el pipeline completo de audio sobre los datos recibidos y devuelve el procesador con las características extraídas."""
+    procesador_audio = ProcesadorAudio(nombre_archivo, datos=datos)
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'audio', 'etapa': 'decodificacion'}):
+        procesador_audio.cargar_audio()
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'audio', 'etapa': 'preprocesamiento'}):
+        procesador_audio.preprocesar_audio()
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'audio', 'etapa': 'extraccion'}):
+        procesador_audio.extraer_caracteristicas()
+    return procesador_audio
+
+def procesar_imagen(datos, nombre_archivo):
+    """Ejecuta el pipeline completo de imagen sobre los datos recibidos y devuelve el procesador con las características extraídas."""
+    if control_calidad is not None:
+        revisar_calidad(datos, nombre_archivo)
+    procesador_imagen = ProcesadorImagen(nombre_archivo, datos=datos, modelo_fondo=modelo_fondo)
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'imagen', 'etapa': 'decodificacion'}):
+        procesador_imagen.cargar_imagen()
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'imagen', 'etapa': 'preprocesamiento'}):
+        procesador_imagen.aplicar_retoque_lab()
+        procesador_imagen.eliminar_fondo()
+    with metricas.medir('duracion_etapa_segundos', {'pipeline': 'imagen', 'etapa': 'extraccion'}):
+        procesador_imagen.extraer_caracteristicas()
+    return procesador_imagen
+
+def revisar_calidad(datos, nombre_archivo):
+    """Control de calidad sobre la vista previa; lanza ImagenRechazada antes de decodificar la imagen completa."""
     try:
-        with open(MODEL_PATH, 'r') as f:
-            modelos = json.load(f)
-            # Cargar clasificador de audio
-            entrenador.clasificador_audio.from_dict(modelos['clasificador_audio'])
-            # Cargar clasificador de imagen
-            entrenador.clasificador_imagen.from_dict(modelos['clasificador_imagen'])
-        print("Modelos cargados exitosamente desde JSON.")
-    except json.JSONDecodeError:
-        print(f"Error: El archivo de modelo {MODEL_PATH} está corrupto o no es válido.")
-        raise
-    except KeyError as e:
-        print(f"Error: Falta la clave {e} en el archivo de modelo.")
-        raise
-    except Exception as e:
-        print(f"Se produjo un error inesperado al cargar los modelos: {e}")
+        with metricas.medir('duracion_etapa_segundos', {'pipeline': 'imagen', 'etapa': 'control_calidad'}):
+            resultado = control_calidad.verificar(nombre_archivo, datos)
+    except ImagenRechazada as e:
+        for motivo in e.motivos:
+            metricas.incrementar('imagenes_rechazadas_total', {'motivo': motivo})
         raise
+    for motivo in resultado['motivos']:
+        metricas.incrementar('imagenes_marcadas_total', {'motivo': motivo})
+
+def extraer_caracteristicas(tipo, datos, nombre_archivo):
+    """Extrae solo el vector de características, descartando las imágenes o señales intermedias."""
+    if tipo == 'audio':
+        return procesar_audio(datos, nombre_archivo).caracteristicas
+    return procesar_imagen(datos, nombre_archivo).caracteristicas
+
+def tipo_de_archivo(nombre_archivo):
+    """Devuelve 'audio' o 'imagen' según la extensión del archivo, o None si no está permitida."""
+    if archivo_permitido(nombre_archivo, EXTENSIONES_AUDIO_PERMITIDAS):
+        return 'audio'
+    if archivo_permitido(nombre_archivo, EXTENSIONES_IMAGEN_PERMITIDAS):
+        return 'imagen'
+    return None
+
+def listar_archivos_lote(archivos):
+    """
+    Lista los archivos de una solicitud por lotes, expandiendo los .zip, sin descomprimir ni leer nada todavía:
+    el tamaño de cada miembro sale del directorio del .zip, para poder rechazar el lote antes de ocupar memoria.
+
+    :return: Lista de tuplas (nombre, tipo, tamaño, leer), donde leer() devuelve los bytes, y lista de nombres ignorados.
+    """
+    entradas = []
+    ignorados = []
+    for archivo in archivos:
+        if archivo.filename.lower().endswith('.zip'):
+            comprimido = zipfile.ZipFile(archivo.stream)
+            for miembro in comprimido.infolist():
+                if miembro.is_dir():
+                    continue
+                tipo = tipo_de_archivo(miembro.filename)
+                if tipo is None:
+                    ignorados.append(miembro.filename)
+                else:
+                    # ZipFile nunca devuelve más bytes que el file_size declarado del miembro
+                    entradas.append((miembro.filename, tipo, miembro.file_size, partial(comprimido.read, miembro)))
+        else:
+            tipo = tipo_de_archivo(archivo.filename)
+            if tipo is None:
+                ignorados.append(archivo.filename)
+            else:
+                archivo.stream.seek(0, os.SEEK_END)
+                tamano = archivo.stream.tell()
+                archivo.stream.seek(0)
+                entradas.append((archivo.filename, tipo, tamano, archivo.read))
+    return entradas, ignorados
+
+def clasificar_archivo(modelos, tipo, datos, nombre_archivo):
+    """
+    Clasifica un archivo usando la cache de predicciones; solo extrae características si no está en cache.
+
+    :return: Tupla (etiqueta, procesador). El procesador es None si la predicción salió de la cache.
+    """
+    clave = cache_predicciones.clave(tipo, datos, modelos.version)
+    en_cache = cache_predicciones.obtener(clave)
+    if en_cache is not None:
+        return en_cache[1], None
+
+    if tipo == 'audio':
+        procesador = procesar_audio(datos, nombre_archivo)
+        with metricas.medir('duracion_etapa_segundos', {'pipeline': 'audio', 'etapa': 'prediccion'}):
+            etiqueta = str(modelos.clasificador_audio.predecir(procesador.caracteristicas))
+    else:
+        procesador = procesar_imagen(datos, nombre_archivo)
+        with metricas.medir('duracion_etapa_segundos', {'pipeline': 'imagen', 'etapa': 'prediccion'}):
+            etiqueta = str(modelos.clasificador_imagen.predecir(procesador.caracteristicas))
+    cache_predicciones.guardar(clave, procesador.caracteristicas, etiqueta)
+    return etiqueta, procesador
+
+def clasificar_archivo_medido(modelos, tipo, datos, nombre_archivo):
+    """Clasifica un archivo y devuelve (etiqueta, procesador, segundos), para reportar el tiempo de cada modalidad."""
+    inicio = time.perf_counter()
+    etiqueta, procesador = clasificar_archivo(modelos, tipo, datos, nombre_archivo)
+    return etiqueta, procesador, time.perf_counter() - inicio
+
+def clasificar_bloque(modelos, bloque):
+    """Clasifica un bloque de resultados con una sola llamada por lotes a cada clasificador y los guarda en cache."""
+    resultados = []
+    for tipo, clasificador in (('audio', modelos.clasificador_audio), ('imagen', modelos.clasificador_imagen)):
+        del_tipo = [(nombre, caracteristicas, clave) for nombre, tipo_archivo, caracteristicas, clave in bloque if tipo_archivo == tipo]
+        if not del_tipo:
+            continue
+        with metricas.medir('duracion_etapa_segundos', {'pipeline': tipo, 'etapa': 'prediccion_lote'}):
+            etiquetas = clasificador.predecir_lote([caracteristicas for _, caracteristicas, _ in del_tipo])
+        for (nombre, caracteristicas, clave), etiqueta in zip(del_tipo, etiquetas):
+            cache_predicciones.guardar(clave, caracteristicas, str(etiqueta))
+            resultados.append({'archivo': nombre, 'tipo': tipo, 'etiqueta': str(etiqueta)})
+    return resultados
+
+def clasificar_trabajo(tipo, datos, nombre_archivo):
+    """Clasifica un archivo dentro de un trabajo asíncrono con la versión de los modelos vigente al ejecutarse."""
+    modelos = registro_modelos.obtener()
+    etiqueta, _ = clasificar_archivo(modelos, tipo, datos, nombre_archivo)
+    return {'archivo': nombre_archivo, 'tipo': tipo, 'etiqueta': etiqueta, 'version_modelo': modelos.version}
 
 def iniciar_visualizacion_imagen(procesador_imagen):
     """Función para iniciar la visualización en un hilo separado."""
@@ -64,34 +353,25 @@ def index():
     return render_template('index.html')
 
 @app.route('/clasificar_audio', methods=['POST'])
+@control_admision.limitar('audio')
 def clasificar_audio():
     archivo_audio = request.files.get('audio')
     if archivo_audio and archivo_permitido(archivo_audio.filename, EXTENSIONES_AUDIO_PERMITIDAS):
         try:
-            cargar_modelos()
+            modelos = registro_modelos.obtener()
         except Exception as e:
             return jsonify({'error': f"Error al cargar los modelos: {str(e)}"}), 500
 
-        filename = secure_filename(archivo_audio.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=filename, dir=TEMP_DIR) as temp_audio:
-            archivo_audio.save(temp_audio.name)
-            temp_audio_path = temp_audio.name
-
         try:
-            procesador_audio = ProcesadorAudio(temp_audio_path)
-            procesador_audio.cargar_audio()
-            procesador_audio.preprocesar_audio()
-            procesador_audio.extraer_caracteristicas()
-            iniciar_interfaz(procesador_audio)
-
-            # Realizar la predicción
-            prediccion = entrenador.clasificador_audio.predecir(procesador_audio.caracteristicas)
-            etiqueta_predicha = str(prediccion)
+            # Realizar la predicción (o tomarla de la cache si el archivo ya se clasificó)
+            etiqueta_predicha, procesador_audio = clasificar_archivo(modelos, 'audio', archivo_audio.read(), archivo_audio.filename)
+            if MODO_GUI and procesador_audio is not None:
+                iniciar_interfaz(procesador_audio)
 
-            # Generar URLs para las imágenes que coinciden con la etiqueta predicha
+            # Generar URLs para las miniaturas de la galería que coinciden con la etiqueta predicha
             imagenes_mismas_etiquetas = [
-                url_for('mostrar_imagen', path=img_path)
-                for label, img_path in imagenes_temporales.items() if label == etiqueta_predicha
+                url_for('mostrar_miniatura', id_imagen=id_imagen)
+                for id_imagen in galeria.ids_por_etiqueta(etiqueta_predicha)
             ]
 
             # Renderizar la plantilla HTML con la etiqueta y las imágenes coincidentes
@@ -99,60 +379,324 @@ def clasificar_audio():
 
         except Exception as e:
             return jsonify({'error': f"Error al procesar el audio: {str(e)}"}), 500
-        finally:
-            os.remove(temp_audio_path)
     else:
         return jsonify({'error': 'No se proporcionó un archivo de audio válido.'}), 400
 
 @app.route('/clasificar_imagen', methods=['POST'])
+@control_admision.limitar('imagen')
 def clasificar_imagen():
     archivo_imagen = request.files.get('imagen')
     if archivo_imagen and archivo_permitido(archivo_imagen.filename, EXTENSIONES_IMAGEN_PERMITIDAS):
         try:
-            cargar_modelos()
+            modelos = registro_modelos.obtener()
         except Exception as e:
             return jsonify({'error': f"Error al cargar los modelos: {str(e)}"}), 500
 
-        filename = secure_filename(archivo_imagen.filename)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=filename, dir=TEMP_DIR) as temp_image:
-            archivo_imagen.save(temp_image.name)
-            temp_image_path = temp_image.name
-
         try:
-            procesador_imagen = ProcesadorImagen(temp_image_path)
-            procesador_imagen.cargar_imagen()
-            procesador_imagen.aplicar_retoque_lab()
-            procesador_imagen.eliminar_fondo()
-            procesador_imagen.extraer_caracteristicas()
-
-            iniciar_visualizacion_imagen(procesador_imagen)
+            datos_imagen = archivo_imagen.read()
+            etiqueta_predicha, procesador_imagen = clasificar_archivo(modelos, 'imagen', datos_imagen, archivo_imagen.filename)
+            if MODO_GUI and procesador_imagen is not None:
+                iniciar_visualizacion_imagen(procesador_imagen)
 
-            prediccion = entrenador.clasificador_imagen.predecir(procesador_imagen.caracteristicas)
-            etiqueta_predicha = str(prediccion)
-
-            # Almacenar la imagen con su etiqueta y renderizar la página de resultado
-            imagenes_temporales[etiqueta_predicha] = temp_image_path
+            # Agregar la miniatura a la galería con su etiqueta y renderizar la página de resultado
+            imagen_decodificada = procesador_imagen.imagen if procesador_imagen is not None else None
+            galeria.agregar(etiqueta_predicha, datos=datos_imagen, imagen=imagen_decodificada)
             return render_template('resultado_imagen.html', prediccion=etiqueta_predicha)
             
+        except ImagenRechazada as e:
+            return jsonify({'error': str(e), 'motivos': e.motivos}), 422
         except Exception as e:
             return jsonify({'error': f"Error al procesar la imagen: {str(e)}"}), 500
     else:
         return jsonify({'error': 'No se proporcionó un archivo de imagen válido.'}), 400
     
-@app.route('/mostrar_imagen')
-def mostrar_imagen():
-    path = request.args.get('path')
-    if path and os.path.exists(path):
-        return send_file(path, mimetype='image/jpeg')
+@app.route('/clasificar_multimodal', methods=['POST'])
+@control_admision.limitar('multimodal')
+def clasificar_multimodal():
+    """
+    Clasifica un audio y una imagen del mismo objeto (campos 'audio' e 'imagen') en una sola solicitud.
+
+    El audio se procesa en un pool propio mientras la imagen se procesa en el hilo de la solicitud, así la
+    latencia es aproximadamente la de la modalidad más lenta y no la suma de ambas. La decisión combinada es la
+    etiqueta en común si ambas predicciones coinciden, o null si no coinciden.
+    """
+    archivo_audio = request.files.get('audio')
+    archivo_imagen = request.files.get('imagen')
+    if not (archivo_audio and archivo_permitido(archivo_audio.filename, EXTENSIONES_AUDIO_PERMITIDAS)):
+        return jsonify({'error': 'No se proporcionó un archivo de audio válido.'}), 400
+    if not (archivo_imagen and archivo_permitido(archivo_imagen.filename, EXTENSIONES_IMAGEN_PERMITIDAS)):
+        return jsonify({'error': 'No se proporcionó un archivo de imagen válido.'}), 400
+
+    try:
+        modelos = registro_modelos.obtener()
+    except Exception as e:
+        return jsonify({'error': f"Error al cargar los modelos: {str(e)}"}), 500
+
+    inicio = time.perf_counter()
+    datos_audio = archivo_audio.read()
+    datos_imagen = archivo_imagen.read()
+    futuro_audio = pool_multimodal.submit(clasificar_archivo_medido, modelos, 'audio', datos_audio, archivo_audio.filename)
+    try:
+        etiqueta_imagen, procesador_imagen, tiempo_imagen = clasificar_archivo_medido(modelos, 'imagen', datos_imagen, archivo_imagen.filename)
+    except ImagenRechazada as e:
+        futuro_audio.cancel()
+        return jsonify({'error': str(e), 'motivos': e.motivos}), 422
+    except Exception as e:
+        futuro_audio.cancel()
+        return jsonify({'error': f"Error al procesar la imagen: {str(e)}"}), 500
+    try:
+        etiqueta_audio, procesador_audio, tiempo_audio = futuro_audio.result()
+    except Exception as e:
+        return jsonify({'error': f"Error al procesar el audio: {str(e)}"}), 500
+
+    try:
+        imagen_decodificada = procesador_imagen.imagen if procesador_imagen is not None else None
+        galeria.agregar(etiqueta_imagen, datos=datos_imagen, imagen=imagen_decodificada)
+    except Exception as e:
+        print(f"Error al agregar la imagen a la galería: {e}")
+
+    coinciden = etiqueta_audio == etiqueta_imagen
+    return jsonify({
+        'audio': {'archivo': archivo_audio.filename, 'etiqueta': etiqueta_audio, 'en_cache': procesador_audio is None, 'tiempo': tiempo_audio},
+        'imagen': {'archivo': archivo_imagen.filename, 'etiqueta': etiqueta_imagen, 'en_cache': procesador_imagen is None, 'tiempo': tiempo_imagen},
+        'coinciden': coinciden,
+        'decision': etiqueta_audio if coinciden else None,
+        'tiempo_total': time.perf_counter() - inicio,
+        'version_modelo': modelos.version,
+    })
+
+@app.route('/clasificar_lote', methods=['POST'])
+def clasificar_lote():
+    """
+    Clasifica varios audios e imágenes (o archivos .zip con ellos) enviados en el campo 'archivos'.
+
+    La extracción se reparte en el pool de trabajo y los resultados se devuelven como JSON por líneas
+    a medida que se completan, prediciendo cada bloque con una sola llamada por clasificador.
+    """
+    archivos = request.files.getlist('archivos')
+    if not archivos:
+        return jsonify({'error': "No se proporcionaron archivos en el campo 'archivos'."}), 400
+
+    try:
+        listados, ignorados = listar_archivos_lote(archivos)
+    except zipfile.BadZipFile as e:
+        return jsonify({'error': f"Archivo comprimido inválido: {str(e)}"}), 400
+    if not listados:
+        return jsonify({'error': 'No se encontraron archivos de audio o imagen válidos.', 'ignorados': ignorados}), 400
+    if len(listados) > MAX_ARCHIVOS_LOTE:
+        return jsonify({'error': f"El lote supera el máximo de {MAX_ARCHIVOS_LOTE} archivos."}), 413
+    if sum(tamano for _, _, tamano, _ in listados) > MAX_BYTES_LOTE:
+        return jsonify({'error': f"El lote supera el máximo de {MAX_BYTES_LOTE // 2**20} MB sin comprimir."}), 413
+
+    try:
+        modelos = registro_modelos.obtener()
+    except Exception as e:
+        return jsonify({'error': f"Error al cargar los modelos: {str(e)}"}), 500
+
+    # El lugar se toma antes de descomprimir y se libera al cerrar la respuesta, cuando termina de transmitirse el
+    # último resultado
+    limite = control_admision.limites['lote']
+    if not limite.adquirir():
+        return respuesta_saturado('lote', control_admision.reintentar_en)
+    try:
+        entradas = [(nombre, tipo, leer()) for nombre, tipo, _, leer in listados]
+    except Exception as e:
+        limite.liberar()
+        return jsonify({'error': f"Archivo comprimido inválido: {str(e)}"}), 400
+    listados.clear()
+
+    def generar():
+        futuros = {}
+        en_cache = 0
+        for nombre in ignorados:
+            yield json.dumps({'archivo': nombre, 'error': 'Extensión no permitida.'}) + "\n"
+        # Los archivos ya clasificados se responden de inmediato; el resto se extrae en el pool
+        for nombre, tipo, datos in entradas:
+            clave = cache_predicciones.clave(tipo, datos, modelos.version)
+            prediccion = cache_predicciones.obtener(clave)
+            if prediccion is not None:
+                en_cache += 1
+                yield json.dumps({'archivo': nombre, 'tipo': tipo, 'etiqueta': prediccion[1], 'cache': True}) + "\n"
+            else:
+                futuros[pool_extraccion.submit(extraer_caracteristicas, tipo, datos, nombre)] = (nombre, tipo, clave)
+        entradas.clear()  # Los bytes ya están en las tareas; no se retienen aquí
+        bloque = []
+        errores = rechazadas = 0
+        for futuro in as_completed(futuros):
+            nombre, tipo, clave = futuros[futuro]
+            try:
+                bloque.append((nombre, tipo, futuro.result(), clave))
+            except ImagenRechazada as e:
+                rechazadas += 1
+                yield json.dumps({'archivo': nombre, 'tipo': tipo, 'error': str(e), 'motivos': e.motivos}) + "\n"
+            except Exception as e:
+                errores += 1
+                yield json.dumps({'archivo': nombre, 'tipo': tipo, 'error': str(e)}) + "\n"
+            if len(bloque) >= TAMANO_BLOQUE_LOTE:
+                for resultado in clasificar_bloque(modelos, bloque):
+                    yield json.dumps(resultado) + "\n"
+                bloque = []
+        if bloque:
+            for resultado in clasificar_bloque(modelos, bloque):
+                yield json.dumps(resultado) + "\n"
+        yield json.dumps({'resumen': {'archivos': len(futuros) + en_cache, 'en_cache': en_cache, 'errores': errores, 'rechazadas': rechazadas, 'ignorados': len(ignorados), 'version_modelo': modelos.version}}) + "\n"
+
+    respuesta = Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+    respuesta.call_on_close(limite.liberar)
+    return respuesta
+
+@app.route('/trabajos', methods=['POST'])
+def crear_trabajo():
+    """Encola la clasificación de un audio o una imagen y responde de inmediato con el identificador del trabajo."""
+    archivo_audio = request.files.get('audio')
+    archivo_imagen = request.files.get('imagen')
+    if archivo_audio and archivo_permitido(archivo_audio.filename, EXTENSIONES_AUDIO_PERMITIDAS):
+        tipo, archivo = 'audio', archivo_audio
+    elif archivo_imagen and archivo_permitido(archivo_imagen.filename, EXTENSIONES_IMAGEN_PERMITIDAS):
+        tipo, archivo = 'imagen', archivo_imagen
+    else:
+        return jsonify({'error': 'No se proporcionó un archivo de audio o imagen válido.'}), 400
+
+    try:
+        id_trabajo = cola_trabajos.enviar(clasificar_trabajo, tipo, archivo.read(), archivo.filename)
+    except queue.Full:
+        respuesta = jsonify({'error': 'La cola de trabajos está llena, intente más tarde.'})
+        respuesta.headers['Retry-After'] = '5'
+        return respuesta, 503
+
+    respuesta = jsonify({'id': id_trabajo, 'estado': 'en_cola', 'url': url_for('consultar_trabajo', id_trabajo=id_trabajo)})
+    respuesta.headers['Location'] = url_for('consultar_trabajo', id_trabajo=id_trabajo)
+    return respuesta, 202
+
+@app.route('/trabajos/<id_trabajo>', methods=['GET'])
+def consultar_trabajo(id_trabajo):
+    """Devuelve el estado, los tiempos y, si terminó, el resultado de un trabajo."""
+    trabajo = cola_trabajos.consultar(id_trabajo)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado o expirado.'}), 404
+    return jsonify(trabajo)
+
+@app.route('/depuracion_audio', methods=['POST'])
+@control_admision.limitar('audio')
+def depuracion_audio():
+    """Procesa un audio y devuelve como PNG las señales y el espectrograma de cada etapa."""
+    archivo_audio = request.files.get('audio')
+    if not (archivo_audio and archivo_permitido(archivo_audio.filename, EXTENSIONES_AUDIO_PERMITIDAS)):
+        return jsonify({'error': 'No se proporcionó un archivo de audio válido.'}), 400
+    try:
+        procesador_audio = procesar_audio(archivo_audio.read(), archivo_audio.filename)
+        return Response(procesador_audio.renderizar_resultados_png(), mimetype='image/png')
+    except Exception as e:
+        return jsonify({'error': f"Error al procesar el audio: {str(e)}"}), 500
+
+@app.route('/depuracion_imagen', methods=['POST'])
+@control_admision.limitar('imagen')
+def depuracion_imagen():
+    """Procesa una imagen y devuelve como PNG las etapas del procesamiento."""
+    archivo_imagen = request.files.get('imagen')
+    if not (archivo_imagen and archivo_permitido(archivo_imagen.filename, EXTENSIONES_IMAGEN_PERMITIDAS)):
+        return jsonify({'error': 'No se proporcionó un archivo de imagen válido.'}), 400
+    try:
+        procesador_imagen = procesar_imagen(archivo_imagen.read(), archivo_imagen.filename)
+        return Response(procesador_imagen.renderizar_resultados_png(), mimetype='image/png')
+    except Exception as e:
+        return jsonify({'error': f"Error al procesar la imagen: {str(e)}"}), 500
+
+@app.route('/retroalimentacion', methods=['POST'])
+def retroalimentacion():
+    """Recibe un audio o una imagen con su etiqueta correcta y actualiza el modelo de forma incremental."""
+    etiqueta = request.form.get('etiqueta', '').strip()
+    if not etiqueta:
+        return jsonify({'error': 'No se proporcionó la etiqueta correcta.'}), 400
+
+    archivo_audio = request.files.get('audio')
+    archivo_imagen = request.files.get('imagen')
+    if archivo_audio and archivo_permitido(archivo_audio.filename, EXTENSIONES_AUDIO_PERMITIDAS):
+        tipo, archivo = 'audio', archivo_audio
+    elif archivo_imagen and archivo_permitido(archivo_imagen.filename, EXTENSIONES_IMAGEN_PERMITIDAS):
+        tipo, archivo = 'imagen', archivo_imagen
     else:
+        return jsonify({'error': 'No se proporcionó un archivo de audio o imagen válido.'}), 400
+
+    try:
+        registro_modelos.obtener()
+    except Exception as e:
+        return jsonify({'error': f"Error al cargar los modelos: {str(e)}"}), 500
+
+    limite = control_admision.limites[tipo]
+    if not limite.adquirir():
+        return respuesta_saturado(tipo, control_admision.reintentar_en)
+    try:
+        caracteristicas = extraer_caracteristicas(tipo, archivo.read(), archivo.filename)
+        if tipo == 'audio':
+            modelos = registro_modelos.agregar_muestra_audio(caracteristicas, etiqueta)
+        else:
+            modelos = registro_modelos.agregar_muestra_imagen(caracteristicas, etiqueta)
+        return jsonify({'tipo': tipo, 'etiqueta': etiqueta, 'version_modelo': modelos.version, 'mensaje': 'Modelo actualizado con la corrección.'})
+    except Exception as e:
+        return jsonify({'error': f"Error al procesar la retroalimentación: {str(e)}"}), 500
+    finally:
+        limite.liberar()
+
+@app.route('/salud')
+def salud():
+    """Indica si el servidor terminó el calentamiento (503 mientras no esté listo), con los tiempos de cada etapa."""
+    estado = calentamiento.estado()
+    estado['pid'] = os.getpid()
+    estado['version_modelo'] = registro_modelos.version_actual()
+    return jsonify(estado), 200 if estado['listo'] else 503
+
+@app.route('/admision')
+def estado_admision():
+    """
+    Expone la ocupación, la cola de espera y los tiempos de espera de cada límite de admisión. Con el servidor
+    prefork son los del trabajador que atendió la consulta (cada uno tiene su parte de los límites); los totales
+    están en /metrics.
+    """
+    return jsonify({'pid': os.getpid(), 'limites': control_admision.estadisticas(), 'trabajos': cola_trabajos.estadisticas()})
+
+@app.route('/cache')
+def estado_cache():
+    """
+    Expone los contadores de aciertos y fallos de la cache de predicciones. Con el servidor prefork cada trabajador
+    tiene su propia cache y responde la suya; los de todos están en /metrics, con la etiqueta 'pid'.
+    """
+    return jsonify(dict(cache_predicciones.estadisticas(), pid=os.getpid()))
+
+@app.route('/metrics')
+def exportar_metricas():
+    """Métricas del servidor en formato de texto de Prometheus."""
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/miniatura/<id_imagen>')
+def mostrar_miniatura(id_imagen):
+    """Sirve una miniatura de la galería; su contenido no cambia, por lo que el navegador puede guardarla en cache."""
+    ruta = galeria.obtener_ruta(id_imagen)
+    if ruta is None or not os.path.exists(ruta):
         return "Imagen no encontrada", 404
+    return send_file(ruta, mimetype='image/jpeg', max_age=86400)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor de clasificación de audio e imágenes.")
+    parser.add_argument('--gui', action='store_true', help="Abre las ventanas de depuración (matplotlib/Tkinter) en cada solicitud.")
+    parser.add_argument('--puerto', type=int, default=5000)
+    parser.add_argument('--sin-cache', action='store_true', help="Desactiva la cache de predicciones (por ejemplo, para pruebas de carga).")
+    parser.add_argument('--calidad', choices=['rechazar', 'marcar', 'no'], default='marcar',
+                        help="Qué hacer con las imágenes que no pasan el control de calidad de la vista previa.")
+    parser.add_argument('--fondo', default=None, metavar='RUTA', help="Modelo de fondo calibrado para una cámara fija.")
+    parser.add_argument('--limite', type=leer_limite, action='append', default=[], metavar='TIPO=N[,ESPERA[,SEG]]',
+                        help="Límite de admisión de un tipo (imagen, audio, lote, multimodal): solicitudes simultáneas, "
+                             "en espera y espera máxima en segundos. Se puede repetir.")
+    argumentos = parser.parse_args()
+    MODO_GUI = argumentos.gui
+    configurar(argumentos.sin_cache, argumentos.calidad, argumentos.fondo, argumentos.limite)
+
     try:
         cargar_modelos()
     except Exception as e:
         print(f"Error al cargar los modelos al iniciar el servidor: {e}")
         exit(1)
-    
-    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+
+    calentamiento.ejecutar_en_segundo_plano()
+    app.run(host='0.0.0.0', port=argumentos.puerto, threaded=True)
\ No newline at end of file
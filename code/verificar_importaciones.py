@@ -0,0 +1,70 @@
+import sys
+import json
+import argparse
+import subprocess
+
+# Dependencias pesadas u opcionales que no deben cargarse solo por importar los módulos del proyecto
+MODULOS_PROHIBIDOS = ['librosa', 'numba', 'matplotlib', 'mpl_toolkits', 'sklearn', 'scipy.signal',
+                      'python_speech_features', 'tkinter', 'pyaudio', 'questionary']
+
+# Tiempo máximo de importación (s) de cada módulo en un intérprete nuevo
+PRESUPUESTOS = {
+    'ProcesadorAudio': 0.6,
+    'ProcesadorImagen': 0.5,
+    'Procesador': 0.8,
+    'Entrenador': 0.5,
+    'Evaluador': 0.5,
+    'RegistroModelos': 0.5,
+    'servidor': 1.2,
+    'main': 0.8,
+}
+
+CODIGO_MEDICION = """
+import sys, time, json
+inicio = time.perf_counter()
+import {modulo}
+duracion = time.perf_counter() - inicio
+print(json.dumps({{"duracion": duracion, "modulos": sorted(sys.modules)}}))
+"""
+
+def medir_importacion(modulo, repeticiones=3):
+    """
+    Importa el módulo en intérpretes nuevos y devuelve el menor tiempo medido y los módulos que quedaron cargados.
+    """
+    mejor = None
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', CODIGO_MEDICION.format(modulo=modulo)],
+                                capture_output=True, text=True, check=True)
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        if mejor is None or resultado["duracion"] < mejor["duracion"]:
+            mejor = resultado
+    return mejor["duracion"], mejor["modulos"]
+
+def verificar(presupuestos=PRESUPUESTOS, prohibidos=MODULOS_PROHIBIDOS, repeticiones=3):
+    """Verifica el presupuesto de tiempo y las dependencias cargadas de cada módulo. Devuelve la lista de fallas."""
+    fallas = []
+    for modulo, presupuesto in presupuestos.items():
+        duracion, modulos = medir_importacion(modulo, repeticiones)
+        cargados = [p for p in prohibidos if any(m == p or m.startswith(p + '.') for m in modulos)]
+        estado = "OK" if duracion <= presupuesto and not cargados else "FALLA"
+        print(f"{estado:5} {modulo:18} {duracion:6.3f} s (presupuesto {presupuesto:.1f} s)" + (f"  carga: {', '.join(cargados)}" if cargados else ""))
+        if duracion > presupuesto:
+            fallas.append(f"{modulo} tarda {duracion:.3f} s en importarse (presupuesto {presupuesto:.1f} s)")
+        for prohibido in cargados:
+            fallas.append(f"{modulo} importa {prohibido} al cargarse")
+    return fallas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Verifica que los módulos del proyecto se importen rápido y sin dependencias pesadas. "
+                                                 "Para ver qué importa cada uno: python -X importtime -c 'import modulo'.")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Mediciones por módulo; se toma la menor.")
+    argumentos = parser.parse_args()
+
+    fallas = verificar(repeticiones=argumentos.repeticiones)
+    if fallas:
+        print("\nSe excedió el presupuesto de importación:")
+        for falla in fallas:
+            print(f"- {falla}")
+        sys.exit(1)
+    print("\nTodos los módulos están dentro del presupuesto de importación.")